@@ -0,0 +1,9 @@
+"""benchmarks : Performance benchmarks for wattle.
+
+The datasets module generates synthetic classification data of any size, and
+the run module times the main operations of wattle on it at several scales.
+Run the suite from the repository root with:
+
+  python -m benchmarks.run --output results.json
+
+"""
@@ -0,0 +1,70 @@
+"""Synthetic dataset generators for the wattle benchmarks."""
+
+import numpy as np
+import pandas as pd
+
+def make_classification(num_rows, num_numerical=5, num_categorical=0,
+  cardinality=5, num_classes=2, noise=0.1, seed=0):
+  """Generates a synthetic classification dataset.
+
+  The class of each data point is decided by a random linear score of its
+  attributes, so every attribute carries some information about the class.
+  Each category of a categorical attribute adds a random amount to the score.
+  The score is cut into num_classes equally likely classes, and a fraction of
+  the class values are then replaced by random ones.
+
+  Args:
+    num_rows (int): The number of data points.
+    num_numerical (int): The number of numerical attributes. They are named
+      n0, n1, etc.
+    num_categorical (int): The number of categorical attributes. They are
+      named c0, c1, etc.
+    cardinality (int): The number of categories of each categorical
+      attribute.
+    num_classes (int): The number of class values.
+    noise (float): The fraction of data points whose class value is random.
+    seed (int): The seed of the random number generator.
+
+  Returns:
+    (pandas.DataFrame): The data points. The class attribute is named Class
+      and its values are the strings '0', '1', etc.
+  """
+  random = np.random.default_rng(seed)
+  columns = {}
+  score = np.zeros(num_rows)
+
+  for index in range(num_numerical):
+    values = random.normal(size=num_rows).round(3)
+    columns['n{}'.format(index)] = values
+    score += random.normal() * values
+
+  for index in range(num_categorical):
+    codes = random.integers(0, cardinality, size=num_rows)
+    categories = np.array(['v{}'.format(code) for code in range(cardinality)],
+      dtype=object)
+    columns['c{}'.format(index)] = categories[codes]
+    score += random.normal(size=cardinality)[codes]
+
+  # Cut the score at its quantiles, then add the noise.
+  edges = np.quantile(score, np.arange(1, num_classes) / num_classes)
+  classes = np.searchsorted(edges, score)
+  noisy = random.random(num_rows) < noise
+  classes[noisy] = random.integers(0, num_classes, size=noisy.sum())
+  columns['Class'] = classes.astype(str)
+  return pd.DataFrame(columns)
+
+def iterate_chunks(data, chunk_size):
+  """Splits a dataset into chunks, as if it were being read from a file.
+
+  Args:
+    data (pandas.DataFrame): The dataset.
+    chunk_size (int): The number of data points in each chunk.
+
+  Returns:
+    (function): A function which takes no arguments and returns an iterator
+      over the chunks. See wattle.Tree.build_streaming.
+  """
+  def chunks():
+    for start in range(0, len(data), chunk_size):
+      yield data.iloc[start:start + chunk_size]
+  return chunks
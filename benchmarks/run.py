@@ -0,0 +1,208 @@
+"""Times the main operations of wattle on synthetic data at several scales.
+
+The results are written as JSON, so that they can be compared between
+releases. For example:
+
+  python -m benchmarks.run --rows 1000 10000 100000 --output results.json
+
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import wattle
+from benchmarks.datasets import make_classification, iterate_chunks
+
+# The cost matrix used by the cost-sensitive benchmarks.
+COST_MATRIX = {'TP' : 0, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+
+def time_function(function, repeats):
+  """Times a function.
+
+  Args:
+    function (function): The function to time. It takes no arguments.
+    repeats (int): The number of times to call it.
+
+  Returns:
+    (list<float>): The number of seconds each call took.
+  """
+  timings = []
+  for _ in range(repeats):
+    start = time.perf_counter()
+    function()
+    timings.append(time.perf_counter() - start)
+  return timings
+
+def prune_small(node, min_records):
+  """A prune function which prunes nodes with few data points.
+
+  Args:
+    node (wattle.Node): The node to decide for.
+    min_records (int): Nodes with fewer data points than this are pruned.
+
+  Returns:
+    (boolean): True if the node should be pruned.
+  """
+  return node.num_records() < min_records
+
+def benchmark_scale(data, repeats, max_splits=100):
+  """Times each benchmarked operation on a dataset.
+
+  Args:
+    data (pandas.DataFrame): The dataset. See make_classification.
+    repeats (int): The number of times to time each operation.
+    max_splits (int): The number of splits to find the supports of in the
+      get_split_supports benchmark.
+
+  Returns:
+    (dict<list>): The timings of each operation, keyed by its name.
+  """
+  split_args = ['1', COST_MATRIX]
+  timings = {}
+
+  def new_node():
+    return wattle.Node(data, class_attribute='Class', positive_class='1')
+
+  node = new_node()
+  timings['Node.get_possible_splits'] = time_function(
+    node.get_possible_splits, repeats)
+
+  splits = node.get_possible_splits()
+  stride = max(len(splits) // max_splits, 1)
+  sampled_splits = splits[::stride][:max_splits]
+  def get_split_supports():
+    fresh = new_node()
+    for split in sampled_splits:
+      fresh.get_split_supports(split)
+  timings['Node.get_split_supports'] = time_function(get_split_supports,
+    repeats)
+
+  timings['Node.split'] = time_function(lambda: new_node().split(
+    wattle.cost_reduction_split, split_func_args=split_args), repeats)
+
+  def build():
+    return wattle.Tree(data=data, build=True,
+      split_func=wattle.cost_reduction_split, split_func_args=split_args,
+      class_attribute='Class', positive_class='1', min_samples_leaf=5)
+  timings['Tree build'] = time_function(build, repeats)
+  timings['Tree build (max_bins=255)'] = time_function(
+    lambda: wattle.Tree(data=data, build=True,
+      split_func=wattle.cost_reduction_split, split_func_args=split_args,
+      class_attribute='Class', positive_class='1', min_samples_leaf=5,
+      max_bins=255), repeats)
+  timings['Tree build (streaming)'] = time_function(
+    lambda: wattle.Tree(chunks=iterate_chunks(data, 100000), build=True,
+      split_func=wattle.cost_reduction_split, split_func_args=split_args,
+      class_attribute='Class', positive_class='1', min_samples_leaf=5),
+    repeats)
+
+  # Each prune needs a fresh tree, so only the pruning itself is timed.
+  prune_timings = []
+  for _ in range(repeats):
+    tree = build()
+    start = time.perf_counter()
+    tree.prune(prune_small, [max(len(data) // 100, 2)])
+    prune_timings.append(time.perf_counter() - start)
+  timings['Tree.prune'] = prune_timings
+
+  tree = build()
+  timings['Tree.classify'] = time_function(lambda: tree.classify(data),
+    repeats)
+  timings['Tree.classify (cost-sensitive)'] = time_function(
+    lambda: tree.classify(data, cost_sensitive=True, cost_matrix=COST_MATRIX),
+    repeats)
+  records = data.drop(columns='Class').head(1000).to_dict('records')
+  tree.predictor(labels_only=True)
+  timings['Tree.predict_one (1000 records)'] = time_function(
+    lambda: [tree.predict_one(record) for record in records], repeats)
+  return timings
+
+def run(rows, num_numerical, num_categorical, cardinality, num_classes,
+  repeats):
+  """Runs the benchmarks at every scale.
+
+  Args:
+    rows (list<int>): The number of data points of each scale.
+    num_numerical (int): The number of numerical attributes.
+    num_categorical (int): The number of categorical attributes.
+    cardinality (int): The number of categories of each categorical
+      attribute.
+    num_classes (int): The number of class values.
+    repeats (int): The number of times to time each operation.
+
+  Returns:
+    (dict): The results. They hold the environment the benchmarks were run
+      in and one entry per operation and scale.
+  """
+  results = []
+  for num_rows in rows:
+    data = make_classification(num_rows, num_numerical, num_categorical,
+      cardinality, num_classes)
+    for name, timings in benchmark_scale(data, repeats).items():
+      results.append({
+        'benchmark' : name,
+        'rows' : num_rows,
+        'numerical' : num_numerical,
+        'categorical' : num_categorical,
+        'cardinality' : cardinality,
+        'classes' : num_classes,
+        'repeats' : repeats,
+        'min_seconds' : min(timings),
+        'median_seconds' : statistics.median(timings),
+      })
+      print('{:>10} rows  {:<36} {:.6f}s'.format(num_rows, name,
+        min(timings)), file=sys.stderr)
+
+  return {
+    'created' : datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    'python' : platform.python_version(),
+    'numpy' : np.__version__,
+    'pandas' : pd.__version__,
+    'platform' : platform.platform(),
+    'results' : results,
+  }
+
+def main(arguments=None):
+  """Runs the benchmarks from the command line.
+
+  Args:
+    arguments (list<str>): The command line arguments. Defaults to sys.argv.
+  """
+  parser = argparse.ArgumentParser(description='Benchmarks wattle on '
+    'synthetic data.')
+  parser.add_argument('--rows', type=int, nargs='+',
+    default=[1000, 10000, 100000], help='the number of data points of each '
+    'scale')
+  parser.add_argument('--numerical', type=int, default=5,
+    help='the number of numerical attributes')
+  parser.add_argument('--categorical', type=int, default=2,
+    help='the number of categorical attributes')
+  parser.add_argument('--cardinality', type=int, default=8,
+    help='the number of categories of each categorical attribute')
+  parser.add_argument('--classes', type=int, default=2,
+    help='the number of class values')
+  parser.add_argument('--repeats', type=int, default=3,
+    help='the number of times to time each operation')
+  parser.add_argument('--output', default=None,
+    help='the JSON file to write the results to (default: standard output)')
+  options = parser.parse_args(arguments)
+
+  results = run(options.rows, options.numerical, options.categorical,
+    options.cardinality, options.classes, options.repeats)
+  if options.output is None:
+    json.dump(results, sys.stdout, indent=2)
+    print()
+  else:
+    with open(options.output, 'w') as output:
+      json.dump(results, output, indent=2)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,81 @@
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+sys.path.append('../')
+from src.wattle import Forest, gini_split
+
+class test_forest_class(unittest.TestCase):
+
+  def test_build(self):
+    # Check that every tree is grown from a bootstrap sample of shared data.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    forest = Forest(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', num_trees=5, seed=0)
+    self.assertEqual(len(forest.trees), 5)
+    for tree in forest.trees:
+      self.assertIs(tree.root.dataset, forest.dataset)
+      self.assertEqual(tree.root.num_records(), len(data))
+
+  def test_classify(self):
+    # Check that both voting methods classify the training data correctly.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    forest = Forest(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', num_trees=5, seed=0)
+    expected = list(data['Defective'].astype(str))
+    self.assertEqual(forest.classify(data), expected)
+    self.assertEqual(forest.classify(data, method='average'), expected)
+    supports = forest.predict_supports(data)
+    self.assertTrue(np.allclose(supports.sum(axis=1), 1))
+
+  def test_cost_sensitive(self):
+    # Check that expensive false negatives make positive labels likelier.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    forest = Forest(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', num_trees=5, seed=0,
+      max_depth=0)
+    cost_matrix = {'TP' : 0, 'TN' : 0, 'FP' : 1, 'FN' : 10}
+    for method in ('vote', 'average'):
+      self.assertEqual(set(forest.classify(data, method)), {'0'})
+      self.assertEqual(set(forest.classify(data, method, True, cost_matrix)),
+        {'1'})
+
+  def test_processes(self):
+    # Check that building on processes gives the same forest.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    serial = Forest(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', num_trees=3, seed=0)
+    parallel = Forest(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', num_trees=3, seed=0,
+      n_processes=2)
+    self.assertEqual([str(tree) for tree in parallel.trees],
+      [str(tree) for tree in serial.trees])
+
+  def test_deep_processes(self):
+    # Check that deep trees can be built on other processes.
+    num_rows = 1000
+    data = pd.DataFrame({'x' : np.arange(num_rows, dtype=float),
+      'Defective' : np.arange(num_rows) % 2})
+    serial = Forest(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', num_trees=2, seed=0)
+    parallel = Forest(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', num_trees=2, seed=0,
+      n_processes=2)
+    self.assertEqual([tree.num_nodes for tree in parallel.trees],
+      [tree.num_nodes for tree in serial.trees])
+
+  def test_random_candidates(self):
+    # Check that randomized forests are reproducible from their seed.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Reversed'] = data['Lines of Code'].values[::-1]
+    forests = [Forest(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', num_trees=3, seed=0,
+      max_features=1, max_thresholds=1, n_processes=n_processes) for
+      n_processes in (1, 1, 2)]
+    trees = [[str(tree) for tree in forest.trees] for forest in forests]
+    self.assertEqual(trees[0], trees[1])
+    self.assertEqual(trees[0], trees[2])
+    self.assertEqual(len(forests[0].classify(data)), len(data))
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
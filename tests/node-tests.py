@@ -1,10 +1,15 @@
 import sys
 import copy
 import unittest
+import unittest.mock
+import numpy as np
 import pandas as pd
 import datacost as dc
 sys.path.append('../')
-from src.wattle import Node
+from src.wattle import Node, Split_Test, Build_Profiler
+from src.wattle import cost_reduction_split as vectorized_cost_split
+from src.wattle import information_gain, gain_ratio, gini_gain, chi_square
+from src.wattle import best_split, gain_ratio_split
 
 def cost_reduction_split(node, positive_class, cost_matrix):
   """Finds and returns the best split based on expected cost.
@@ -45,6 +50,27 @@ def cost_reduction_split(node, positive_class, cost_matrix):
   else:
     return None
 
+def naive_best_split(node, criterion):
+  """Finds the best split by scoring every possible split one at a time.
+
+  Args:
+    node (wattle.Node): The node to calculate the best split for.
+    criterion (function): The criterion to score the splits with.
+
+  Returns:
+    (wattle.Split_Test): The split with the highest score.
+  """
+  best_score = 0
+  best_split = None
+  for split in node.get_possible_splits():
+    supports = node.get_split_supports(split)
+    table = [[child[value] for value in sorted(child)] for child in supports]
+    score = criterion(np.array([table]))[0]
+    if score > best_score:
+      best_score = score
+      best_split = split
+  return best_split
+
 class test_node_class(unittest.TestCase):
 
   def test_split_made(self):
@@ -72,6 +98,285 @@ class test_node_class(unittest.TestCase):
     self.assertTrue(node.split(cost_reduction_split,
       split_func_args=split_func_args))
 
+  def test_split_statistics(self):
+    # Check that the one-pass statistics match splitting the node.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    split_values, left, right = node.split_statistics('Lines of Code')
+    splits = node.get_possible_splits()
+    self.assertEqual(list(split_values), [s.split_value for s in splits])
+    for index, split in enumerate(splits):
+      supports = node.get_split_supports(split)
+      self.assertEqual(list(left[index]), [supports[0]['0'], supports[0]['1']])
+      self.assertEqual(list(right[index]),
+        [supports[1]['0'], supports[1]['1']])
+
+  def test_presort(self):
+    # Check that the presorted index arrays stay sorted in the children.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    node = Node(data, class_attribute='Defective', positive_class='1',
+      presort=True)
+    node.split(lambda _: Split_Test('numerical', 'Lines of Code', 73.5))
+    for child in node.children:
+      sorted_index = child.sorted_indexes['Lines of Code']
+      values = child.data_points['Lines of Code'].to_numpy()[sorted_index]
+      self.assertEqual(sorted(sorted_index), list(range(child.num_records())))
+      self.assertEqual(list(values), sorted(values))
+
+  def test_presort_no_sort(self):
+    # Check that presorted nodes are split without sorting again.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    node = Node(data, class_attribute='Defective', positive_class='1',
+      presort=True)
+    with unittest.mock.patch('numpy.argsort') as argsort:
+      node.split(lambda _: Split_Test('numerical', 'Lines of Code', 73.5))
+      node.children[0].split_statistics('Lines of Code')
+    self.assertEqual(argsort.call_count, 0)
+
+  def test_presort_many_way(self):
+    # Check that a many-way categorical split of a presorted node gives each
+    # child the index arrays that sorting it again would.
+    rng = np.random.RandomState(0)
+    x = rng.randint(0, 20, 600).astype(float)
+    x[::37] = np.nan
+    data = pd.DataFrame({'x' : x,
+      'c' : ['v{}'.format(value) for value in rng.randint(0, 50, 600)],
+      'Class' : rng.choice(['0', '1'], 600)})
+    node = Node(data, class_attribute='Class', positive_class='1',
+      presort=True)
+    node.split(lambda _: Split_Test('categorical', 'c'))
+    self.assertEqual(len(node.children), 50)
+    for child in node.children:
+      expected = np.argsort(child.column('x'), kind='stable')
+      self.assertEqual(list(child.sorted_indexes['x']), list(expected))
+
+  def test_shared_data(self):
+    # Check that children refer to the parent's data rather than copying it.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    node.split(lambda _: Split_Test('numerical', 'Lines of Code', 73.5))
+    left, right = node.children
+    self.assertIs(left.dataset, node.dataset)
+    self.assertEqual(left.num_records() + right.num_records(), len(data))
+    expected = data[data['Lines of Code'] <= 73.5]
+    self.assertTrue(left.data_points.equals(expected))
+
+  def test_parallel_split(self):
+    # Check that the parallel split search finds the same split.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Reversed'] = data['Lines of Code'].values[::-1]
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    split_func_args = ['1', cost_matrix]
+    serial = node.find_best_split(cost_reduction_split, split_func_args)
+    parallel = node.find_best_split(cost_reduction_split, split_func_args,
+      n_jobs=2)
+    self.assertEqual(parallel.attribute, serial.attribute)
+    self.assertEqual(parallel.split_value, serial.split_value)
+
+  def test_parallel_scores(self):
+    # Check that scored splits are compared without searching again.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Reversed'] = data['Lines of Code'].values[::-1]
+    data['Shifted'] = data['Lines of Code'].values + 1
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    for split_func, split_func_args in ((best_split, [gini_gain]),
+      (vectorized_cost_split, ['1', cost_matrix])):
+      serial = node.find_best_split(split_func, split_func_args)
+      node.profiler = Build_Profiler()
+      node.profile = None
+      parallel = node.find_best_split(split_func, split_func_args, n_jobs=3)
+      self.assertEqual(parallel, serial)
+      self.assertEqual(parallel.score, serial.score)
+      self.assertEqual(node.profile['calls']['split_statistics'], 3)
+      node.profiler = None
+
+  def test_profiler_candidates(self):
+    # Check that each candidate split is counted once, when it is scored.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Size'] = ['large' if loc > 73.5 else 'small' for loc in
+      data['Lines of Code']]
+    categorical = Node(data[['Size', 'Defective']],
+      class_attribute='Defective', positive_class='1')
+    binned = Node(data[['Lines of Code', 'Defective']],
+      class_attribute='Defective', positive_class='1')
+    binned.dataset.bin(4)
+    split_values, _, _ = binned.threshold_statistics('Lines of Code')
+    for node, expected in ((categorical, 1), (binned, len(split_values))):
+      for search in (lambda: naive_best_split(node, gini_gain),
+        lambda: node.find_best_split(best_split, [gini_gain])):
+        node.profiler = Build_Profiler()
+        node.profile = None
+        search()
+        self.assertEqual(node.profile['candidates'], expected)
+      node.profiler = None
+
+  def test_histograms(self):
+    # Check that the children's histograms are derived correctly.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    node.dataset.bin(4)
+    self.assertEqual(node.histogram('Lines of Code').sum(), len(data))
+    split_values, _, _ = node.split_statistics('Lines of Code')
+    node.split(lambda _: Split_Test('numerical', 'Lines of Code',
+      split_values[1]))
+    for child in node.children:
+      expected = Node(dataset=node.dataset, rows=child.rows,
+        class_attribute='Defective').histogram('Lines of Code')
+      self.assertEqual(child.histograms['Lines of Code'].tolist(),
+        expected.tolist())
+
+  def test_missing_values(self):
+    # Check that missing values never become thresholds.
+    data = pd.read_csv('data/LOC_SDP.csv').astype({'Lines of Code' : float})
+    data.loc[[0, 1, 2], 'Lines of Code'] = np.nan
+    data.loc[[0, 1, 2], 'Defective'] = 1
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    split_values, left, right = node.split_statistics('Lines of Code')
+    splits = node.get_possible_splits()
+    self.assertFalse(np.isnan(split_values).any())
+    self.assertEqual(list(split_values), [s.split_value for s in splits])
+    self.assertEqual((left + right).sum(axis=1).tolist(),
+      [len(data) - 3] * len(split_values))
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    node.split(vectorized_cost_split, split_func_args=['1', cost_matrix])
+    self.assertEqual(sum(child.num_records() for child in node.children),
+      len(data) - 3)
+
+    # The binned statistics leave the same data points out.
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    node.dataset.bin(4)
+    self.assertEqual(node.histogram('Lines of Code').sum(), len(data) - 3)
+    split_values, _, _ = node.split_statistics('Lines of Code')
+    self.assertFalse(np.isnan(split_values).any())
+
+  def test_categorical_split(self):
+    # Check that a categorical split creates a child for each value.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Size'] = ['large' if loc > 73.5 else 'small' for loc in
+      data['Lines of Code']]
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    values, supports = node.category_supports('Size')
+    self.assertEqual(list(values), ['large', 'small'])
+    self.assertEqual(supports.tolist(), [[0, 6], [14, 0]])
+    node.split(lambda _: Split_Test('categorical', 'Size'))
+    self.assertEqual([str(branch) for branch in node.child_branches],
+      ['Size = large', 'Size = small'])
+    self.assertEqual(node.children[0].class_supports, {'0' : 0, '1' : 6})
+
+  def test_vectorized_cost_split(self):
+    # Check that the built-in cost split matches scoring each split.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Reversed'] = data['Lines of Code'].values[::-1]
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    expected = cost_reduction_split(node, '1', cost_matrix)
+    split = vectorized_cost_split(node, '1', cost_matrix)
+    self.assertEqual(split.attribute, expected.attribute)
+    self.assertEqual(split.split_value, expected.split_value)
+
+  def test_criteria(self):
+    # Check that the built-in criteria match scoring each split.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Reversed'] = data['Lines of Code'].values[::-1]
+    data['Parity'] = ['odd' if loc % 2 else 'even' for loc in
+      data['Lines of Code']]
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    for criterion in (information_gain, gain_ratio, gini_gain, chi_square):
+      expected = naive_best_split(node, criterion)
+      split = best_split(node, criterion)
+      self.assertEqual(split.attribute, expected.attribute)
+      self.assertEqual(split.split_value, expected.split_value)
+
+  def test_gain_ratio_split(self):
+    # Check that splits with less than the average information gain are left
+    # out, however high their gain ratio is.
+    lopsided = np.zeros(200)
+    lopsided[0] = 1
+    data = pd.DataFrame({'Lopsided' : lopsided,
+      'Balanced' : np.repeat([0, 1, 1, 0], [60, 40, 60, 40]),
+      'Class' : np.repeat(['A', 'B'], 100)})
+    node = Node(data, class_attribute='Class', positive_class='A')
+    self.assertEqual(best_split(node, gain_ratio).attribute, 'Lopsided')
+    self.assertEqual(gain_ratio_split(node).attribute, 'Balanced')
+    split = node.find_best_split(gain_ratio_split, n_jobs=2)
+    self.assertEqual(split.attribute, 'Balanced')
+
+  def test_gain_ratio_split_parallel(self):
+    # Check that searching the attributes in parallel chooses the same splits
+    # as searching them serially.
+    rng = np.random.RandomState(0)
+    data = pd.DataFrame({'x' : rng.randint(0, 20, 300).astype(float),
+      'y' : rng.rand(300).round(1),
+      'c' : rng.choice(['p', 'q', 'r', 's'], 300),
+      'Class' : rng.choice(['A', 'B', 'C'], 300)})
+    def split_tests(node):
+      tests = []
+      stack = [node]
+      while stack:
+        node = stack.pop()
+        for branch in node.child_branches:
+          tests.append((branch.split_test.attribute,
+            branch.split_test.split_value))
+        stack.extend(node.children)
+      return tests
+    for min_gain_ratio in (0.0, 0.02):
+      serial = Node(data, class_attribute='Class', positive_class='A')
+      serial.grow(gain_ratio_split, [min_gain_ratio])
+      parallel = Node(data, class_attribute='Class', positive_class='A')
+      parallel.grow(gain_ratio_split, [min_gain_ratio], n_jobs=2)
+      self.assertGreater(len(split_tests(serial)), 0)
+      self.assertEqual(split_tests(parallel), split_tests(serial))
+
+  def test_split_cache(self):
+    # Check that split supports are cached until the node is split.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    test = Split_Test('numerical', 'Lines of Code', 73.5)
+    supports = node.get_split_supports(test)
+    self.assertIn(test, node.split_cache)
+    self.assertEqual(node.get_split_supports(test), supports)
+    node.split(lambda _: test)
+    self.assertEqual(len(node.split_cache), 0)
+    self.assertEqual([child.class_supports for child in node.children],
+      supports)
+
+  def test_randomize(self):
+    # Check that the sampled candidates are the same however they're found.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Reversed'] = data['Lines of Code'].values[::-1]
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    node.randomize(max_features=1, max_thresholds=3, seed=0)
+    attributes = node.candidate_attributes()
+    self.assertEqual(len(attributes), 1)
+    self.assertEqual(node.candidate_attributes(), attributes)
+    split_values, left, right = node.split_statistics(attributes[0])
+    splits = node.get_possible_splits()
+    self.assertEqual(len(split_values), 3)
+    self.assertEqual(list(split_values), [s.split_value for s in splits])
+    node.split(lambda _: splits[0])
+    self.assertEqual(node.children[0].max_thresholds, 3)
+    self.assertNotEqual(node.children[0].seed, node.children[1].seed)
+
+  def test_supports(self):
+    # Check that the count vectors and their dict views agree.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    node = Node(data, class_attribute='Defective', positive_class='1')
+    self.assertEqual(node.supports.tolist(), [14, 6])
+    self.assertEqual(node.class_supports, {'0' : 14, '1' : 6})
+    node.split(lambda _: Split_Test('numerical', 'Lines of Code', 73.5))
+    for child in node.children:
+      self.assertEqual(len(child.supports), 2)
+      self.assertIs(child.class_values, node.class_values)
+    self.assertEqual(node.children[1].class_supports, {'0' : 0, '1' : 6})
+    self.assertEqual(node.children[1].num_errors(), 0)
+    node.children[1].class_supports = {'1' : 4}
+    self.assertEqual(node.children[1].supports.tolist(), [0, 4])
+    self.assertEqual(node.children[1].num_positive(), 4)
+    with self.assertRaises(TypeError):
+      node.children[1].class_supports['1'] += 1
+
   def test_prune(self):
     # Check that the node is pruned when expected.
     node = Node()
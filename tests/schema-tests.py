@@ -0,0 +1,78 @@
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+sys.path.append('../')
+from src.wattle import Schema, Dataset, Tree, gini_split
+
+class test_schema_class(unittest.TestCase):
+
+  def test_schema(self):
+    # Check that the attributes are described once and shared.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Size'] = ['large' if loc > 73.5 else 'small' for loc in
+      data['Lines of Code']]
+    tree = Tree(data, class_attribute='Defective', positive_class='1',
+      build=True, split_func=gini_split)
+    schema = tree.schema
+    self.assertEqual(schema.attribute_types, ['numerical', 'numerical',
+      'categorical'])
+    self.assertEqual(schema.positions['Size'], 2)
+    self.assertEqual(list(schema.category_values['Size']), ['large', 'small'])
+    self.assertEqual(schema.class_values, ['0', '1'])
+    for child in tree.root.children:
+      self.assertIs(child.attribute_types, schema.attribute_types)
+
+  def test_compact_encoding(self):
+    # Check that categories become small codes and the data is unchanged.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Size'] = ['large' if loc > 73.5 else 'small' for loc in
+      data['Lines of Code']]
+    data.loc[0, 'Size'] = None
+    dataset = Dataset(data, 'Defective', float32=True)
+    self.assertEqual(dataset.category_codes['Size'].dtype, np.int8)
+    self.assertNotIn('Size', dataset.columns)
+    self.assertEqual(dataset.columns['Lines of Code'].dtype, np.float32)
+    frame = dataset.to_frame(np.arange(len(data)))
+    self.assertTrue(frame['Size'].isna()[0])
+    self.assertEqual(list(frame['Size'][1:]), list(data['Size'][1:]))
+    self.assertEqual(list(frame['Lines of Code']), list(data['Lines of Code']))
+
+  def test_float32(self):
+    # Check that a float32 tree finds the same splits.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    trees = [Tree(data, class_attribute='Defective', positive_class='1',
+      build=True, split_func=gini_split, float32=float32) for float32 in
+      (False, True)]
+    self.assertEqual(str(trees[1]), str(trees[0]))
+
+  def test_missing_classes(self):
+    # Check that data with missing class values is rejected when it is
+    # trained on in memory, and left out when it is streamed.
+    data = pd.DataFrame({'x' : np.arange(40) % 17,
+      'Class' : ((np.arange(40) // 5) % 2).astype(str)})
+    missing = data.copy()
+    missing.loc[[3, 20], 'Class'] = np.nan
+    self.assertEqual(Schema(missing, 'Class').class_values, ['0', '1'])
+    with self.assertRaisesRegex(ValueError, 'missing class values'):
+      Dataset(missing, 'Class')
+    streamed = Tree(chunks=lambda: [missing], build=True,
+      split_func=gini_split, class_attribute='Class', positive_class='1',
+      max_bins=8)
+    expected = Tree(chunks=lambda: [data.drop([3, 20])], build=True,
+      split_func=gini_split, class_attribute='Class', positive_class='1',
+      max_bins=8)
+    self.assertEqual(str(streamed), str(expected))
+
+  def test_shared_schema(self):
+    # Check that data encoded with a given schema uses its dictionaries.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    data['Size'] = ['large' if loc > 73.5 else 'small' for loc in
+      data['Lines of Code']]
+    schema = Schema(data, 'Defective')
+    dataset = Dataset(data[data['Size'] == 'small'], 'Defective', schema)
+    self.assertIs(dataset.schema, schema)
+    self.assertEqual(set(dataset.category_codes['Size']), {1})
+
+if __name__ == '__main__':
+    unittest.main(exit=False)
@@ -27,5 +27,18 @@ class test_split_test_class(unittest.TestCase):
       split_value='red')
     self.assertEqual(str(test), 'colour = red')
 
+  def test_hash(self):
+    # Check that equal tests can be used as the same dictionary key.
+    test = Split_Test(attribute='age', attribute_type='numerical',
+      split_value=55.0)
+    same = Split_Test(attribute='age', attribute_type='numerical',
+      split_value=55.0)
+    other = Split_Test(attribute='age', attribute_type='numerical',
+      split_value=60.0)
+    self.assertEqual(hash(test), hash(same))
+    self.assertEqual({test : 1}[same], 1)
+    self.assertNotIn(other, {test : 1})
+    self.assertTrue(test != other)
+
 if __name__ == '__main__':
     unittest.main(exit=False)
@@ -1,7 +1,15 @@
+import os
+import io
+import datetime
 import sys
+import tempfile
+import tracemalloc
+import unittest.mock
 sys.path.append('../')
-from src.wattle import Tree
+from src.wattle import Tree, Node, Split_Test, Build_Profiler, gini_split
+from src.wattle import split_gini_gain
 import unittest
+import numpy as np
 import pandas as pd
 import datacost as dc
 
@@ -66,5 +74,431 @@ class test_tree_class(unittest.TestCase):
       split_func_args=['1', cost_matrix])
     self.assertEqual(correct_string, str(tree))
 
+  def test_build_processes(self):
+    # Check that building subtrees on other processes gives the same tree.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    serial = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix])
+    parallel = Tree(data=data, class_attribute='Defective', positive_class='1')
+    parallel.build(cost_reduction_split, ['1', cost_matrix], n_processes=2,
+      min_process_records=1)
+    self.assertEqual(str(parallel), str(serial))
+    self.assertEqual(parallel.num_nodes, serial.num_nodes)
+
+  def test_deep_build_processes(self):
+    # Check that deep subtrees can be sent back from other processes.
+    num_rows = 1000
+    data = pd.DataFrame({'x' : np.arange(num_rows, dtype=float),
+      'Defective' : np.arange(num_rows) % 2})
+    serial = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1')
+    parallel = Tree(data=data, class_attribute='Defective', positive_class='1')
+    parallel.build(gini_split, n_processes=2, min_process_records=1)
+    self.assertEqual(parallel.num_nodes, 2 * num_rows - 1)
+    self.assertEqual(str(parallel), str(serial))
+    leaf = parallel.root
+    while not leaf.is_leaf:
+      leaf = leaf.children[-1]
+    self.assertIs(leaf.dataset, parallel.dataset)
+    self.assertEqual(leaf.depth, num_rows - 1)
+
+  def test_binned(self):
+    # Check that binning with a bin for every value splits the data the same
+    # way. The thresholds can fall elsewhere in the same gap between a node's
+    # values, so only the leaves are compared.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    tree = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix])
+    binned = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix], max_bins=255)
+    self.assertEqual([leaf.class_supports for leaf in binned.get_leaves()],
+      [leaf.class_supports for leaf in tree.get_leaves()])
+
+  def test_infinite_values(self):
+    # Check that a column holding inf is split between the finite values and
+    # inf, rather than at a threshold which sends every row left.
+    data = pd.DataFrame({'x' : [1.0, 1.0, 1.0, np.inf, np.inf, np.inf],
+      'Class' : ['0', '0', '0', '1', '1', '1']})
+    for sign in (1, -1):
+      for max_bins in (None, 255):
+        data['x'] = sign * np.abs(data['x'])
+        tree = Tree(data=data, build=True, split_func=gini_split,
+          class_attribute='Class', positive_class='1', max_bins=max_bins)
+        self.assertEqual(tree.num_nodes, 3)
+        self.assertEqual([child.num_records() for child in
+          tree.root.children], [3, 3])
+        self.assertEqual(list(tree.classify(data[['x']])), list(data['Class']))
+
+  def test_compile(self):
+    # Check that the compiled tree matches the tree it was compiled from.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    tree = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix])
+    compiled = tree.compile()
+    self.assertEqual(compiled.num_nodes(), tree.num_nodes)
+    self.assertEqual(compiled.thresholds[0], 73.5)
+    self.assertEqual(list(compiled.supports[0]), [14, 6])
+
+  def test_classify(self):
+    # Check that the training data is classified correctly.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    tree = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix])
+    expected = list(data['Defective'].astype(str))
+    self.assertEqual(tree.classify(data), expected)
+    self.assertEqual(tree.classify(data, cost_sensitive=True,
+      cost_matrix=cost_matrix), expected)
+
+  def test_classify_after_change(self):
+    # Check that classification follows changes made through the nodes.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    tree = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1', max_depth=1)
+    expected = list(data['Defective'].astype(str))
+    self.assertEqual(tree.classify(data), expected)
+    tree.root.prune(lambda _: True)
+    self.assertEqual(tree.num_nodes, 1)
+    self.assertEqual(tree.classify(data), ['0'] * len(data))
+    tree.root.split(gini_split)
+    self.assertEqual(tree.num_nodes, 3)
+    self.assertEqual(tree.classify(data), expected)
+
+  def test_pre_pruning(self):
+    # Check that the growth limits stop the tree from being fully grown.
+    data = pd.DataFrame({'x' : np.arange(40),
+      'Class' : ((np.arange(40) // 5) % 2).astype(str)})
+    def build(**kwargs):
+      return Tree(data=data, build=True, split_func=gini_split,
+        class_attribute='Class', positive_class='1', **kwargs)
+    self.assertEqual(len(build().get_leaves()), 8)
+    self.assertEqual(build(max_depth=1).num_nodes, 3)
+    self.assertEqual(len(build(max_leaves=3).get_leaves()), 3)
+    self.assertEqual(len(build(max_leaves=5, best_first=True).get_leaves()),
+      5)
+    self.assertEqual(build(min_samples_split=41).num_nodes, 1)
+    leaves = build(min_samples_split=11).get_leaves()
+    self.assertEqual(min(leaf.num_records() for leaf in leaves), 5)
+    leaves = build(min_samples_leaf=10).get_leaves()
+    self.assertGreater(len(leaves), 1)
+    self.assertEqual(min(leaf.num_records() for leaf in leaves), 10)
+    self.assertEqual(build(min_gain=0.5).num_nodes, 1)
+    self.assertEqual(len(build(min_gain=0.01).get_leaves()), 8)
+
+  def test_min_samples_leaf(self):
+    # Check that the best allowed split is found when the best isn't allowed.
+    data = pd.DataFrame({'x' : np.arange(12),
+      'Class' : ['A', 'A'] + ['B'] * 10})
+    tree = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='A', min_samples_leaf=3)
+    self.assertEqual(tree.root.child_branches[0].split_test.split_value, 2.5)
+    self.assertTrue(all(leaf.num_records() >= 3 for leaf in
+      tree.get_leaves()))
+
+  def test_prune(self):
+    # Check that each node is offered to the prune function at most once.
+    data = pd.DataFrame({'x' : np.arange(40),
+      'Class' : ((np.arange(40) // 5) % 2).astype(str)})
+    tree = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1')
+    visited = []
+    def prune_small(node):
+      visited.append(node)
+      return node.num_records() <= 10
+    self.assertTrue(tree.prune(prune_small))
+    self.assertEqual(len(visited), len(set(map(id, visited))))
+    self.assertEqual(tree.num_nodes, 13)
+    self.assertTrue(all(leaf.num_records() >= 5 for leaf in
+      tree.get_leaves()))
+    self.assertTrue(tree.prune(lambda _: True))
+    self.assertEqual(tree.num_nodes, 1)
+    self.assertFalse(tree.prune(lambda _: True))
+
+  def test_prune_chain(self):
+    # Check that pruning a deep chain records the change once, rather than
+    # walking up to the root for every pruned node.
+    data = pd.DataFrame({'x' : np.arange(500),
+      'Class' : (np.arange(500) % 2).astype(str)})
+    def split_last(node):
+      column = node.column('x')
+      if len(column) < 2:
+        return None
+      return Split_Test('numerical', 'x', column.max() - 0.5)
+    tree = Tree(data=data, build=True, split_func=split_last,
+      class_attribute='Class', positive_class='1')
+    self.assertEqual(tree.num_nodes, 999)
+    version = tree.root.version
+    with unittest.mock.patch.object(Node, 'changed') as changed:
+      self.assertTrue(tree.prune(lambda _: True))
+    changed.assert_not_called()
+    self.assertEqual(tree.num_nodes, 1)
+    self.assertEqual(tree.root.version, version + 1)
+
+  def test_streaming(self):
+    # Check that streaming the data in chunks gives the same tree as binning
+    # it in memory.
+    data = pd.DataFrame({'x' : np.arange(40) % 17, 'y' : np.arange(40) % 3,
+      'Class' : ((np.arange(40) // 5) % 2).astype(str)})
+    chunks = lambda: (data.iloc[start:start + 7] for start in range(0, 40, 7))
+    binned = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1', max_bins=8)
+    streamed = Tree(chunks=chunks, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1', max_bins=8)
+    self.assertEqual(str(streamed), str(binned))
+    self.assertEqual(streamed.classify(data), binned.classify(data))
+
+  def test_streaming_categories(self):
+    # Check that a high-cardinality attribute doesn't grow the sample past
+    # sample_size plus max_categories, and that leaves own their tables.
+    data = pd.DataFrame({'x' : np.arange(400) % 17,
+      'c' : ['v{}'.format(value) for value in range(400)],
+      'Class' : ((np.arange(400) // 5) % 2).astype(str)})
+    chunks = lambda: (data.iloc[start:start + 50] for start in
+      range(0, 400, 50))
+    tree = Tree(class_attribute='Class', positive_class='1')
+    tree.build_streaming(chunks, gini_split, max_bins=8, sample_size=20,
+      max_categories=10, max_depth=1)
+    self.assertLessEqual(tree.dataset.num_records(), 30)
+    self.assertLessEqual(len(tree.dataset.category_values['c']), 30)
+    self.assertEqual(tree.dataset.class_values, ['0', '1'])
+    self.assertEqual(tree.root.num_records(), 400)
+    leaves = tree.get_leaves()
+    tree.accumulate_statistics(leaves, chunks())
+    for leaf in leaves:
+      self.assertIsNone(leaf.histograms['x'].base)
+      self.assertIsNone(leaf.category_tables['c'].base)
+
+  def test_streaming_limits(self):
+    # Check that the growth limits also apply to trees built from chunks.
+    data = pd.DataFrame({'x' : np.arange(40) % 17, 'y' : np.arange(40) % 3,
+      'Class' : ((np.arange(40) // 5) % 2).astype(str)})
+    chunks = lambda: (data.iloc[start:start + 7] for start in range(0, 40, 7))
+    def build(**kwargs):
+      binned = Tree(data=data, build=True, split_func=gini_split,
+        class_attribute='Class', positive_class='1', max_bins=8, **kwargs)
+      streamed = Tree(chunks=chunks, build=True, split_func=gini_split,
+        class_attribute='Class', positive_class='1', max_bins=8, **kwargs)
+      self.assertEqual(str(streamed), str(binned))
+      return streamed
+    self.assertEqual(len(build(max_leaves=3).get_leaves()), 3)
+    self.assertEqual(build(min_gain=0.5).num_nodes, 1)
+    build(min_gain=0.01, gain_func=split_gini_gain)
+
+    # The gains are weighted by all of the data, not just by the sample.
+    data = pd.DataFrame({'x' : np.arange(400) % 17,
+      'Class' : (np.arange(400) % 17 >= 8).astype(int).astype(str)})
+    chunks = lambda: (data.iloc[start:start + 50] for start in
+      range(0, 400, 50))
+    for min_gain, num_nodes in ((0.3, 3), (0.6, 1)):
+      tree = Tree(data=data, build=True, split_func=gini_split,
+        class_attribute='Class', positive_class='1', max_bins=8,
+        min_gain=min_gain)
+      self.assertEqual(tree.num_nodes, num_nodes)
+      streamed = Tree(class_attribute='Class', positive_class='1')
+      streamed.build_streaming(chunks, gini_split, max_bins=8, sample_size=40,
+        min_gain=min_gain)
+      self.assertEqual(streamed.num_nodes, num_nodes)
+    with self.assertRaises(ValueError):
+      Tree(chunks=chunks, build=True, split_func=gini_split,
+        class_attribute='Class', positive_class='1', best_first=True)
+
+  def test_streaming_random_candidates(self):
+    # Check that trees built from chunks keep their random subsampling.
+    data = pd.DataFrame({'x' : np.arange(40) % 17, 'y' : np.arange(40) % 3,
+      'Class' : ((np.arange(40) // 5) % 2).astype(str)})
+    chunks = lambda: (data.iloc[start:start + 7] for start in range(0, 40, 7))
+    trees = [Tree(chunks=chunks, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1', max_bins=8, max_features=1,
+      max_thresholds=2, seed=seed) for seed in (0, 0, 1)]
+    self.assertEqual(trees[0].root.max_features, 1)
+    self.assertEqual(str(trees[1]), str(trees[0]))
+    for node in trees[0].get_leaves():
+      self.assertEqual(node.max_thresholds, 2)
+      self.assertEqual(len(node.candidate_attributes()), 1)
+    binned = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1', max_bins=8, max_features=1,
+      max_thresholds=2, seed=1)
+    self.assertEqual(str(trees[2]), str(binned))
+
+  def test_partial_fit(self):
+    # Check that a tree can be grown from batches of data points.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    tree = Tree(class_attribute='Defective', positive_class='1',
+      split_func=gini_split)
+    self.assertEqual(tree.partial_fit(data), 1)
+    self.assertEqual(tree.root.child_branches[0].split_test.split_value, 73.5)
+    self.assertEqual(tree.partial_fit(data, grace_period=10), 0)
+    self.assertEqual([leaf.class_supports for leaf in tree.get_leaves()],
+      [{'0' : 14, '1' : 0}, {'0' : 0, '1' : 6}])
+    self.assertEqual(tree.classify(data), list(data['Defective'].astype(str)))
+
+  def test_save_load(self):
+    # Check that a saved tree classifies like the original once loaded.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    tree = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix])
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'tree.wattle')
+      tree.save(path)
+      for mmap in (True, False):
+        loaded = Tree.load(path, mmap=mmap)
+        self.assertEqual(loaded.num_nodes, tree.num_nodes)
+        self.assertEqual(loaded.classify(data), tree.classify(data))
+        self.assertEqual(list(loaded.compiled.supports[0]), [14, 6])
+        del loaded
+
+    # Column names which aren't strings survive the JSON header.
+    data = pd.DataFrame({0 : ['large' if loc > 73.5 else 'small' for loc in
+      data['Lines of Code']], 1 : data['Lines of Code'] % 7,
+      'Defective' : data['Defective']})
+    tree = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Defective', positive_class='1')
+    self.assertEqual(list(tree.compile().categories), [0])
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'tree.wattle')
+      tree.save(path)
+      loaded = Tree.load(path, mmap=False)
+      self.assertEqual(loaded.compiled.categories, tree.compiled.categories)
+      self.assertEqual(loaded.classify(data), tree.classify(data))
+
+  def test_to_python(self):
+    # Check that the generated predictor classifies like the tree.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    tree = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix])
+    self.assertIn('<= 73.5', tree.to_python())
+    predictor = tree.predictor()
+    self.assertIs(tree.predictor(), predictor)
+    labels = [predictor(row)[0] for row in data.to_dict('records')]
+    self.assertEqual(labels, tree.classify(data))
+    self.assertEqual(predictor((100,)), ('1', {'0' : 0, '1' : 6}))
+    self.assertEqual(predictor({'Lines of Code' : None})[1],
+      {'0' : 14, '1' : 6})
+
+    # A threshold which isn't finite is written as a call to float.
+    data = pd.DataFrame({'x' : [-np.inf] * 3 + [1.0] * 3,
+      'Class' : ['1'] * 3 + ['0'] * 3})
+    tree = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1')
+    self.assertIn("<= float('-inf')", tree.to_python())
+    labels = [tree.predictor()(row)[0] for row in data.to_dict('records')]
+    self.assertEqual(labels, list(data['Class']))
+
+  def test_to_python_constants(self):
+    # Check that categories which have no literal, such as datetimes, are
+    # compared against constants which the predictor is given.
+    days = [datetime.datetime(1970, 1, day) for day in (1, 2, 3)]
+    data = pd.DataFrame({'t' : days * 4, 'Class' : ['0', '1', '1'] * 4})
+    tree = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1')
+    self.assertNotIn('datetime', tree.to_python())
+    labels = [tree.predict_one({'t' : day}) for day in days]
+    self.assertEqual(labels, list(tree.classify(data.iloc[:3])))
+
+  def test_predict_one_labels_only(self):
+    # Check that predict_one uses a predictor which only returns the label,
+    # and which is cached apart from the one which returns supports.
+    data = pd.DataFrame({'x' : np.arange(12),
+      'Class' : ['0'] * 6 + ['1'] * 6})
+    tree = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1')
+    self.assertEqual(tree.predict_one({'x' : 8}), '1')
+    predictor = tree.predictor(labels_only=True)
+    self.assertIs(tree.predictor(labels_only=True), predictor)
+    self.assertEqual(predictor((2,)), '0')
+    self.assertNotIn("'0':", tree.to_python(labels_only=True))
+    self.assertEqual(tree.predictor()((8,)), ('1', {'0' : 0, '1' : 6}))
+
+  def test_predict_one(self):
+    # Check that single data points are classified like a batch.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    tree = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix])
+    expected = tree.classify(data)
+    records = data[['Lines of Code']]
+    self.assertEqual([tree.predict_one(record) for record in
+      records.to_dict('records')], expected)
+    self.assertEqual([tree.predict_one(record) for record in
+      records.itertuples(index=False, name=None)], expected)
+    self.assertEqual([tree.predict_one(record, True, cost_matrix) for record
+      in records.to_numpy()], tree.classify(data, True, cost_matrix))
+
+  def test_classify_stream(self):
+    # Check that classifying in chunks gives the same labels.
+    data = pd.read_csv('data/LOC_SDP.csv')
+    cost_matrix = {'TP' : 1, 'TN' : 0, 'FP' : 1, 'FN' : 5}
+    tree = Tree(data=data, build=True, split_func=cost_reduction_split,
+      class_attribute='Defective', positive_class='1',
+      split_func_args=['1', cost_matrix])
+    expected = tree.classify(data)
+    chunks = [data.iloc[start:start + 6] for start in range(0, 20, 6)]
+    labels = [label for chunk in tree.classify_stream(chunks) for label in
+      chunk]
+    self.assertEqual(labels, expected)
+    arrays = [chunk[['Lines of Code']].to_numpy() for chunk in chunks]
+    for labels, leaves in tree.classify_stream(arrays, return_leaves=True):
+      self.assertEqual(len(labels), len(leaves))
+    output = io.StringIO()
+    self.assertEqual(tree.classify_to_file(chunks, output), 20)
+    self.assertEqual(output.getvalue().split(), ['label'] + expected)
+
+  def test_profiler(self):
+    # Check that every node of a profiled build records an event.
+    data = pd.DataFrame({'x' : np.arange(40),
+      'Class' : ((np.arange(40) // 5) % 2).astype(str)})
+    finished = []
+    profiler = Build_Profiler(callbacks=[finished.append])
+    tree = Tree(data=data, build=True, split_func=gini_split,
+      class_attribute='Class', positive_class='1', profiler=profiler)
+    report = profiler.report()
+    self.assertEqual(report['nodes'], tree.num_nodes)
+    self.assertEqual(report['split'], tree.num_nodes - len(tree.get_leaves()))
+    self.assertEqual(len(finished), tree.num_nodes)
+    self.assertEqual(tree.root.profile['rows'], 40)
+    self.assertEqual(tree.root.profile['candidates'], 39)
+    self.assertIn('find_best_split', str(profiler))
+
+    # Memory peaks are only recorded for nodes which weren't split at the same
+    # time as another node.
+    data['y'] = np.arange(40) * 7 % 40
+    data['Class'] = (np.arange(40) % 8 < 3).astype(int).astype(str)
+    for best_first, max_leaves in ((False, None), (True, 4)):
+      profiler = Build_Profiler(trace_memory=True)
+      tree = Tree(data=data, build=True, split_func=gini_split,
+        class_attribute='Class', positive_class='1', profiler=profiler,
+        best_first=best_first, max_leaves=max_leaves)
+      peaks = [event['peak_memory'] for event in profiler.events]
+      self.assertEqual(None in peaks, best_first)
+      self.assertIsNotNone(peaks[0])
+      self.assertEqual(profiler.traced_events, {})
+      self.assertFalse(tracemalloc.is_tracing())
+
+    # Tracing which was started before the build is left running, and its
+    # peak isn't reset.
+    tracemalloc.start()
+    try:
+      profiler = Build_Profiler(trace_memory=True)
+      Tree(data=data, build=True, split_func=gini_split,
+        class_attribute='Class', positive_class='1', profiler=profiler)
+      self.assertTrue(tracemalloc.is_tracing())
+      self.assertEqual([event['peak_memory'] for event in profiler.events],
+        [None] * len(profiler.events))
+    finally:
+      tracemalloc.stop()
+
 if __name__ == '__main__':
     unittest.main(exit=False)
@@ -9,10 +9,22 @@ pruning function.
 
 import copy
 import collections
+import concurrent.futures
+import functools
+import heapq
+import json
+import threading
+import time
+import tracemalloc
+import types
 import pandas as pd
 import numpy as np
 import datacost as dc
 
+# Information gains which differ by less than this are treated as equal, so
+# that rounding doesn't leave a split out of gain_ratio_split.
+_GAIN_TOLERANCE = 1e-12
+
 class Split_Test:
   """A class for describing a decision tree split test.
 
@@ -24,9 +36,12 @@ class Split_Test:
     operator (str): Can be '<=' or '>'. For example, if the operator is '>'
       then the test will be 'if attribute > split_value. This value is only
       used when attribute_type = 'numerical'.
+    score (float): The score of the split under the criterion of the split
+      function which chose it, if it records one. Higher is better. None
+      otherwise.
   """
   def __init__(self, attribute_type=None, attribute=None, split_value=None,
-    operator=None):
+    operator=None, score=None):
     """The Split_Test constructor.
 
     The values of the resulting Split_Test object are set as the arguments.
@@ -43,11 +58,14 @@ class Split_Test:
       operator (str): Can be '<=' or '>'. For example, if the operator is '>'
         then the test will be 'if attribute > split_value. This value is only
         used when attribute_type = 'numerical'.
+      score (float): The score of the split, if the split function records
+        one.
     """
     self.attribute_type = attribute_type
     self.attribute = attribute
     self.split_value = split_value
     self.operator = operator
+    self.score = score
 
   def is_numerical(self):
     """Returns whether or not the Split_Test attribute is numerical.
@@ -105,7 +123,8 @@ class Split_Test:
     Returns:
       (boolean): True if self and other are equal. False otherwise.
     """
-    if self.attribute_type != other.attribute_type or\
+    if not isinstance(other, Split_Test) or\
+      self.attribute_type != other.attribute_type or\
       self.attribute != other.attribute or\
       self.split_value != other.split_value or\
       self.operator != other.operator:
@@ -122,7 +141,19 @@ class Split_Test:
     Returns:
       (boolean): True if self and other are not equal. False otherwise.
     """
-    return not __eq__(other)
+    return not self.__eq__(other)
+
+  def __hash__(self):
+    """Split_Test hash function.
+
+    Equal Split_Test objects have equal hashes, so they can be used as
+    dictionary keys. A Split_Test should not be changed while it is one.
+
+    Returns:
+      (int): The hash of this Split_Test object.
+    """
+    return hash((self.attribute_type, self.attribute, self.split_value,
+      self.operator))
 
 class Branch:
   """A class for describing a decision tree branch.
@@ -184,29 +215,630 @@ class Branch:
     """
     return not __eq__(other)
 
+class Schema:
+  """A class for describing the attributes of the data of a tree.
+
+  The schema is worked out once from the training data, and is then shared by
+  the Dataset and every node of the tree.
+
+  Attributes:
+    attribute_names (list<str>): The name of each column, in the same order as
+      the original data.
+    attribute_types (list<str>): The type of each column. Either 'numerical'
+      or 'categorical'.
+    positions (dict<int>): The position of each column in attribute_names.
+    class_attribute (string): The name of the class attribute.
+    class_values (list<str>): The sorted class values. Since the class values
+      may be non-string types, they are converted to strings. Missing class
+      values are left out.
+    category_values (dict<numpy.ndarray>): The sorted values of each
+      categorical attribute (other than the class attribute).
+    float_dtype (numpy.dtype): The type which numerical columns are stored
+      as, or None if they keep their own types.
+  """
+  def __init__(self, data, class_attribute=None, float32=False):
+    """The Schema constructor.
+
+    Args:
+      data (pandas.DataFrame): The data to describe.
+      class_attribute (string): The name of the class attribute.
+      float32 (boolean): Whether to store numerical columns as float32, which
+        halves their memory. Values which float32 can't represent exactly are
+        rounded, and so are the split values found from them.
+    """
+    self.attribute_names = list(data.columns)
+    self.positions = {name : position for position, name in
+      enumerate(self.attribute_names)}
+    self.class_attribute = class_attribute
+    self.float_dtype = np.dtype(np.float32) if float32 else None
+
+    # Get the attribute types from the data.
+    # The following solution was partly taken from: https://goo.gl/ARws3c
+    numerical_columns = set(data._get_numeric_data().columns)
+    self.attribute_types = []
+    for column in self.attribute_names:
+      if column in numerical_columns:
+        self.attribute_types.append('numerical')
+      else:
+        self.attribute_types.append('categorical')
+
+    # Find the dictionary of each categorical attribute.
+    self.category_values = {}
+    for column, attribute_type in zip(self.attribute_names,
+      self.attribute_types):
+      if column != class_attribute and attribute_type == 'categorical':
+        _, values = pd.factorize(data[column].to_numpy(), sort=True)
+        self.category_values[column] = np.asarray(values)
+
+    self.class_values = []
+    if class_attribute is not None:
+      classes = data[class_attribute].dropna().astype(str).to_numpy().astype(
+        str)
+      self.class_values = [str(value) for value in np.unique(classes)]
+
+  def encode_categories(self, attribute, values):
+    """Encodes the values of a categorical attribute as integer codes.
+
+    Args:
+      attribute (str): The name of the categorical attribute.
+      values (array-like): The values to encode.
+
+    Returns:
+      (numpy.ndarray): The position in category_values of each value, or -1
+        for missing and unknown values. The codes use the smallest signed
+        integer type which can hold them.
+    """
+    categories = self.category_values[attribute]
+    codes = pd.Index(categories).get_indexer(values)
+    return codes.astype(np.min_scalar_type(-len(categories) - 1))
+
+  def encode_classes(self, values):
+    """Encodes class values as integer codes.
+
+    Args:
+      values (pandas.Series): The class values to encode.
+
+    Returns:
+      (numpy.ndarray): The position in class_values of each value, or -1 for
+        unknown values.
+    """
+    return pd.Index(self.class_values).get_indexer(
+      values.astype(str)).astype(np.int64)
+
+class Dataset:
+  """A class for describing the data which is shared by the nodes of a tree.
+
+  Each column of the data is stored once as a read-only numpy array. Nodes
+  refer to their data points using an array of row positions into these
+  columns, rather than each holding their own copy of the data. Categorical
+  attributes are only stored as compact integer codes.
+
+  Attributes:
+    schema (Schema): The description of the attributes, which is shared by
+      every node.
+    attribute_names (list<str>): The attribute_names of the schema.
+    attribute_types (list<str>): The attribute_types of the schema.
+    columns (dict<numpy.ndarray>): The read-only values of each numerical
+      column and of the class attribute. Numerical columns have the schema's
+      float_dtype, if it is set.
+    index (pandas.Index): The row labels of the original data.
+    num_training_records (int): The number of data points which the tree is
+      trained on. This is the number of rows, unless the data is a sample of
+      data which is read in chunks (see Tree.build_streaming).
+    class_attribute (string): The name of the class attribute.
+    class_values (list<str>): The class_values of the schema.
+    class_codes (numpy.ndarray): The position in class_values of each row's
+      class value.
+    category_values (dict<numpy.ndarray>): The category_values of the schema.
+    category_codes (dict<numpy.ndarray>): For each categorical attribute, the
+      position in category_values of each row's value. -1 for missing values.
+    bin_edges (dict<numpy.ndarray>): The ascending bin edges of each binned
+      numerical attribute. Empty unless the Dataset has been binned.
+    bin_codes (dict<numpy.ndarray>): The bin of each row for each binned
+      numerical attribute. A value is in bin i if it is <= bin_edges[i] and
+      > bin_edges[i - 1]. -1 for missing values.
+  """
+  def __init__(self, data, class_attribute=None, schema=None, float32=False):
+    """The Dataset constructor.
+
+    Args:
+      data (pandas.DataFrame): The data to store.
+      class_attribute (string): The name of the class attribute.
+      schema (Schema): The schema of the data. If this is None, it is worked
+        out from the data.
+      float32 (boolean): Whether to store numerical columns as float32. Only
+        used if schema is None. See Schema.
+
+    Raises:
+      ValueError: If the data has a missing class value, or a class value
+        which schema doesn't have. Data points without a class value can't be
+        trained on, so they have to be removed first.
+    """
+    if schema is None:
+      schema = Schema(data, class_attribute, float32)
+    self.schema = schema
+    self.attribute_names = schema.attribute_names
+    self.attribute_types = schema.attribute_types
+    self.category_values = schema.category_values
+    self.class_values = schema.class_values
+    self.index = data.index
+    self.num_training_records = len(data.index)
+    self.class_attribute = class_attribute
+
+    # Store each numerical column (and the class attribute) as a read-only
+    # numpy array. Each categorical attribute is encoded once as integer
+    # codes instead, so that nodes can be partitioned and counted by category
+    # in a single pass.
+    self.columns = {}
+    self.category_codes = {}
+    for column, attribute_type in zip(self.attribute_names,
+      self.attribute_types):
+      if column in self.category_values:
+        values = schema.encode_categories(column, data[column].to_numpy())
+      elif attribute_type == 'numerical' and column != class_attribute and\
+        schema.float_dtype is not None:
+        values = data[column].to_numpy(dtype=schema.float_dtype, copy=True)
+      else:
+        values = np.array(data[column].to_numpy())
+      values.flags.writeable = False
+      if column in self.category_values:
+        self.category_codes[column] = values
+      else:
+        self.columns[column] = values
+
+    # Encode the class values once so that the class supports of any set of
+    # rows can be counted without pandas.
+    self.class_codes = None
+    if class_attribute is not None:
+      if data[class_attribute].isna().any():
+        raise ValueError('The data has missing class values. Remove the data '
+          'points without a class value before training on them.')
+      self.class_codes = schema.encode_classes(data[class_attribute])
+      if np.any(self.class_codes < 0):
+        raise ValueError('The data has a class value which isn\'t in the '
+          'schema.')
+
+    self.bin_edges = {}
+    self.bin_codes = {}
+
+  def bin(self, max_bins):
+    """Discretizes each numerical attribute into at most max_bins bins.
+
+    The bin edges are midpoints between consecutive unique values of the
+    whole dataset, so they are also valid split values. If an attribute has
+    at most max_bins unique values, every midpoint is an edge. Otherwise, the
+    edges are placed at the quantiles of the attribute so that the bins hold
+    a similar number of rows. Missing values are left out of every bin, just
+    as they are left out of both children of a numerical split.
+
+    Args:
+      max_bins (int): The maximum number of bins per attribute.
+    """
+    self.bin_edges = {}
+    self.bin_codes = {}
+    for name, attribute_type in zip(self.attribute_names,
+      self.attribute_types):
+      if name == self.class_attribute or attribute_type != 'numerical':
+        continue
+      column = self.columns[name]
+      missing = np.isnan(column)
+      finite_values = column[~missing]
+      unique_values = np.unique(finite_values).astype(np.float64)
+      edges = _midpoints(unique_values[:-1], unique_values[1:])
+      if len(edges) > max_bins - 1:
+        quantiles = np.quantile(finite_values,
+          np.arange(1, max_bins) / max_bins, method='lower')
+        positions = np.unique(np.searchsorted(unique_values, quantiles))
+        edges = edges[positions[positions < len(edges)]]
+
+      codes = np.searchsorted(edges, column, side='left')
+      codes[missing] = -1
+      self.bin_edges[name] = edges
+      self.bin_codes[name] = codes.astype(np.min_scalar_type(-len(edges) - 1))
+
+  def num_records(self):
+    """Gets the number of records in this Dataset object.
+
+    Returns:
+      (int): The number of records.
+    """
+    return len(self.index)
+
+  def to_frame(self, rows):
+    """Creates a DataFrame containing some of the rows of this dataset.
+
+    Args:
+      rows (numpy.ndarray): The positions of the rows to include.
+
+    Returns:
+      (pandas.DataFrame): A new DataFrame with the given rows, in the same
+        order as rows.
+    """
+    frame = {}
+    for column in self.attribute_names:
+      if column in self.category_codes:
+        # Code -1 picks the NaN which is appended for missing values.
+        values = np.append(self.category_values[column].astype(object), np.nan)
+        frame[column] = values[self.category_codes[column][rows]]
+      else:
+        frame[column] = self.columns[column][rows]
+    return pd.DataFrame(frame, index=self.index[rows],
+      columns=self.attribute_names)
+
+  def count_classes(self, rows):
+    """Counts the class codes of some of the rows of this dataset.
+
+    Args:
+      rows (numpy.ndarray): The positions of the rows to count.
+
+    Returns:
+      (numpy.ndarray): The number of rows with each class value, in the order
+        of class_values.
+    """
+    return np.bincount(self.class_codes[rows], minlength=len(self.class_values))
+
+  def count_class_values(self, rows):
+    """Counts the class values of some of the rows of this dataset.
+
+    Args:
+      rows (numpy.ndarray): The positions of the rows to count.
+
+    Returns:
+      (dict<int>): The class supports of the rows. Each key is a class value
+        and each value is the number of rows with that class value. Every
+        class value is included, even when its count is zero.
+    """
+    return dict(zip(self.class_values, self.count_classes(rows).tolist()))
+
+  def encode(self, data_points):
+    """Encodes new data points in the same way as the rows of this dataset.
+
+    Args:
+      data_points (pandas.DataFrame): The data points to encode. They must have
+        the same columns as this dataset.
+
+    Returns:
+      (tuple): A (class_codes, codes) tuple. class_codes holds the position in
+        class_values of each data point's class value. codes holds the
+        category codes of each categorical attribute and the bin codes of each
+        binned numerical attribute. Unknown class values and categories, and
+        missing values, are given the code -1.
+    """
+    class_codes = self.schema.encode_classes(data_points[self.class_attribute])
+    codes = {}
+    for attribute in self.category_values:
+      codes[attribute] = self.schema.encode_categories(attribute,
+        data_points[attribute]).astype(np.int64)
+    for attribute, edges in self.bin_edges.items():
+      values = data_points[attribute].to_numpy(dtype=float)
+      codes[attribute] = np.searchsorted(edges, values, side='left')
+      codes[attribute][np.isnan(values)] = -1
+    return class_codes, codes
+
+class Build_Profiler:
+  """A class for instrumenting the building of a tree.
+
+  A profiler is turned on by passing it to Tree (or setting the profiler
+  attribute of a root node). The nodes then record an event each, which
+  holds the time spent in each phase of finding and making the node's split.
+  Nodes without a profiler only pay for checking that it is None.
+
+  The phases are the Node methods of the same name. Their times are
+  inclusive, so for example the time of find_best_split includes the time
+  the split function spent in split_statistics. Nodes whose subtrees are
+  built on other processes (see Tree.build) are not profiled.
+
+  Attributes:
+    events (list<dict>): The event of each profiled node, in the order they
+      were started. Each event holds the node's 'depth' and number of 'rows',
+      the 'seconds' and number of 'calls' of each phase, the number of
+      candidate splits whose supports were computed ('candidates'), whether
+      the node was 'split' (None until apply_split is called) and, if memory
+      is traced, the 'peak_memory' in bytes allocated while it was split.
+      tracemalloc only has one peak for the whole process, so peak_memory is
+      left None for nodes whose split overlapped another node's (as with
+      best_first growth). Memory peaks are only meaningful for a build which
+      splits one node at a time. If tracemalloc was already tracing before
+      the build, its peak is left alone and every peak_memory is None. The
+      threads of one node's split search (see Node.find_best_split) are
+      counted towards that node.
+    callbacks (list<function>): Functions which are called with each event
+      once its node has been split (or not).
+    trace_memory (boolean): Whether to trace memory allocations with
+      tracemalloc. This makes building much slower. Tracing which the
+      profiler started is stopped when the build finishes (see close).
+    started_tracing (boolean): Whether the profiler started tracemalloc
+      itself.
+  """
+  def __init__(self, callbacks=[], trace_memory=False):
+    """The Build_Profiler constructor.
+
+    Args:
+      callbacks (list<function>): Functions to call with each finished event.
+      trace_memory (boolean): Whether to record the peak memory of each node.
+    """
+    self.events = []
+    self.callbacks = list(callbacks)
+    self.trace_memory = trace_memory
+    self.lock = threading.Lock()
+    self.traced_events = {}
+    self.started_tracing = False
+
+  def event(self, node):
+    """Gets the event of a node, starting it if needed.
+
+    Args:
+      node (Node): The profiled node.
+
+    Returns:
+      (dict): The node's event.
+    """
+    if node.profile is None:
+      node.profile = {'depth' : node.depth, 'rows' : node.num_records(),
+        'seconds' : collections.defaultdict(float),
+        'calls' : collections.defaultdict(int), 'candidates' : 0,
+        'split' : None, 'peak_memory' : None}
+      with self.lock:
+        self.events.append(node.profile)
+        if self.trace_memory:
+          self.start_memory(node.profile)
+    return node.profile
+
+  def start_memory(self, event):
+    """Starts tracing the peak memory of an event.
+
+    The peak is only reset if no other traced event is open. Otherwise the
+    events overlap, so none of them are given a peak. If something else
+    started tracing, its peak isn't reset, so the event isn't given a peak
+    either. The caller must hold the lock.
+
+    Args:
+      event (dict): The event which was just started.
+    """
+    if not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self.started_tracing = True
+    if not self.started_tracing:
+      event['start_memory'] = None
+    elif self.traced_events:
+      event['start_memory'] = None
+      for other in self.traced_events.values():
+        other['start_memory'] = None
+    else:
+      tracemalloc.reset_peak()
+      event['start_memory'] = tracemalloc.get_traced_memory()[0]
+    self.traced_events[id(event)] = event
+
+  def close(self):
+    """Stops tracing memory if this profiler started it.
+
+    Tree calls this when a build finishes, so that the process isn't left
+    traced. The events which are still open are not given a peak.
+    """
+    with self.lock:
+      for event in self.traced_events.values():
+        event.pop('start_memory', None)
+      self.traced_events = {}
+      if self.started_tracing:
+        tracemalloc.stop()
+        self.started_tracing = False
+
+  def record(self, node, phase, seconds):
+    """Adds the time of a call of a phase to a node's event.
+
+    Args:
+      node (Node): The profiled node.
+      phase (str): The name of the phase.
+      seconds (float): The time the call took.
+    """
+    event = self.event(node)
+    with self.lock:
+      event['seconds'][phase] += seconds
+      event['calls'][phase] += 1
+
+  def count_candidates(self, node, num_candidates):
+    """Adds to the number of candidate splits evaluated for a node.
+
+    Args:
+      node (Node): The profiled node.
+      num_candidates (int): The number of candidates.
+    """
+    event = self.event(node)
+    with self.lock:
+      event['candidates'] += num_candidates
+
+  def finish(self, node, split):
+    """Finishes the event of a node and passes it to the callbacks.
+
+    Args:
+      node (Node): The profiled node.
+      split (boolean): Whether the node was split.
+    """
+    event = self.event(node)
+    event['split'] = split
+    with self.lock:
+      self.traced_events.pop(id(event), None)
+      start_memory = event.pop('start_memory', None)
+      if start_memory is not None and tracemalloc.is_tracing():
+        event['peak_memory'] = tracemalloc.get_traced_memory()[1] -\
+          start_memory
+    for callback in self.callbacks:
+      callback(event)
+
+  def report(self):
+    """Aggregates the events.
+
+    Returns:
+      (dict): The number of profiled 'nodes', the number of them which were
+        'split', their total 'candidates', the deepest 'max_depth', the
+        largest 'peak_memory' (None unless memory is traced) and, for each
+        phase, its total 'seconds' and 'calls' and its share of the total
+        time of find_best_split and apply_split ('fraction').
+    """
+    phases = {}
+    for event in self.events:
+      for phase, seconds in event['seconds'].items():
+        totals = phases.setdefault(phase, {'seconds' : 0.0, 'calls' : 0})
+        totals['seconds'] += seconds
+        totals['calls'] += event['calls'][phase]
+    total = sum(phases[phase]['seconds'] for phase in ('find_best_split',
+      'apply_split') if phase in phases)
+    for totals in phases.values():
+      totals['fraction'] = totals['seconds'] / total if total else 0.0
+    memory = [event['peak_memory'] for event in self.events if
+      event['peak_memory'] is not None]
+    return {
+      'nodes' : len(self.events),
+      'split' : sum(1 for event in self.events if event['split']),
+      'candidates' : sum(event['candidates'] for event in self.events),
+      'max_depth' : max((event['depth'] for event in self.events), default=0),
+      'peak_memory' : max(memory) if memory else None,
+      'phases' : phases,
+    }
+
+  def __str__(self):
+    """The string representation of the aggregate report.
+
+    Returns:
+      (str): A table of the phases followed by the totals.
+    """
+    report = self.report()
+    lines = ['{:<20} {:>10} {:>10} {:>7}'.format('phase', 'seconds', 'calls',
+      'share')]
+    for phase, totals in sorted(report['phases'].items(),
+      key=lambda item: -item[1]['seconds']):
+      lines.append('{:<20} {:>10.4f} {:>10} {:>6.1%}'.format(phase,
+        totals['seconds'], totals['calls'], totals['fraction']))
+    lines.append('{} nodes, {} split, {} candidates, max depth {}'.format(
+      report['nodes'], report['split'], report['candidates'],
+      report['max_depth']))
+    return '\n'.join(lines)
+
+def _profiled(method):
+  """Decorates a Node method so that it is timed when profiling.
+
+  The phase is named after the method. If the method is apply_split, the
+  node's event is also finished with its result.
+
+  Args:
+    method (function): The Node method.
+
+  Returns:
+    (function): The decorated method.
+  """
+  phase = method.__name__
+  @functools.wraps(method)
+  def profiled_method(self, *args, **kwargs):
+    profiler = self.profiler
+    if profiler is None:
+      return method(self, *args, **kwargs)
+    profiler.event(self)
+    start = time.perf_counter()
+    result = method(self, *args, **kwargs)
+    profiler.record(self, phase, time.perf_counter() - start)
+    if phase == 'apply_split':
+      profiler.finish(self, result)
+    return result
+  return profiled_method
+
+def _closes_profiler(method):
+  """Decorates a Tree method so that its profiler is closed when it returns.
+
+  Args:
+    method (function): The Tree method which builds the tree.
+
+  Returns:
+    (function): The decorated method.
+  """
+  @functools.wraps(method)
+  def closing_method(self, *args, **kwargs):
+    try:
+      return method(self, *args, **kwargs)
+    finally:
+      if self.profiler is not None:
+        self.profiler.close()
+  return closing_method
+
 class Node:
   """A class for describing a decision tree node.
 
   Attributes:
     is_leaf (boolean): True if this node is a leaf. False otherwise.
     is_root (boolean): True if this node is the root. False otherwise.
-    data_points (pandas.DataFrame): The data contained in this node.
+    data_points (pandas.DataFrame): The data contained in this node. It is
+      created from dataset and rows when it is first asked for, and released
+      again once the node has been split.
+    dataset (Dataset): The data shared by every node of the tree.
+    rows (numpy.ndarray): The positions in dataset of this node's data points.
+      None if the node was grown from streamed data (see Tree.build_streaming),
+      in which case only its class_supports, histograms and category_tables
+      are known.
     class_attribute (string): The name of the class attribute. e.g.:'Defective'
     positive_class (string): The positive class value.
-    attribute_types (pandas.dtype): The type of each column in data_points.
+    attribute_types (list<str>): The type of each column in data_points. It
+      is read from the schema of the dataset, which every node shares.
     class_supports (dict<int>): The number of data points for each class value.
       This is represented as a dictionary where each key is the name of the
       class value and each dictionary value is the number of records with that
-      class value.
+      class value. It is a read-only view of supports, which is built each
+      time it is asked for. Setting it replaces supports.
+    class_values (list<str>): The class values which supports are counted
+      for, in sorted order. Every node of a tree shares the class_values of
+      its dataset.
+    supports (numpy.ndarray): The number of data points for each of
+      class_values.
     parent (Node): The parent node of this node.
+    depth (int): The number of branches between this node and the root.
     children (List<Node>): A list of all this node's children.
     parent_branch (Branch): The branch connecting this node to its parent.
     child_branches (List<Branch>): A list containing the branches which connect
       this node to each of its children.
+    split_cache_size (int): The maximum number of split tests to keep in each
+      node's split_cache.
+    attribute_subset (list<str>): If this is not None, only these attributes
+      are considered by get_possible_splits and candidate_attributes.
+    split_subset (list<Split_Test>): If this is not None, get_possible_splits
+      returns only these splits.
+    split_cache (collections.OrderedDict): The partitions and child supports
+      of the most recently used split tests, keyed by Split_Test. At most
+      split_cache_size tests are kept, and the cache is emptied once the node
+      has been split.
+    histograms (dict<numpy.ndarray>): The histograms of this node which have
+      been computed so far. See Node.histogram. Only leaves keep them.
+    category_tables (dict<numpy.ndarray>): The category x class contingency
+      tables which were accumulated for this node from streamed data. See
+      Node.category_supports. Empty unless the node was grown from streamed
+      data.
+    sorted_indexes (dict<numpy.ndarray>): The presorted index arrays of this
+      node. Each key is a numerical attribute name and each value holds the
+      positions of data_points in ascending order of that attribute. It is
+      empty unless the node (or the root it descends from) was presorted.
+    profiler (Build_Profiler): The profiler which instruments this node, or
+      None. It is passed on to the node's children.
+    profile (dict): This node's event in its profiler. None unless the node
+      has been profiled.
+    max_features (int): If this is not None, only a random sample of this
+      many attributes is considered by candidate_attributes. See
+      Node.randomize.
+    max_thresholds (int): If this is not None, only a random sample of this
+      many thresholds is considered for each numerical attribute. See
+      Node.randomize.
+    seed (int): The seed which this node's random samples are drawn with.
+      Each child gets its own seed, derived from its parent's.
+    min_samples_leaf (int): Candidate splits which would create a child with
+      fewer data points are left out of get_possible_splits and
+      split_statistics, and skipped by the built-in split functions. It is
+      set by find_allowed_split.
+    version (int): The number of times the tree below this node has been
+      changed by splitting, pruning or grafting nodes, or by setting their
+      class_supports. It is only kept on the root. See Node.changed.
   """
+  split_cache_size = 32
+
   def __init__(self, data=None, class_attribute=None, positive_class=None,
     build=False, split_func=None, split_func_args=[], is_root=False,
-    parent=None, parent_branch=None):
+    parent=None, parent_branch=None, presort=False, sorted_indexes=None,
+    dataset=None, rows=None, n_jobs=1):
     """The Node constructor.
 
     Builds a Node object based on the arguments. Build is performed using the
@@ -228,38 +860,68 @@ class Node:
       is_root (boolean): Whether or not this Node is a root of a tree.
       parent (Node): The parent node of this node.
       parent_branch (Branch): The parent branch of this node.
+      presort (boolean): Whether or not to sort each numerical attribute of the
+        data as part of the object construction process. The sorted index
+        arrays are passed down to the children when splitting, so nodes below
+        this one never need to sort again.
+      sorted_indexes (dict<numpy.ndarray>): Presorted index arrays for the
+        data, as partitioned by the parent node. Only used by Node.split.
+      dataset (Dataset): The shared data of the tree. Used instead of data
+        when the node is created from a parent or by a Tree.
+      rows (numpy.ndarray): The positions in dataset of this node's data
+        points. Every row of dataset is used if this is None.
+      n_jobs (int): The number of threads to use when searching for a split.
+        See Node.find_best_split.
     """
-    self.data_points = data
     self.class_attribute = class_attribute
     self.positive_class = positive_class
     self.is_leaf = True
     self.is_root = is_root
-    self.parent = None
+    self.parent = parent
+    self.depth = 0
+    if parent is not None:
+      self.depth = parent.depth + 1
     self.children = []
     self.child_branches = []
+    self.attribute_subset = None
+    self.split_subset = None
+    self.histograms = {}
+    self.category_tables = {}
+    self.split_cache = collections.OrderedDict()
+    self.profiler = None
+    self.profile = None
+    self.max_features = None
+    self.max_thresholds = None
+    self.seed = None
+    self.min_samples_leaf = 1
+    self.version = 0
 
-    # Get the attribute types from the data.
-    # The following solution was partly taken from: https://goo.gl/ARws3c
-    # Only perform this if data was provided to the constructor:
-    self.attribute_types = []
+    # The node only holds row positions into the shared data. If a DataFrame
+    # was given, it becomes the shared data of this node and its descendants.
     if data is not None:
-      columns = data.columns
-      numerical_columns = data._get_numeric_data().columns
-      categorical_indexes = list(set(columns) - set(numerical_columns))
-      for column in range(len(columns)):
-        if column in categorical_indexes:
-          self.attribute_types.append('categorical')
-        else:
-          self.attribute_types.append('numerical')
-
-    # If the class attribute and data were provided, calculate the class
-    # supports. Since the class values may be non-string types, convert them to
-    # strings.
-    if data is not None and class_attribute is not None:
-      self.class_supports = data[class_attribute].value_counts().to_dict()
-      self.class_supports = {str(k):v for k,v in self.class_supports.items()}
+      dataset = Dataset(data, class_attribute)
+    if dataset is not None and rows is None:
+      rows = np.arange(dataset.num_records())
+    self.dataset = dataset
+    self.rows = rows
+    self._data_points = None
+
+    # If the class attribute and data were provided, count the class codes.
+    # The counts always hold every class value of the dataset.
+    if dataset is not None and class_attribute is not None:
+      self.class_values = dataset.class_values
+      self.supports = dataset.count_classes(rows)
     else:
-      self.class_supports = {}
+      self.class_values = []
+      self.supports = np.zeros(0, dtype=np.int64)
+
+    # Use the presorted index arrays if they were given. Otherwise, sort the
+    # numerical attributes now if the presort flag was set.
+    self.sorted_indexes = {}
+    if sorted_indexes is not None:
+      self.sorted_indexes = sorted_indexes
+    elif presort and dataset is not None:
+      self.presort()
 
     # Set the parent branch if this node is not a root node.
     if not self.is_root:
@@ -269,9 +931,10 @@ class Node:
 
     # Split the node if the build flag was set.
     if build:
-      self.split(split_func=split_func, split_func_args=split_func_args)
+      self.split(split_func=split_func, split_func_args=split_func_args,
+        n_jobs=n_jobs)
 
-  def split(self, split_func, recursive=False, split_func_args=[]):
+  def split(self, split_func, recursive=False, split_func_args=[], n_jobs=1):
     """If a split can be found, the current node gets children from it.
 
     The children are also split if recursive is set to True.
@@ -285,6 +948,37 @@ class Node:
         function. They are passed in the same order as this list.
       recursive (boolean): A flag which determines whether the resulting
         children should also be split.
+      n_jobs (int): The number of threads to use when searching for a split.
+        See Node.find_best_split.
+
+    Returns:
+      (boolean) : True if a split was performed, False otherwise.
+
+    Raises:
+      ValueError: If this node is not a leaf.
+    """
+    if not self.is_leaf:
+      raise ValueError('Cannot split a node which is not a leaf.')
+
+    # Find the best split based on the split function, and split this node
+    # using it.
+    test = self.find_best_split(split_func, split_func_args, n_jobs)
+    if not self.apply_split(test):
+      return False
+
+    # If the recursive flag is set, grow the children's subtrees too.
+    if recursive:
+      for child in self.children:
+        child.grow(split_func, split_func_args, n_jobs)
+    return True
+
+  @_profiled
+  def apply_split(self, test):
+    """Gives this node a child for each partition of a split test.
+
+    Args:
+      test (Split_Test): The split test to split this node with. If it is
+        None, no split is performed.
 
     Returns:
       (boolean) : True if a split was performed, False otherwise.
@@ -295,104 +989,48 @@ class Node:
     if not self.is_leaf:
       raise ValueError('Cannot split a node which is not a leaf.')
 
-    # Find the best split based on the split function and create an empty
-    # list of children which will be populated based on the split. Also create
-    # a child branches list which has a similar purpose.
-    test = split_func(self, *split_func_args)
+    # Create an empty list of children which will be populated based on the
+    # split. Also create a child branches list which has a similar purpose.
     children = []
     child_branches = []
-      
+
+    # The data points DataFrame is only kept while the split function might
+    # use it.
+    self._data_points = None
+
     # If there was no suitable test found:
     if test is None:
+      self.split_cache.clear()
       return False
 
-    # If the test attribute is categorical:
-    if test.attribute_type == 'categorical':
-      # The following solution to splitting based on a categorical attribute
-      # was guided by the following stackoverflow answer by user
-      # 'woody pride': https://goo.gl/uohhDi
-      possible_values = self.data_points.loc(test.attribute_name).unique()
-      data_splits = {elem : pd.DataFrame for elem in possible_values}
-      for key in data_splits.keys():
-        data_splits[key] = data[:][data.Names == key]
-
-      # Create a new Node object for each resulting split.
-      for split in data_splits.keys():
-        data = data_splits[split]
-        class_attribute = self.class_attribute
-
-        # If the rescursive flag is set, create children which also split.
-        child = None # Created below in the if-else block.
-        if recursive:
-          child = Node(data=data, parent=self,
-            class_attribute=self.class_attribute,
-            positive_class=self.positive_class, build=True,
-            split_func=split_func, split_func_args=split_func_args)
-        else:
-          child = Node(data=data, parent=self,
-            class_attribute=self.class_attribute,
-            positive_class=self.positive_class)
-
-        # Create a branch connecting the child to the parent.
-        parent_branch = Branch(self, child, test)
-        child.parent_branch = parent_branch
-        children.append(child)
-        child_branches.append(copy.deepcopy(parent_branch))
-
-    # If the test attribute is numerical:
-    elif test.attribute_type == 'numerical':
-
-      # Get the data points for the left and right splits. Store the results
-      # in a dictionary where the keys are 'left' and 'right'. These
-      # represent the '<=' and '>' splits respectively.
-      split_tests = {}
-      data_splits = {}
-
-       # Create an alias variable to make the following code cleaner.
-      data_points = self.data_points
-
-      split_tests['left'] = data_points[test.attribute] <= test.split_value
-      data_splits['left'] = data_points[split_tests['left']]
-      split_tests['right'] = data_points[test.attribute] > test.split_value
-      data_splits['right'] = data_points[split_tests['right']]
-
-      # Create the left and right children. If the recursive flag is set,
-      # create children which also split.
-      for split in data_splits.keys():
-        data = data_splits[split]
-        class_attribute = self.class_attribute
-
-        # If the recursive flag is set, create children which also split.
-        child = None # Created below in the if-else block.
-        if recursive:
-          child = Node(data=data, parent=self,
-            class_attribute=class_attribute,
-            positive_class=self.positive_class, build=True,
-            split_func=split_func, split_func_args=split_func_args)
-        else:
-          child = Node(data=data, parent=self, class_attribute=class_attribute,
-            positive_class=self.positive_class)
-        
-        # Create a branch connecting the child to the parent.
-        if split == 'left':
-          test.operator = '<='
-        else:
-          test.operator = '>'
-        parent_branch = Branch(self, child, test)
-        child.parent_branch = parent_branch
-        children.append(child)
-        child_branches.append(copy.deepcopy(parent_branch))
-
-    # Make sure that the class support counts for each resulting child has
-    # a count for each class value of the parent even when it's zero.
-    for child in children:
-      for value in self.class_supports:
-        if value not in child.class_supports:
-          child.class_supports[value] = 0
-    for branch in child_branches:
-      for value in self.class_supports:
-        if value not in branch.child.class_supports:
-          branch.child.class_supports[value] = 0
+    # Nodes grown from streamed data have no rows to partition.
+    if self.rows is None:
+      return self.apply_streamed_split(test)
+
+    # Create a child for each partition of this node's rows. The children
+    # refer to the same shared data, and the presorted index arrays (if any)
+    # are partitioned into them. The partition is reused from the split cache
+    # if the split function already asked about this test. After this, the
+    # cache is no longer needed.
+    partitions = self.partition(test)
+    self.split_cache.clear()
+    child_sorted_indexes = self.partition_sorted_indexes([positions for _,
+      positions in partitions])
+    for index, ((child_test, positions), sorted_indexes) in enumerate(
+      zip(partitions, child_sorted_indexes)):
+
+      child = Node(dataset=self.dataset, rows=self.rows[positions],
+        parent=self, class_attribute=self.class_attribute,
+        positive_class=self.positive_class, sorted_indexes=sorted_indexes)
+      child.profiler = self.profiler
+      child.randomize(self.max_features, self.max_thresholds,
+        self.child_seed(index))
+
+      # Create a branch connecting the child to the parent.
+      parent_branch = Branch(self, child, child_test)
+      child.parent_branch = parent_branch
+      children.append(child)
+      child_branches.append(parent_branch)
 
     # If a split was performed, return True and set the children of this Node
     # to be the child nodes that were created. This Node object is also no
@@ -401,445 +1039,3560 @@ class Node:
       self.child_branches = child_branches
       self.children = children
       self.is_leaf = False
+      self.changed()
+
+      # Derive the children's histograms from this node's. Only the smaller
+      # children are counted. The largest child's histograms are whatever is
+      # left of this node's. This only works if no data points were left out
+      # of the children for having a missing value of the split attribute.
+      largest = max(children, key=lambda child: child.num_records())
+      if sum(child.num_records() for child in children) !=\
+        self.num_records():
+        largest = None
+      for attribute, histogram in self.histograms.items():
+        if largest is None:
+          break
+        remainder = histogram.copy()
+        for child in children:
+          if child is not largest:
+            remainder -= child.histogram(attribute)
+        largest.histograms[attribute] = remainder
+
+      # The presorted index arrays and histograms are only needed to split
+      # leaves.
+      self.sorted_indexes = {}
+      self.histograms = {}
       return True
     else:
       return False
 
-  def prune(self, prune_func=None, prune_func_args=[]):
-    """Removes the children from this node if the prune function says so.
-                                                                            
+  def apply_streamed_split(self, test):
+    """Splits a node which was grown from streamed data.
+
+    Rather than partitioning the node's data points, each child is given the
+    class supports which the node's statistics say it would have. The
+    children's own statistics are accumulated by the next pass over the
+    data.
+
     Args:
-      prune_func (function): A function which takes a node as input and
-        returns True if the node should be pruned, and False otherwise.
-      prune_func_args (list): A list of arguments to pass to the prune 
-        function. They are passed in the same order as this list.
+      test (Split_Test): The split test to split this node with.
+
     Returns:
       (boolean) : True if a split was performed, False otherwise.
-                                                                              
-    Raises:
-      ValueError: If any of this node's children are not leaves.
     """
-    if not all(child.is_leaf for child in self.children):
-      raise ValueError("Can't prune a node with a non-leaf child.")
-
-    # If the prune function returns true, prune the node and return True.
-    # Otherwise, return False.
-    if prune_func(self, *prune_func_args):
-      self.children = []
-      self.is_leaf = True
-      self.child_branches = []
-      return True
+    if test.is_categorical():
+      values, _ = self.category_supports(test.attribute)
+      child_tests = []
+      for value in values:
+        child_test = copy.copy(test)
+        child_test.split_value = value
+        child_tests.append(child_test)
     else:
+      child_tests = [copy.copy(test), copy.copy(test)]
+      child_tests[0].operator = '<='
+      child_tests[1].operator = '>'
+
+    children = []
+    child_branches = []
+    for index, (child_test, supports) in enumerate(zip(child_tests,
+      self.split_counts(test))):
+      child = Node(class_attribute=self.class_attribute,
+        positive_class=self.positive_class, parent=self)
+      child.dataset = self.dataset
+      child.class_values = self.class_values
+      child.supports = supports
+      child.profiler = self.profiler
+      child.randomize(self.max_features, self.max_thresholds,
+        self.child_seed(index))
+      parent_branch = Branch(self, child, child_test)
+      child.parent_branch = parent_branch
+      children.append(child)
+      child_branches.append(parent_branch)
+    self.split_cache.clear()
+
+    if len(children) < 2:
       return False
+    self.child_branches = child_branches
+    self.children = children
+    self.is_leaf = False
+    self.histograms = {}
+    self.category_tables = {}
+    self.changed()
+    return True
 
-  def get_possible_splits(self):
-    """Get the possible splits for this dataset. Returns them in a list.
+  def find_allowed_split(self, split_func, split_func_args=[], n_jobs=1,
+    max_depth=None, min_samples_split=2, min_samples_leaf=1, min_gain=None,
+    gain_func=None, compute_gain=False):
+    """Finds the best split which the pre-pruning limits allow.
 
-    The list that is returned contains both categorical and numerical splits.
+    The limits are checked before any children are created. The depth and
+    size of this node are checked before the split function is even called.
+    Splits which min_samples_leaf doesn't allow are left out of the search
+    (see Node.min_samples_leaf), so the best of the allowed splits is found
+    even if a better split isn't allowed. The split which is found is still
+    checked, for split functions which don't use the node's statistics.
 
-    Args: None
+    Args:
+      split_func (function): A function which takes a node as input and
+        returns a Split_Test object which describes the best split for this
+        node. The function should return None if there were no good splits
+        found.
+      split_func_args (list): A list of arguments to pass to the split
+        function. They are passed in the same order as this list.
+      n_jobs (int): The number of threads to use when searching for a split.
+        See Node.find_best_split.
+      max_depth (int): Nodes at this depth are not split. None for no limit.
+      min_samples_split (int): Nodes with fewer data points are not split.
+      min_samples_leaf (int): Splits which would create a child with fewer
+        data points are not allowed.
+      min_gain (float): Splits with a lower gain are not allowed. None for no
+        limit.
+      gain_func (function): A function which takes a node and the child
+        supports of a split (as returned by get_split_supports) and returns
+        the gain of the split. Defaults to weighted_gini_gain.
+      compute_gain (boolean): Whether to compute the gain even when min_gain
+        is None.
 
     Returns:
-      (list<Split_Test>) : Split tests which can be used to split this node's
-        data points.
+      (tuple): A (Split_Test, float) tuple of the split and its gain. The gain
+        is None if it wasn't computed. (None, None) if no split is allowed.
     """
-    # Define the list which will be appended to and returned.
-    splits = []
+    if max_depth is not None and self.depth >= max_depth:
+      return None, None
+    if self.num_records() < min_samples_split:
+      return None, None
 
-    # It's cleaner to get the attribute names early.
-    attribute_names = list(self.data_points)
-
-    # For each index in the attribute list:
-    for index in range(len(self.attribute_types)):
-      if attribute_names[index] == self.class_attribute:
-        continue
-      if self.attribute_types[index] == 'categorical':
-        splits.append(Split_Test('categorical', attribute_names[index]))
-      elif self.attribute_types[index] == 'numerical':
-        column = self.data_points[attribute_names[index]]
-        unique_values = column.unique()
-        unique_values.sort()
+    self.min_samples_leaf = min_samples_leaf
+    test = self.find_best_split(split_func, split_func_args, n_jobs)
+    if test is None:
+      return None, None
 
-        # The following solution was taken from: https://goo.gl/8EyjgD
-        a_values = unique_values[1:] # All values but first.
-        b_values = unique_values[:-1] # All values but last.
-        split_values = [(a + b) / 2 for a, b in zip(a_values, b_values)]
+    if min_samples_leaf > 1:
+      sizes = [sum(supports.values()) for supports in
+        self.get_split_supports(test)]
+      if min(sizes) < min_samples_leaf:
+        self.split_cache.clear()
+        return None, None
 
-        for value in split_values:
-          splits.append(Split_Test('numerical', attribute_names[index],
-            value))
+    gain = None
+    if min_gain is not None or compute_gain:
+      if gain_func is None:
+        gain_func = weighted_gini_gain
+      gain = gain_func(self, self.get_split_supports(test))
+      if min_gain is not None and gain < min_gain:
+        self.split_cache.clear()
+        return None, None
+    return test, gain
 
-    # Finally, return the list of splits.
-    return splits
+  def grow(self, split_func, split_func_args=[], n_jobs=1, max_depth=None,
+    min_samples_split=2, min_samples_leaf=1, min_gain=None, gain_func=None):
+    """Splits this node and its descendants until no more splits are found.
 
-  def get_split_supports(self, split_test, posneg=False):
-    """Finds the supports for the children that would result from split_test.
+    The nodes waiting to be split are kept on a work queue rather than on the
+    call stack, so the depth of the subtree is not limited by Python's
+    recursion limit.
 
     Args:
-      split_test (Split_Test): Used to split the data.
-      posneg (Boolean): Whether to return the supports in two categories -
-        positive and negative. Where positive data points have the positive
-        class value and negative records don't.
+      split_func (function): A function which takes a node as input and
+        returns a Split_Test object which describes the best split for this
+        node. The function should return None if there were no good splits
+        found.
+      split_func_args (list): A list of arguments to pass to the split
+        function. They are passed in the same order as this list.
+      n_jobs (int): The number of threads to use when searching for a split.
+        See Node.find_best_split.
+      max_depth (int): See Node.find_allowed_split.
+      min_samples_split (int): See Node.find_allowed_split.
+      min_samples_leaf (int): See Node.find_allowed_split.
+      min_gain (float): See Node.find_allowed_split.
+      gain_func (function): See Node.find_allowed_split.
+    """
+    queue = collections.deque([self])
+    while queue:
+      node = queue.popleft()
+      test, _ = node.find_allowed_split(split_func, split_func_args, n_jobs,
+        max_depth, min_samples_split, min_samples_leaf, min_gain, gain_func)
+      if node.apply_split(test):
+        queue.extend(node.children)
 
-    Returns:
-      (List<Dict>): The i'th element in the list is the i'th class supports,
-        where the class supports are represented in a dictionary. Each key in
-        the dictionary is a class value. Each value is the support count for
-        that value.
+  def changed(self):
+    """Records that the tree which this node belongs to has changed.
+
+    The version of the tree's root is increased, so that anything derived
+    from the tree (such as Tree.compiled) is known to be out of date.
     """
-    # Create a copy of this object and split it using split_test.
-    temp_node = copy.deepcopy(self)
-    temp_node.split(lambda _: split_test)
+    root = self
+    while root.parent is not None:
+      root = root.parent
+    root.version += 1
 
-    # Add the support counts for each child to the return list.
-    split_supports = []
-    for child in temp_node.children:
-      if posneg:
-        supports = {}
-        supports['positive'] = child.num_positive()
-        supports['negative'] = child.num_negative()
-        split_supports.append(supports)
-      else:
-        split_supports.append(child.class_supports)
-
-    return split_supports
+  def flatten(self):
+    """Encodes the subtree below this node as flat arrays.
 
-  def num_records(self):
-    """Gets the number of records in this Node object.
+    Unlike the linked Node objects, the encoding can be pickled however deep
+    the subtree is. It is used to send subtrees which were built on other
+    processes back to be grafted. See Node.graft.
 
     Returns:
-      (int): The number of records in this Node object. (len(data_points)).
+      (dict): The nodes of the subtree in breadth first order, starting with
+        this node. 'parents' holds the index of each node's parent (-1 for
+        this node), 'tests' holds the (attribute_type, attribute,
+        split_value, operator) of the branch to each node (None for this
+        node), 'seeds' holds each node's seed, and each node's rows are
+        rows[offsets[i]:offsets[i + 1]].
     """
-    return len(self.data_points)
+    parents = []
+    tests = []
+    seeds = []
+    rows = []
+    queue = collections.deque([(self, -1)])
+    while queue:
+      node, parent = queue.popleft()
+      index = len(parents)
+      parents.append(parent)
+      test = None
+      if parent >= 0:
+        split_test = node.parent_branch.split_test
+        test = (split_test.attribute_type, split_test.attribute,
+          split_test.split_value, split_test.operator)
+      tests.append(test)
+      seeds.append(node.seed)
+      rows.append(node.rows)
+      queue.extend((child, index) for child in node.children)
+    return {
+      'parents' : np.array(parents, dtype=np.int64),
+      'tests' : tests,
+      'seeds' : seeds,
+      'rows' : np.concatenate(rows),
+      'offsets' : np.cumsum([0] + [len(node_rows) for node_rows in rows]),
+    }
 
-  def num_positive(self):
-    """Gets the number of positive data points in this node.
+  def graft(self, subtree, dataset):
+    """Replaces this leaf's (empty) subtree with one built elsewhere.
 
-    This is a trivial operation. However, it is provided so that the number
-    of negative data points and positive data points are found in the same
-    way.
+    This is used to attach a subtree which was built for this node on another
+    process. The nodes are rebuilt one at a time from the flat encoding, so
+    this isn't limited by the depth of the subtree.
 
-    Returns:
-      (int): The number of positive records in this node.
+    Args:
+      subtree (dict): The subtree, as encoded by Node.flatten. It must have
+        been built from the same data points as this node.
+      dataset (Dataset): The shared data to attach the subtree's nodes to.
     """
-    return self.class_supports[self.positive_class]
+    nodes = [self]
+    parents = subtree['parents']
+    offsets = subtree['offsets']
+    for index in range(1, len(parents)):
+      parent = nodes[parents[index]]
+      node = Node(dataset=dataset,
+        rows=subtree['rows'][offsets[index]:offsets[index + 1]],
+        parent=parent, class_attribute=self.class_attribute,
+        positive_class=self.positive_class)
+      node.randomize(self.max_features, self.max_thresholds,
+        subtree['seeds'][index])
+      branch = Branch(parent, node, Split_Test(*subtree['tests'][index]))
+      node.parent_branch = branch
+      parent.children.append(node)
+      parent.child_branches.append(branch)
+      parent.is_leaf = False
+      nodes.append(node)
+    if not self.is_leaf:
+      self.sorted_indexes = {}
+      self.split_cache.clear()
+      self.changed()
+
+  @_profiled
+  def find_best_split(self, split_func, split_func_args=[], n_jobs=1):
+    """Finds the best split for this node using the split function.
+
+    If n_jobs is greater than one, the attributes are searched in parallel on
+    a pool of threads. The split function is called once per attribute on a
+    copy of this node which is restricted to that attribute (using
+    attribute_subset). If the split function records the score of its splits
+    (as the built-in ones do), the best split of each attribute with the
+    highest score is chosen. Otherwise, the split function is called one
+    last time on a copy restricted to the best split of each attribute (using
+    split_subset) to choose between them. The copies share this node's data,
+    so nothing is copied into the threads.
+
+    Args:
+      split_func (function): A function which takes a node as input and
+        returns a Split_Test object which describes the best split for this
+        node. The function should return None if there were no good splits
+        found.
+      split_func_args (list): A list of arguments to pass to the split
+        function. They are passed in the same order as this list.
+      n_jobs (int): The number of threads to use.
 
-  def num_negative(self):
-    """Gets the number of negative data points in this node.
-                                                                            
     Returns:
-      (int): The number of negative records in this node.
+      (Split_Test): The best split, or None if no good split was found.
     """
-    supports = self.class_supports
-    return np.sum(value for key, value in supports.items()\
-      if key != self.positive_class)
+    attributes = self.candidate_attributes()
+    if n_jobs <= 1 or len(attributes) <= 1:
+      return split_func(self, *split_func_args)
 
-  def num_errors(self, cost_sensitive=False, cost_matrix={}):
-    """Finds the number of resubstitution errors for this node.
+    # Find the best split of each attribute in parallel.
+    # Each copy gets its own split cache, since the threads can't share one.
+    def best_attribute_split(attribute):
+      view = copy.copy(self)
+      view.split_cache = collections.OrderedDict()
+      view.attribute_subset = [attribute]
+      return split_func(view, *split_func_args)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=n_jobs) as pool:
+      attribute_splits = list(pool.map(best_attribute_split, attributes))
 
-    The number of resubstitution errors is described as follows: If the data
-    points contained within this node were classified using this node, how
-    many errors would there be?
+    # Choose between the best splits of each attribute.
+    best_splits = [test for test in attribute_splits if test is not None]
+    if len(best_splits) <= 1:
+      return best_splits[0] if best_splits else None
 
-    Args:
-      cost_sensitive (boolean): Whether or not to determine the label of this
-        node cost-sensitively or not. For example, if this is False, the
-        class value with the highest support is used as the label. If true,
-        the class value with the lowest total cost is used as the label. If
-        this is True, a cost matrix must also be provided.
-      cost_matrix (dict<float>): This is used if the cost_sensitive flag is
-        set to True. It is used to calculate the label with the lowest total
-        cost. It is a dictionary which includes the keys: 'TP', 'TN', 'FP',
-        and 'FN'. The values for this dictionary are the costs associated
-        with the corresponding key. For example, 'TP' : 10 means that a true
-        positive prediction has an associated cost of 10.
+    # If the splits were scored, they are compared without searching again.
+    # The first attribute wins ties, as it would in a serial search.
+    if all(test.score is not None for test in best_splits):
+      best = best_splits[0]
+      for test in best_splits[1:]:
+        if test.score > best.score:
+          best = test
+      return best
+    view = copy.copy(self)
+    view.split_subset = best_splits
+    return split_func(view, *split_func_args)
+
+  def candidate_attributes(self):
+    """Gets the names of the attributes which this node can be split on.
 
     Returns:
-      (int): The number of resubsitution errors for this node.
+      (list<str>): Every attribute except the class attribute, in their
+        original order. If attribute_subset or split_subset is set, only the
+        attributes that they contain are returned. If max_features is set,
+        only this node's random sample of the attributes is returned.
+    """
+    if self.dataset is None:
+      return []
+    attributes = [attribute for attribute in self.dataset.attribute_names if
+      attribute != self.class_attribute]
 
-    Raises:
-      ValueError: If cost_matrix is missing one of the following keys: TP, TN
-        FP, FN. This will only be raised if the cost_sensitive flag is True.
+    # The random sample is drawn from every attribute, so that it doesn't
+    # change when the subsets below are used to restrict it further.
+    if self.max_features is not None:
+      attributes = self.sample_attributes(attributes)
+    if self.attribute_subset is not None:
+      attributes = [attribute for attribute in attributes if attribute in
+        self.attribute_subset]
+    if self.split_subset is not None:
+      split_attributes = [test.attribute for test in self.split_subset]
+      attributes = [attribute for attribute in attributes if attribute in
+        split_attributes]
+    return attributes
+
+  def randomize(self, max_features=None, max_thresholds=None, seed=None):
+    """Sets up random subsampling of the candidate splits of this node.
+
+    Instead of scoring every split, the split functions then only see a
+    random sample of max_features attributes (see candidate_attributes) and,
+    for each numerical attribute, a random sample of max_thresholds of its
+    thresholds (see split_statistics). With max_thresholds=1 this is the
+    randomization of extremely randomized trees. The settings are passed on
+    to the node's children when it is split.
+
+    The samples are drawn from the node's seed, so finding the split of a
+    node twice gives the same split, and a tree built with the same seed is
+    the same tree.
+
+    Args:
+      max_features (int, float or str): The number of attributes to sample
+        at each node. A float is a fraction of the attributes, and 'sqrt' or
+        'log2' are those functions of the number of attributes. None to
+        consider every attribute.
+      max_thresholds (int): The number of thresholds to sample for each
+        numerical attribute at each node. None to consider every threshold.
+      seed (int): The seed of this node. If it is None and either kind of
+        sampling is turned on, a random seed is used.
     """
-    # Get the class supports (so that the following code is cleaner)
-    supports = self.class_supports
-    label = '' # The label for that this node uses to classify records.
-    num_errors = -1 # The value that will be returned.
+    self.max_features = max_features
+    self.max_thresholds = max_thresholds
+    if seed is None and (max_features is not None or
+      max_thresholds is not None):
+      seed = int(np.random.SeedSequence().generate_state(1)[0])
+    self.seed = seed
 
-    if cost_sensitive:
-      if any(k not in cost_matrix for k in ('TP', 'TN', 'FP', 'FN')):
-        raise ValueError('A cost is missing from the passed cost matrix.')
+  def child_seed(self, index):
+    """Derives the seed of one of this node's children.
 
-      # Get the number of positive and negative data points.
-      num_positive = self.num_positive()
-      num_negative = self.num_negative()
+    Args:
+      index (int): The position of the child in children.
 
-      # Using the number of positive and negative data points, find out
-      # whether it is cheapest to label the records in this node object as
-      # positive or negative.
-      cost_positive = dc.cost_labelling_positive(num_positive, num_negative,
-        cost_matrix)
-      cost_negative = dc.cost_labelling_negative(num_positive, num_negative,
-        cost_matrix)
-      if cost_positive <= cost_negative:
-        num_errors = num_negative
-      else:
-        num_errors = num_positive
-        
-    else:
-      # The records are labelled as the majority class of this node.
-      label = max(supports, key=lambda key: supports[key])
-      num_errors = np.sum(value for key, value in supports.iteritems()\
-        if key != label)
+    Returns:
+      (int): The seed of the child, or None if this node has no seed.
+    """
+    if self.seed is None:
+      return None
+    return int(np.random.SeedSequence([self.seed, index]).generate_state(1)[0])
 
-    return num_errors
+  def sample_attributes(self, attributes):
+    """Draws this node's random sample of attributes. See Node.randomize.
 
-  def __str__(self):
-    """The string representation for this object.
+    Args:
+      attributes (list<str>): The attributes to sample from.
 
-    The representation is simply the class supports in a JSON-like format.
+    Returns:
+      (list<str>): The sampled attributes, in their original order.
+    """
+    num_features = self.max_features
+    if num_features == 'sqrt':
+      num_features = int(np.sqrt(len(attributes)))
+    elif num_features == 'log2':
+      num_features = int(np.log2(max(len(attributes), 1)))
+    elif isinstance(num_features, float):
+      num_features = int(num_features * len(attributes))
+    num_features = max(num_features, 1)
+    if num_features >= len(attributes):
+      return attributes
+    random = np.random.default_rng([self.seed, 0])
+    chosen = random.choice(len(attributes), num_features, replace=False)
+    return [attributes[index] for index in np.sort(chosen)]
+
+  def allows_split(self, child_sizes):
+    """Checks whether the children of a split are big enough.
+
+    Args:
+      child_sizes (list<int>): The number of data points in each child.
 
     Returns:
-      (string): This node object represented as a string.
+      (boolean): True if every child has at least min_samples_leaf data
+        points. False otherwise.
     """
-    # The following solution is taken from: https://goo.gl/jU6xJ4
-    # Additionally the supports are converted to an ordereddict. This means
-    # that they are always output in the same order.
-    supports = self.class_supports
-    supports = collections.OrderedDict(sorted(supports.items()))
-    string = '{'
-    for value, support in supports.items():
-      string += str(value) + ' : ' + str(support) + ', '
-    string = string[:-2]
-    string += '}'
-    return(string)
+    return min(child_sizes) >= self.min_samples_leaf
 
-  def __eq__(self, other):
-    """Node equality function.
+  def allowed_boundaries(self, attribute, boundaries, counts):
+    """Chooses which thresholds split_statistics considers.
+
+    Thresholds which min_samples_leaf doesn't allow are left out, and then
+    the rest are sampled if max_thresholds is set.
 
     Args:
-      other (Node): The node object to check equality for.
+      attribute (str): The name of the numerical attribute.
+      boundaries (numpy.ndarray): The positions in counts of the thresholds.
+      counts (numpy.ndarray): The cumulative class supports, which the left
+        supports of each threshold are read from.
 
     Returns:
-      (boolean): True if self and other are equal. False otherwise.
+      (numpy.ndarray): The positions of the chosen thresholds.
     """
-    if self.is_leaf != other.is_leaf or\
-      self.is_root != other.is_root or\
-      self.class_attribute != other.class_attribute or\
-      self.parent != other.parent or\
-      self.children != other.children or\
-      self.parent_branch != other.parent_branch or\
-      self.child_branches != other.child_branches:
-      return False
-    else:
-      return True
+    if self.min_samples_leaf > 1:
+      num_left = counts[boundaries].sum(axis=1)
+      num_right = counts[-1].sum() - num_left
+      boundaries = boundaries[(num_left >= self.min_samples_leaf) &
+        (num_right >= self.min_samples_leaf)]
+    chosen = self.sample_thresholds(attribute, len(boundaries))
+    if chosen is not None:
+      boundaries = boundaries[chosen]
+    return boundaries
 
-  def __ne__(self, other):
-    """Node inequality function.
+  def sample_thresholds(self, attribute, num_thresholds):
+    """Draws this node's random sample of an attribute's thresholds.
+
+    See Node.randomize. The sample only depends on the node's seed, the
+    attribute and the number of thresholds, so split_statistics and
+    get_possible_splits sample the same thresholds.
 
     Args:
-      other (Node): The node object to check inequality for.
+      attribute (str): The name of the numerical attribute.
+      num_thresholds (int): The number of thresholds to sample from.
 
     Returns:
-      (boolean): True if self and other are not equal. False otherwise.
+      (numpy.ndarray): The sorted positions of the sampled thresholds, or
+        None if every threshold should be used.
     """
-    return not __eq__(other)
+    if self.max_thresholds is None or num_thresholds <= self.max_thresholds:
+      return None
+    index = self.dataset.attribute_names.index(attribute)
+    random = np.random.default_rng([self.seed, 1, index])
+    return np.sort(random.choice(num_thresholds, self.max_thresholds,
+      replace=False))
+
+  @_profiled
+  def partition(self, split_test):
+    """Partitions this node's data points using a split test.
 
-class Tree:
-  """A class for describing a decision tree. The class is a classifier.
-                                                                             
-  Attributes:
-    root (Node): The root node of this decision tree.
-    num_nodes (Number): The number of nodes that are in this decision tree.
-  """
-  def __init__(self, data=None, class_attribute=None, positive_class=None,
-    build=False, split_func=None, split_func_args=[], prune=False,
-    prune_func_args=[]):
-    """The Tree constructor.
-                                                                              
-    Builds a Tree object based on the arguments. Will build the tree and then
-    prune it if both build and prune are True. If prune is True but build is
-    false, then no pruning will occur. Building and pruning are performed
-    using the split_func and prune_func functions.
-                                                                              
     Args:
-      data (pandas.DataFrame): The data contained within this node.
-      class_attribute (string): The name of the class attribute.
-      positive_class (string): The positive class value.
-      build (boolean): Whether or not to build the node as part of the object
-        construction process. This can be done manually later using the build
-        function if desired.
-      split_func (function): A function which takes a node as input and
-        returns a Split_Test object which describes the best split for this
-        node. The function should return None if there were no good splits
-        found.
-      split_func_args (list): A list of arguments to pass to the split
-        function. They are passed in the same order as this list.
-      prune (function): A function which takes a node as input and returns True
-        if the node should be pruned, and False otherwise.
-      prune_func_args (list): A list of arguments to pass to the prune function.
-        They are passed in the same order as this list.
+      split_test (Split_Test): Used to split the data. For numerical tests, the
+        operator is ignored since both sides of the split are returned.
+
+    Returns:
+      (list<tuple>): A (Split_Test, numpy.ndarray) tuple for each resulting
+        child. The Split_Test is the test of the branch to the child and the
+        array holds the (ascending) positions of this node's data points which
+        belong to the child.
     """
-    if build:
-      self.root = Node(data=data, class_attribute=class_attribute,
-        positive_class=positive_class, is_root=True, build=True,
-        split_func=split_func, split_func_args=split_func_args)
-    else:
-      self.root = Node(data=data, class_attribute=class_attribute,
-        positive_class=positive_class, is_root=True)
+    entry = self.cached_split(split_test)
+    if 'partitions' in entry:
+      return entry['partitions']
+    partitions = []
 
-    if prune:
-      keep_pruning = True
-      while keep_pruning:
-        leaves = self.get_leaves()
+    # If the test attribute is categorical, there is one child for each of the
+    # attribute's values in this node. The data points are grouped by their
+    # category code with a single stable sort.
+    if split_test.is_categorical():
+      values = self.dataset.category_values[split_test.attribute]
+      codes = self.dataset.category_codes[split_test.attribute][self.rows]
+      order = np.argsort(codes, kind='stable')
+      counts = np.bincount(codes.astype(np.int64) + 1,
+        minlength=len(values) + 1)
+      ends = np.cumsum(counts)
+      for code in np.flatnonzero(counts[1:]):
+        child_test = copy.copy(split_test)
+        child_test.split_value = values[code]
+        positions = order[ends[code]:ends[code + 1]]
+        partitions.append((child_test, positions))
 
-        # If the number of leaves is one, it is the root node, and cannot be
-        # pruned.
-        if len(leaves) == 1:
-          break
-        prunable_nodes = set()
-        for leaf in leaves:
-          if all(sibling.is_leaf for sibling in leaf.parent.children):
-            prunable_nodes.add(leaf.parent)
-        if all(node.prune(prune_func, prune_func_args)==False for\
-          node in prunable_nodes):
-          keep_pruning = False
+    # If the test attribute is numerical, there is a left ('<=') and a right
+    # ('>') child.
+    elif split_test.is_numerical():
+      column = self.column(split_test.attribute)
+      for operator in ('<=', '>'):
+        child_test = copy.copy(split_test)
+        child_test.operator = operator
+        if operator == '<=':
+          mask = column <= split_test.split_value
+        else:
+          mask = column > split_test.split_value
+        partitions.append((child_test, np.flatnonzero(mask)))
 
-    # Count the number of nodes in the tree.
-    self.num_nodes = self.calculate_num_nodes()
+    entry['partitions'] = partitions
+    return partitions
 
-  def calculate_num_nodes(self):
-    """Counts the number of nodes in this tree.
+  def cached_split(self, split_test):
+    """Gets the split_cache entry of a split test, creating it if needed.
+
+    The least recently used entry is dropped if the cache grows beyond
+    split_cache_size.
+
+    Args:
+      split_test (Split_Test): The split test.
 
     Returns:
-      (Number): The number of nodes in this tree.
+      (dict): The cache entry. It may hold 'partitions' (see partition) and
+        'supports' (the class supports of each child).
     """
-    # Inner function which recursively adds a node's children to the node
-    # count.
-    def add_children_counts(node, count=1):
-      if not node.is_leaf:
-        count += len(node.children)
-        for child in node.children:
-          add_children_counts(child, count)
-      if node.is_root:
-        return count
-    return add_children_counts(self.root)
+    entry = self.split_cache.get(split_test)
+    if entry is None:
+      entry = {}
+      self.split_cache[copy.copy(split_test)] = entry
+      while len(self.split_cache) > self.split_cache_size:
+        self.split_cache.popitem(last=False)
+    else:
+      self.split_cache.move_to_end(split_test)
+    return entry
 
-  def get_leaves(self):
-    """Gets all the leaves in this tree.
+  def column(self, attribute):
+    """Gets the values of an attribute for this node's data points.
+
+    Args:
+      attribute (str): The name of the attribute.
 
     Returns:
-      (List<Node>): A list of all the leaves in this tree.
+      (numpy.ndarray): The attribute values, in the same order as data_points.
     """
-    leaves = []
+    return self.dataset.columns[attribute][self.rows]
 
-    # Inner function which recursively adds a node's children to leaves if they
-    # are leaves.
-    def recursive_add_if_leaf(node):
-      if node.is_leaf:
-        leaves.append(node)
-      else:
-        for child in node.children:
-          recursive_add_if_leaf(child)
+  @property
+  def data_points(self):
+    """The data contained in this node, as a pandas.DataFrame.
 
-    add_leaves(self.root)
-    return leaves
+    The DataFrame is created from the shared data the first time it is asked
+    for (for example, by a split function). It is None if the node has no
+    data.
+    """
+    if self._data_points is None and self.dataset is not None:
+      self._data_points = self.dataset.to_frame(self.rows)
+    return self._data_points
 
-  def prune(self, prune_func, prune_func_args):
-    """Prunes the tree.
+  def presort(self):
+    """Sorts each numerical attribute of this node's data points once.
+
+    The results are stored in sorted_indexes. When this node is split, the
+    sorted index arrays are partitioned into the children instead of being
+    recomputed, so each attribute is only ever sorted at this node.
+    """
+    self.sorted_indexes = {}
+    attribute_names = self.dataset.attribute_names
+    for index in range(len(self.attribute_types)):
+      attribute = attribute_names[index]
+      if attribute == self.class_attribute:
+        continue
+      if self.attribute_types[index] == 'numerical':
+        column = self.column(attribute)
+        self.sorted_indexes[attribute] = np.argsort(column, kind='stable')
+
+  def partition_sorted_indexes(self, partitions):
+    """Partitions this node's sorted index arrays into its children.
+
+    Each child's positions are selected out of the index arrays in order, so
+    the resulting index arrays are still sorted by their attribute without
+    sorting again. The positions are converted so that they refer to each
+    child's data points rather than this node's.
 
     Args:
-      prune_func (function): A function which takes a node as input and returns
-        True if it should be pruned and False otherwise.
-      prune_func_args (list): A list of arguments to provide to the pruning
-        function.
+      partitions (list<numpy.ndarray>): The ascending positions of this node's
+        data points which belong to each child, as returned by partition.
 
     Returns:
-      (boolean): True if pruning occurred. False otherwise.
+      (list<dict<numpy.ndarray>>): The sorted index arrays for each child.
     """
-    keep_pruning = True
-    while keep_pruning:
-      leaves = self.get_leaves()
-                                                                           
-      # If the number of leaves is one, it is the root node, and cannot be
-      # pruned.
-      if len(leaves) == 1:
-        return False
-
-      prunable_nodes = set()
-      for leaf in leaves:
-        if all(sibling.is_leaf for sibling in leaf.parent.children):
-          prunable_nodes.add(leaf.parent)
-      if all(node.prune(prune_func, prune_func_args)==False for\
-        node in prunable_nodes):
-        keep_pruning = False
-
-    # If this point is reached, pruning must have occurred.
-    return True
+    child_sorted_indexes = [{} for _ in partitions]
+    if not self.sorted_indexes:
+      return child_sorted_indexes
 
-  def classify(self, data_points, cost_sensitive=False, cost_matrix={}):
-    """Classifies the passed data points.
+    # Record which child each of this node's data points belongs to (-1 if
+    # none), and its position within that child.
+    child_of = np.full(self.num_records(), -1, dtype=np.int64)
+    child_positions = np.zeros(self.num_records(), dtype=np.int64)
+    for child, positions in enumerate(partitions):
+      child_of[positions] = child
+      child_positions[positions] = np.arange(len(positions))
 
-    Args:
-      data_points (pandas.DataFrame): The data points to classify.
-      cost_sensitive (boolean): Whether to classify cost-sensitively.
-      cost_matrix (Dict<float>): The costs to use when classifying
-        cost-sensitively.
+    # For a two-way split, select each child's positions out of each sorted
+    # index array with a boolean mask. The selection keeps them in sorted
+    # order, so nothing is sorted again.
+    num_children = len(partitions)
+    if num_children <= 2:
+      for attribute, sorted_index in self.sorted_indexes.items():
+        sorted_children = child_of[sorted_index]
+        for child in range(num_children):
+          group = sorted_index[sorted_children == child]
+          child_sorted_indexes[child][attribute] = child_positions[group]
+      return child_sorted_indexes
 
+    # For a many-way split, a mask per child would make a pass over the
+    # index array for every child. Instead, group each sorted index array by
+    # child in one pass. A stable sort of the child codes keeps each group in
+    # sorted order, and the codes are stored in the smallest integer type so
+    # that numpy sorts them with a radix sort. The data points which belong
+    # to no child have the code 0 and come first.
+    codes = (child_of + 1).astype(np.min_scalar_type(num_children))
+    for attribute, sorted_index in self.sorted_indexes.items():
+      sorted_codes = codes[sorted_index]
+      counts = np.bincount(sorted_codes, minlength=num_children + 1)
+      offsets = np.cumsum(counts)
+      grouped = sorted_index[np.argsort(sorted_codes, kind='stable')]
+      for child in range(num_children):
+        group = grouped[offsets[child]:offsets[child + 1]]
+        child_sorted_indexes[child][attribute] = child_positions[group]
+    return child_sorted_indexes
+
+  def prune(self, prune_func=None, prune_func_args=[], record_change=True):
+    """Removes the children from this node if the prune function says so.
+                                                                            
+    Args:
+      prune_func (function): A function which takes a node as input and
+        returns True if the node should be pruned, and False otherwise.
+      prune_func_args (list): A list of arguments to pass to the prune 
+        function. They are passed in the same order as this list.
+      record_change (boolean): Whether to record the change with
+        Node.changed, which walks up to the root. Tree.prune passes False
+        and records all of its changes at once.
     Returns:
-      (list<str>): A list where the i'th value is the class value (as a string)
-        which is the classification for the i'th data point in data_points.
+      (boolean) : True if a split was performed, False otherwise.
+                                                                              
+    Raises:
+      ValueError: If any of this node's children are not leaves.
     """
-    class_attribute = self.root.class_attribute
-    classifications = []
+    if not all(child.is_leaf for child in self.children):
+      raise ValueError("Can't prune a node with a non-leaf child.")
 
-    # Recursive inner function for finding the leaf which a data point belongs
-    # in.
-    def find_matching_leaf(data_point, node):
-      if node.is_leaf:
-        return node
-      else:
-        for branch in node.child_branches:
-          test = branch.split_test
-          if test.test_data_point(data_point):
-            return find_matching_leaf(data_point, branch.child)
-
-    # Classify each data point.
-    for data_point_index in range(len(data_points)):
-      data_point = data_points.iloc[data_point_index]
-      matching_leaf = find_matching_leaf(data_point, self.root)
-      supports = matching_leaf.class_supports
-      
-      # Perform the classification cost-sensitively if the cost-sensitive
-      # parameter is True.
-      if cost_sensitive:
-        positive_cost = dc.cost_labelling_positive(self.num_positive(),
-          self.num_negative(), cost_matrix)
-        negative_cost = dc.cost_labelling_negative(self.num_positive(),
-          self.num_negative(), cost_matrix)
-        if positive_cost <= negative_cost:
-          return 'positive'
-        else:
-          return 'negative'
-      else:
-        classifications.append(max(supports, key=supports.get))
+    # If the prune function returns true, prune the node and return True.
+    # Otherwise, return False.
+    if prune_func(self, *prune_func_args):
+      self.children = []
+      self.is_leaf = True
+      self.child_branches = []
+      if record_change:
+        self.changed()
+      return True
+    else:
+      return False
 
-  def __str__(self):
-    """The string representation of the Tree object.
+  @_profiled
+  def get_possible_splits(self):
+    """Get the possible splits for this dataset. Returns them in a list.
+
+    The list that is returned contains both categorical and numerical splits.
+
+    Args: None
 
     Returns:
-      (str): The string representation of the Tree object.
+      (list<Split_Test>) : Split tests which can be used to split this node's
+        data points.
     """
+    # If the splits have been restricted, return (copies of) just those.
+    if self.split_subset is not None:
+      return [copy.copy(test) for test in self.split_subset]
 
-    # A recursive function which builds the string from the Tree.
-    def build_string(node, string='', indent=0):
-      for branch in node.child_branches:
-        string += str(branch)
-        if branch.child.is_leaf:
-          string += ' : ' + str(branch.child) + '\n'
+    # Define the list which will be appended to and returned.
+    splits = []
+
+    # It's cleaner to get the attribute names early.
+    attribute_names = self.dataset.attribute_names
+    candidates = self.candidate_attributes()
+
+    # For each index in the attribute list:
+    for index in range(len(self.attribute_types)):
+      if attribute_names[index] not in candidates:
+        continue
+      if self.attribute_types[index] == 'categorical':
+        # A categorical split is only possible if this node has more than one
+        # of the attribute's values. The table is read directly, so that the
+        # split is only counted as a candidate once it is scored.
+        sizes = self.category_table(attribute_names[index]).sum(axis=1)
+        sizes = sizes[sizes > 0]
+        if len(sizes) > 1 and self.allows_split(sizes):
+          splits.append(Split_Test('categorical', attribute_names[index]))
+      elif self.attribute_types[index] == 'numerical':
+        # If the attribute was binned, the splits are the edges between the
+        # non-empty bins of this node.
+        if attribute_names[index] in self.dataset.bin_edges:
+          split_values, _, _ = self.threshold_statistics(
+            attribute_names[index])
+          for value in split_values:
+            splits.append(Split_Test('numerical', attribute_names[index],
+              value))
+          continue
+        column = self.column(attribute_names[index])
+
+        # If the attribute was presorted, the unique values can be read off the
+        # sorted column without sorting again. Missing values are sorted to
+        # the end, and left out.
+        if attribute_names[index] in self.sorted_indexes:
+          values = column[self.sorted_indexes[attribute_names[index]]]
         else:
-          build_string(node=branch.child, string=string, indent=indent+2)
-      if node.is_root:
-        return string
+          values = np.sort(column)
+        values = values.astype(np.float64)
+        values = values[:len(values) - np.count_nonzero(np.isnan(values))]
+        unique_values = values[np.append(True, values[1:] != values[:-1])]
+        if len(values) == 0:
+          unique_values = values
+
+        # A threshold lies between each pair of consecutive unique values.
+        split_values = list(_midpoints(unique_values[:-1], unique_values[1:]))
 
-    return build_string(self.root)
+        # Leave out the thresholds which would leave too few data points on
+        # either side, and if the thresholds are subsampled, keep the same
+        # ones that split_statistics would.
+        if self.min_samples_leaf > 1:
+          num_left = np.searchsorted(values, split_values, side='right')
+          split_values = [value for value, size in zip(split_values, num_left)
+            if self.allows_split([size, len(values) - size])]
+        chosen = self.sample_thresholds(attribute_names[index],
+          len(split_values))
+        if chosen is not None:
+          split_values = [split_values[position] for position in chosen]
+
+        for value in split_values:
+          splits.append(Split_Test('numerical', attribute_names[index],
+            value))
+
+    # Finally, return the list of splits.
+    return splits
+
+  @_profiled
+  def split_counts(self, split_test):
+    """Counts the class values of each child of a split without splitting.
+
+    Args:
+      split_test (Split_Test): The split test to count the supports of.
+
+    Returns:
+      (list<numpy.ndarray>): The supports of each child, in the same order as
+        the partitions of the split. Each holds the count of each of
+        class_values.
+    """
+    # Count the class codes in each partition of this node's rows. No child
+    # nodes (or copies of the data) are created. Categorical supports are read
+    # from the contingency table, which is counted in a single pass. The
+    # results are kept in the split cache.
+    entry = self.cached_split(split_test)
+    if 'supports' not in entry:
+      if split_test.is_categorical():
+        _, table = self.category_supports(split_test.attribute)
+        entry['supports'] = list(table)
+      elif self.rows is None:
+        # Nodes grown from streamed data read the supports off the histogram.
+        # Bin i is on the left if its upper edge is <= the split value.
+        histogram = self.histogram(split_test.attribute)
+        num_left = np.searchsorted(self.dataset.bin_edges[split_test.attribute],
+          split_test.split_value, side='right')
+        entry['supports'] = [histogram[:num_left].sum(axis=0),
+          histogram[num_left:].sum(axis=0)]
+      else:
+        entry['supports'] = [self.dataset.count_classes(self.rows[positions])
+          for _, positions in self.partition(split_test)]
+      if self.profiler is not None and not split_test.is_categorical():
+        self.profiler.count_candidates(self, 1)
+    return entry['supports']
+
+  def get_split_supports(self, split_test, posneg=False):
+    """Finds the supports for the children that would result from split_test.
+
+    Args:
+      split_test (Split_Test): Used to split the data.
+      posneg (Boolean): Whether to return the supports in two categories -
+        positive and negative. Where positive data points have the positive
+        class value and negative records don't.
+
+    Returns:
+      (List<Dict>): The i'th element in the list is the i'th class supports,
+        where the class supports are represented in a dictionary. Each key in
+        the dictionary is a class value. Each value is the support count for
+        that value.
+    """
+    split_supports = []
+    for counts in self.split_counts(split_test):
+      supports = dict(zip(self.class_values, counts.tolist()))
+      if posneg:
+        num_positive = supports.get(self.positive_class, 0)
+        supports = {'positive' : num_positive,
+          'negative' : sum(supports.values()) - num_positive}
+      split_supports.append(supports)
+
+    return split_supports
+
+  @_profiled
+  def split_statistics(self, attribute):
+    """Finds the child class supports for every split of a numerical attribute.
+
+    The attribute's column is sorted once and the class supports of the left
+    ('<=') and right ('>') children are accumulated in a single cumulative
+    count pass. This gives the same supports as calling get_split_supports for
+    every numerical split returned by get_possible_splits, without splitting
+    (or copying) any nodes. Data points with a missing value are left out, so
+    the thresholds only fall between known values.
+
+    If the attribute has been binned (see Dataset.bin), the statistics are
+    read from this node's histogram instead, and the thresholds are the edges
+    between its non-empty bins.
+
+    Args:
+      attribute (str): The name of the numerical attribute.
+
+    Returns:
+      (tuple<numpy.ndarray>): A tuple (split_values, left_supports,
+        right_supports). split_values[i] is the i'th midpoint threshold, in the
+        same order as the splits from get_possible_splits. left_supports[i] and
+        right_supports[i] are the class supports of the '<=' and '>' children
+        for that threshold. The columns of both support arrays follow the
+        sorted class values of this node, i.e. sorted(self.class_supports).
+        Thresholds which min_samples_leaf doesn't allow are left out. If
+        max_thresholds is set, only this node's random sample of the rest is
+        returned.
+    """
+    statistics = self.threshold_statistics(attribute)
+    if self.profiler is not None:
+      self.profiler.count_candidates(self, len(statistics[0]))
+    return statistics
+
+  def threshold_statistics(self, attribute):
+    """Finds the same statistics as split_statistics without profiling.
+
+    This is used where the thresholds are only enumerated rather than scored
+    (see get_possible_splits), so that they aren't counted as candidates.
+
+    Args:
+      attribute (str): The name of the numerical attribute.
+
+    Returns:
+      (tuple<numpy.ndarray>): See split_statistics.
+    """
+    if attribute in self.dataset.bin_edges:
+      histogram = self.histogram(attribute)
+      counts = np.cumsum(histogram, axis=0)
+      boundaries = np.flatnonzero(histogram.sum(axis=1))[:-1]
+      boundaries = self.allowed_boundaries(attribute, boundaries, counts)
+      split_values = self.dataset.bin_edges[attribute][boundaries]
+      left_supports = counts[boundaries]
+      right_supports = counts[-1] - left_supports
+      return split_values, left_supports, right_supports
+
+    class_values = self.dataset.class_values
+    column = self.column(attribute)
+    class_indexes = self.dataset.class_codes[self.rows]
+
+    # Sort the column once, unless it was presorted. A stable sort keeps the
+    # statistics deterministic.
+    if attribute in self.sorted_indexes:
+      order = self.sorted_indexes[attribute]
+    else:
+      order = np.argsort(column, kind='stable')
+    values = column[order]
+    class_indexes = class_indexes[order]
+
+    # Missing values are sorted to the end. They are left out, since they go
+    # to neither child of a numerical split.
+    num_known = len(values) - np.count_nonzero(np.isnan(values))
+    values = values[:num_known]
+    class_indexes = class_indexes[:num_known]
+    if num_known == 0:
+      empty = np.zeros((0, len(class_values)), dtype=np.int64)
+      return np.zeros(0), empty, empty
+
+    # Count the class values seen so far at every position of the sorted
+    # column. Row i then holds the supports of all values <= values[i].
+    counts = np.zeros((len(values), len(class_values)), dtype=np.int64)
+    counts[np.arange(len(values)), class_indexes] = 1
+    counts = np.cumsum(counts, axis=0)
+
+    # A threshold exists wherever two consecutive sorted values differ.
+    boundaries = np.flatnonzero(values[1:] != values[:-1])
+    boundaries = self.allowed_boundaries(attribute, boundaries, counts)
+    split_values = _midpoints(values[boundaries], values[boundaries + 1])
+    left_supports = counts[boundaries]
+    right_supports = counts[-1] - left_supports
+
+    return split_values, left_supports, right_supports
+
+  @_profiled
+  def category_supports(self, attribute):
+    """Gets the category x class contingency table of a categorical attribute.
+
+    The table is counted in a single pass over this node's data points (or
+    taken from category_tables, for nodes grown from streamed data). Each
+    row holds the class supports of the child which a categorical split on the
+    attribute would create for that category, so a split function can score
+    the split without creating any children.
+
+    Args:
+      attribute (str): The name of the categorical attribute.
+
+    Returns:
+      (tuple<numpy.ndarray>): A tuple (values, supports). values holds the
+        attribute's values which occur in this node, in the same order as the
+        children of a split on the attribute. supports has one row per value
+        and one column per class value. The columns follow the sorted class
+        values, i.e. sorted(class_supports).
+    """
+    values = self.dataset.category_values[attribute]
+    table = self.category_table(attribute)
+    present = table.sum(axis=1) > 0
+    if self.profiler is not None and present.sum() > 1:
+      self.profiler.count_candidates(self, 1)
+    return values[present], table[present]
+
+  def category_table(self, attribute):
+    """Gets the full category x class contingency table of an attribute.
+
+    Args:
+      attribute (str): The name of the categorical attribute.
+
+    Returns:
+      (numpy.ndarray): One row per value in the attribute's category_values
+        (including values which don't occur in this node) and one column per
+        class value.
+    """
+    if attribute in self.category_tables:
+      return self.category_tables[attribute]
+    num_values = len(self.dataset.category_values[attribute])
+    num_classes = len(self.dataset.class_values)
+    codes = self.dataset.category_codes[attribute][self.rows]
+    known = codes >= 0
+    cells = codes[known].astype(np.int64) * num_classes
+    cells += self.dataset.class_codes[self.rows][known]
+    table = np.bincount(cells, minlength=num_values * num_classes)
+    return table.reshape(num_values, num_classes)
+
+  def detach_rows(self):
+    """Replaces this node's data points by their statistics.
+
+    The node keeps its class supports, the histogram of each binned
+    numerical attribute and the category table of each categorical
+    attribute, and its rows are set to None. It can then be updated with new
+    data points (see Tree.accumulate_statistics) and split using those
+    statistics alone, as if it had been grown from streamed data.
+    """
+    if self.rows is None:
+      return
+    for attribute in self.dataset.bin_edges:
+      self.histogram(attribute)
+    for attribute in self.dataset.category_values:
+      self.category_tables[attribute] = self.category_table(attribute)
+    self.rows = None
+    self._data_points = None
+    self.sorted_indexes = {}
+    self.split_cache.clear()
+
+  @_profiled
+  def histogram(self, attribute):
+    """Gets the class supports of each bin of a binned numerical attribute.
+
+    The histogram is counted from this node's data points the first time it is
+    asked for. When a node with histograms is split, its children's
+    histograms are derived from it by subtraction instead.
+
+    Args:
+      attribute (str): The name of the binned numerical attribute.
+
+    Returns:
+      (numpy.ndarray): One row per bin and one column per class value. The
+        columns follow the sorted class values, i.e. sorted(class_supports).
+        Data points with a missing value aren't counted.
+    """
+    if attribute not in self.histograms:
+      num_classes = len(self.dataset.class_values)
+      num_bins = len(self.dataset.bin_edges[attribute]) + 1
+      codes = self.dataset.bin_codes[attribute][self.rows].astype(np.int64)
+      known = codes >= 0
+      codes = codes[known] * num_classes +\
+        self.dataset.class_codes[self.rows][known]
+      histogram = np.bincount(codes, minlength=num_bins * num_classes)
+      self.histograms[attribute] = histogram.reshape(num_bins, num_classes)
+    return self.histograms[attribute]
+
+  def num_records(self):
+    """Gets the number of records in this Node object.
+
+    Returns:
+      (int): The number of records in this Node object. (len(data_points)).
+    """
+    if self.rows is None:
+      return int(self.supports.sum())
+    return len(self.rows)
+
+  @property
+  def attribute_types(self):
+    """The types of the attributes, as found by the dataset's schema.
+
+    Returns:
+      (list<str>): The type of each column in data_points.
+    """
+    if self.dataset is None:
+      return []
+    return self.dataset.attribute_types
+
+  @property
+  def class_supports(self):
+    """The dict view of this node's supports.
+
+    The view is read-only, since the supports are held as an array. To change
+    them, assign a new dict instead.
+
+    Returns:
+      (types.MappingProxyType<int>): The number of data points for each class
+        value.
+    """
+    return types.MappingProxyType(dict(zip(self.class_values,
+      self.supports.tolist())))
+
+  @class_supports.setter
+  def class_supports(self, class_supports):
+    """Replaces this node's supports.
+
+    The supports are counted for the class values of the dataset, if it has
+    every class value in class_supports, and for the sorted keys of
+    class_supports otherwise.
+
+    Args:
+      class_supports (dict<int>): The number of data points for each class
+        value.
+    """
+    if self.dataset is not None and all(value in self.dataset.class_values for
+      value in class_supports):
+      self.class_values = self.dataset.class_values
+    else:
+      self.class_values = sorted(class_supports)
+    self.supports = np.array([class_supports.get(value, 0) for value in
+      self.class_values], dtype=np.int64)
+    self.changed()
+
+  def class_index(self, class_value):
+    """Finds the position of a class value in this node's supports.
+
+    Args:
+      class_value (str): The class value.
+
+    Returns:
+      (int): The position of the class value in class_values, or None if the
+        node doesn't count it.
+    """
+    if class_value in self.class_values:
+      return self.class_values.index(class_value)
+    return None
+
+  def num_positive(self):
+    """Gets the number of positive data points in this node.
+
+    This is a trivial operation. However, it is provided so that the number
+    of negative data points and positive data points are found in the same
+    way.
+
+    Returns:
+      (int): The number of positive records in this node.
+    """
+    index = self.class_index(self.positive_class)
+    if index is None:
+      return 0
+    return int(self.supports[index])
+
+  def num_negative(self):
+    """Gets the number of negative data points in this node.
+                                                                            
+    Returns:
+      (int): The number of negative records in this node.
+    """
+    return int(self.supports.sum()) - self.num_positive()
+
+  def num_errors(self, cost_sensitive=False, cost_matrix={}):
+    """Finds the number of resubstitution errors for this node.
+
+    The number of resubstitution errors is described as follows: If the data
+    points contained within this node were classified using this node, how
+    many errors would there be?
+
+    Args:
+      cost_sensitive (boolean): Whether or not to determine the label of this
+        node cost-sensitively or not. For example, if this is False, the
+        class value with the highest support is used as the label. If true,
+        the class value with the lowest total cost is used as the label. If
+        this is True, a cost matrix must also be provided.
+      cost_matrix (dict<float>): This is used if the cost_sensitive flag is
+        set to True. It is used to calculate the label with the lowest total
+        cost. It is a dictionary which includes the keys: 'TP', 'TN', 'FP',
+        and 'FN'. The values for this dictionary are the costs associated
+        with the corresponding key. For example, 'TP' : 10 means that a true
+        positive prediction has an associated cost of 10.
+
+    Returns:
+      (int): The number of resubsitution errors for this node.
+
+    Raises:
+      ValueError: If cost_matrix is missing one of the following keys: TP, TN
+        FP, FN. This will only be raised if the cost_sensitive flag is True.
+    """
+    num_errors = -1 # The value that will be returned.
+
+    if cost_sensitive:
+      if any(k not in cost_matrix for k in ('TP', 'TN', 'FP', 'FN')):
+        raise ValueError('A cost is missing from the passed cost matrix.')
+
+      # Get the number of positive and negative data points.
+      num_positive = self.num_positive()
+      num_negative = self.num_negative()
+
+      # Using the number of positive and negative data points, find out
+      # whether it is cheapest to label the records in this node object as
+      # positive or negative.
+      cost_positive = dc.cost_labelling_positive(num_positive, num_negative,
+        cost_matrix)
+      cost_negative = dc.cost_labelling_negative(num_positive, num_negative,
+        cost_matrix)
+      if cost_positive <= cost_negative:
+        num_errors = num_negative
+      else:
+        num_errors = num_positive
+        
+    elif len(self.supports):
+      # The records are labelled as the majority class of this node, so every
+      # other record is an error.
+      num_errors = int(self.supports.sum() - self.supports.max())
+    else:
+      num_errors = 0
+
+    return num_errors
+
+  def __str__(self):
+    """The string representation for this object.
+
+    The representation is simply the class supports in a JSON-like format.
+
+    Returns:
+      (string): This node object represented as a string.
+    """
+    # The following solution is taken from: https://goo.gl/jU6xJ4
+    # The class values are sorted, so the supports are always output in the
+    # same order.
+    string = '{'
+    for value, support in zip(self.class_values, self.supports.tolist()):
+      string += str(value) + ' : ' + str(support) + ', '
+    string = string[:-2]
+    string += '}'
+    return(string)
+
+  def __eq__(self, other):
+    """Node equality function.
+
+    Args:
+      other (Node): The node object to check equality for.
+
+    Returns:
+      (boolean): True if self and other are equal. False otherwise.
+    """
+    if self.is_leaf != other.is_leaf or\
+      self.is_root != other.is_root or\
+      self.class_attribute != other.class_attribute or\
+      self.parent != other.parent or\
+      self.children != other.children or\
+      self.parent_branch != other.parent_branch or\
+      self.child_branches != other.child_branches:
+      return False
+    else:
+      return True
+
+  def __ne__(self, other):
+    """Node inequality function.
+
+    Args:
+      other (Node): The node object to check inequality for.
+
+    Returns:
+      (boolean): True if self and other are not equal. False otherwise.
+    """
+    return not __eq__(other)
+
+class Compiled_Tree:
+  """A decision tree flattened into parallel numpy arrays.
+
+  Node i of the tree is described by the i'th element of each node array. The
+  nodes are numbered in breadth first order, so the root is node 0.
+
+  Attributes:
+    attribute_names (list<str>): The names of the (non-class) attributes of
+      the training data, in their original order.
+    categories (dict<list>): The category dictionary of each categorical
+      attribute that is tested in the tree. The position of a category value
+      in its list is the code used in category_children.
+    class_values (list<str>): The class values. These are the columns of
+      supports.
+    positive_class (string): The positive class value.
+    node_kinds (numpy.ndarray): 0 if the node is a leaf, 1 if it splits on a
+      numerical attribute and 2 if it splits on a categorical attribute.
+    node_attributes (numpy.ndarray): The index (into attribute_names) of the
+      attribute which the node splits on. -1 for leaves.
+    thresholds (numpy.ndarray): The split value of numerical nodes. Data
+      points with a value <= the threshold go to the left child.
+    left_children (numpy.ndarray): The left ('<=') child of numerical nodes.
+    right_children (numpy.ndarray): The right ('>') child of numerical nodes.
+    category_offsets (numpy.ndarray): The offset into category_children of the
+      child lookup table for categorical nodes.
+    category_children (numpy.ndarray): For each categorical node, a lookup
+      table of length len(categories[attribute]) from category code to child
+      node. -1 if the node has no child for that category.
+    supports (numpy.ndarray): The class supports of every node. One row per
+      node and one column per class value. A node without any supports is
+      given its parent's.
+    predictors (dict<function>): The generated Python predictors which have
+      been created so far. See Compiled_Tree.predictor.
+  """
+  # The node arrays, in the order they are saved in.
+  array_names = ('node_kinds', 'node_attributes', 'thresholds',
+    'left_children', 'right_children', 'category_offsets', 'category_children',
+    'supports')
+
+  # The first bytes of a saved tree, and the alignment of its arrays.
+  file_signature = b'WATTLE\x00\x01'
+  file_alignment = 64
+
+  # The number of nodes on a path which a generated Python function may
+  # contain before a subtree is moved into a function of its own.
+  python_depth_limit = 40
+
+  def __init__(self, tree):
+    """The Compiled_Tree constructor.
+
+    Flattens the Node and Branch objects of tree into the node arrays.
+
+    Args:
+      tree (Tree): The tree to compile.
+    """
+    root = tree.root
+    self.class_values = list(root.class_values)
+    self.positive_class = root.positive_class
+
+    # Number the nodes in breadth first order.
+    nodes = []
+    queue = collections.deque([root])
+    while queue:
+      node = queue.popleft()
+      nodes.append(node)
+      if not node.is_leaf:
+        queue.extend(branch.child for branch in node.child_branches)
+    node_ids = {id(node) : node_id for node_id, node in enumerate(nodes)}
+
+    # The attribute schema is taken from the training data when it is known.
+    # Otherwise, only the attributes tested in the tree are used.
+    if root.dataset is not None:
+      self.attribute_names = [name for name in root.dataset.attribute_names
+        if name != root.class_attribute]
+    else:
+      self.attribute_names = []
+      for node in nodes:
+        for branch in node.child_branches:
+          if branch.split_test.attribute not in self.attribute_names:
+            self.attribute_names.append(branch.split_test.attribute)
+    attribute_indexes = {name : index for index, name in
+      enumerate(self.attribute_names)}
+
+    # Build the category dictionaries of the categorical attributes.
+    self.categories = {}
+    for node in nodes:
+      for branch in node.child_branches:
+        test = branch.split_test
+        if test.is_categorical():
+          values = self.categories.setdefault(test.attribute, [])
+          if test.split_value not in values:
+            values.append(test.split_value)
+
+    num_nodes = len(nodes)
+    self.node_kinds = np.zeros(num_nodes, dtype=np.int8)
+    self.node_attributes = np.full(num_nodes, -1, dtype=np.int32)
+    self.thresholds = np.full(num_nodes, np.nan)
+    self.left_children = np.full(num_nodes, -1, dtype=np.int32)
+    self.right_children = np.full(num_nodes, -1, dtype=np.int32)
+    self.category_offsets = np.full(num_nodes, -1, dtype=np.int32)
+    self.supports = np.zeros((num_nodes, len(self.class_values)),
+      dtype=np.int64)
+    category_children = []
+
+    for node_id, node in enumerate(nodes):
+      if node.class_values == self.class_values:
+        self.supports[node_id] = node.supports
+      else:
+        supports = node.class_supports
+        self.supports[node_id] = [supports.get(value, 0) for value in
+          self.class_values]
+
+      # A node which hasn't seen any data points (such as a new leaf of a tree
+      # grown by Tree.partial_fit) is labelled like its parent.
+      if not self.supports[node_id].any() and node.parent is not None and\
+        id(node.parent) in node_ids:
+        self.supports[node_id] = self.supports[node_ids[id(node.parent)]]
+      if node.is_leaf:
+        continue
+      test = node.child_branches[0].split_test
+      self.node_attributes[node_id] = attribute_indexes[test.attribute]
+      if test.is_numerical():
+        self.node_kinds[node_id] = 1
+        self.thresholds[node_id] = test.split_value
+        for branch in node.child_branches:
+          if branch.split_test.operator == '<=':
+            self.left_children[node_id] = node_ids[id(branch.child)]
+          else:
+            self.right_children[node_id] = node_ids[id(branch.child)]
+      else:
+        self.node_kinds[node_id] = 2
+        values = self.categories[test.attribute]
+        table = [-1] * len(values)
+        for branch in node.child_branches:
+          code = values.index(branch.split_test.split_value)
+          table[code] = node_ids[id(branch.child)]
+        self.category_offsets[node_id] = len(category_children)
+        category_children.extend(table)
+    self.category_children = np.array(category_children, dtype=np.int32)
+    self.predictors = {}
+
+  def save(self, path, metadata={}):
+    """Saves the compiled tree to a file.
+
+    The file holds an 8 byte signature, the length of a JSON header as an 8
+    byte little-endian integer, the header itself and then the raw bytes of
+    each node array. The header holds the attribute names, category
+    dictionaries, class values and the dtype, shape and offset of each array.
+    The category dictionaries are stored by attribute index, since JSON would
+    turn attribute names which aren't strings into strings.
+    The arrays are aligned, so the file can be memory-mapped by Compiled_Tree
+    .load. No training data is saved.
+
+    Args:
+      path (str): The path of the file to write.
+      metadata (dict): Extra JSON-serializable values to store in the header.
+    """
+    arrays = [np.ascontiguousarray(getattr(self, name)) for name in
+      self.array_names]
+    arrays = [array.astype(array.dtype.newbyteorder('<')) for array in arrays]
+    header = {
+      'attribute_names' : self.attribute_names,
+      'categories' : [[self.attribute_names.index(attribute), values] for
+        attribute, values in self.categories.items()],
+      'class_values' : self.class_values,
+      'positive_class' : self.positive_class,
+      'metadata' : metadata,
+      'arrays' : {},
+    }
+
+    # The offsets of the arrays are relative to the end of the header, which
+    # is padded with spaces so that the arrays stay aligned in the file.
+    offset = 0
+    for name, array in zip(self.array_names, arrays):
+      header['arrays'][name] = {'dtype' : array.dtype.str,
+        'shape' : list(array.shape), 'offset' : offset}
+      offset += _aligned(array.nbytes, self.file_alignment)
+    encoded = json.dumps(header, default=_json_value).encode('utf-8')
+    start = _aligned(len(self.file_signature) + 8 + len(encoded),
+      self.file_alignment)
+    encoded = encoded.ljust(start - len(self.file_signature) - 8)
+
+    with open(path, 'wb') as output:
+      output.write(self.file_signature)
+      output.write(len(encoded).to_bytes(8, 'little'))
+      output.write(encoded)
+      for array in arrays:
+        output.write(array.tobytes())
+        output.write(bytes(_aligned(array.nbytes, self.file_alignment) -
+          array.nbytes))
+
+  @classmethod
+  def load(cls, path, mmap=True):
+    """Loads a compiled tree which was saved by Compiled_Tree.save.
+
+    Args:
+      path (str): The path of the file to read.
+      mmap (boolean): Whether to memory-map the node arrays rather than read
+        them. Memory-mapped arrays are read-only, only read from disk when
+        they are used, and shared by every process which maps the same file.
+
+    Returns:
+      (tuple): A (Compiled_Tree, dict) tuple of the tree and the metadata which
+        was saved with it.
+
+    Raises:
+      ValueError: If the file is not a saved tree.
+    """
+    with open(path, 'rb') as saved:
+      if saved.read(len(cls.file_signature)) != cls.file_signature:
+        raise ValueError('The file is not a saved tree.')
+      length = int.from_bytes(saved.read(8), 'little')
+      header = json.loads(saved.read(length).decode('utf-8'))
+    start = len(cls.file_signature) + 8 + length
+
+    compiled = cls.__new__(cls)
+    compiled.predictors = {}
+    compiled.attribute_names = header['attribute_names']
+    compiled.categories = {compiled.attribute_names[index] : values for
+      index, values in header['categories']}
+    compiled.class_values = header['class_values']
+    compiled.positive_class = header['positive_class']
+    for name in cls.array_names:
+      description = header['arrays'][name]
+      dtype = np.dtype(description['dtype'])
+      shape = tuple(description['shape'])
+      offset = start + description['offset']
+      if mmap and np.prod(shape) > 0:
+        array = np.memmap(path, dtype=dtype, mode='r', offset=offset,
+          shape=shape)
+      else:
+        array = np.fromfile(path, dtype=dtype, count=int(np.prod(shape)),
+          offset=offset).reshape(shape)
+      setattr(compiled, name, array)
+    return compiled, header['metadata']
+
+  def num_nodes(self):
+    """Gets the number of nodes in the compiled tree.
+
+    Returns:
+      (int): The number of nodes.
+    """
+    return len(self.node_kinds)
+
+  def node_labels(self, cost_sensitive=False, cost_matrix={}):
+    """Finds the label of every node.
+
+    Args:
+      cost_sensitive (boolean): Whether to label the nodes cost-sensitively. If
+        False, each node is labelled with its majority class value. If True,
+        each node is labelled as the positive class if that is the cheapest
+        label, and as its majority negative class value otherwise.
+      cost_matrix (dict<float>): The costs to use when labelling
+        cost-sensitively. It must include the keys 'TP', 'TN', 'FP' and 'FN'.
+
+    Returns:
+      (numpy.ndarray): The index (into class_values) of each node's label.
+
+    Raises:
+      ValueError: If cost_matrix is missing one of the following keys: TP, TN
+        FP, FN. This will only be raised if the cost_sensitive flag is True.
+    """
+    if not cost_sensitive:
+      return np.argmax(self.supports, axis=1)
+
+    if any(k not in cost_matrix for k in ('TP', 'TN', 'FP', 'FN')):
+      raise ValueError('A cost is missing from the passed cost matrix.')
+
+    # Find the cheapest label of each node. The datacost functions are plain
+    # arithmetic, so they label every node at once.
+    positive_index = self.class_values.index(self.positive_class)
+    num_positive = self.supports[:, positive_index]
+    num_negative = self.supports.sum(axis=1) - num_positive
+    cost_positive = dc.cost_labelling_positive(num_positive, num_negative,
+      cost_matrix)
+    cost_negative = dc.cost_labelling_negative(num_positive, num_negative,
+      cost_matrix)
+    negative_supports = self.supports.copy()
+    negative_supports[:, positive_index] = -1
+    return np.where(cost_positive <= cost_negative, positive_index,
+      np.argmax(negative_supports, axis=1))
+
+  def encode(self, data_points):
+    """Converts data points into the numerical matrix used by predict_batch.
+
+    Args:
+      data_points (pandas.DataFrame or numpy.ndarray): The data points to
+        encode. A NumPy array must have one column per attribute in
+        attribute_names, in the same order.
+
+    Returns:
+      (numpy.ndarray): A matrix with one row per data point and one column per
+        attribute in attribute_names. Categorical attributes are replaced by
+        their category code (-1 if the category is unknown). Columns of
+        attributes which are not tested in the tree are left as NaN.
+    """
+    is_frame = isinstance(data_points, pd.DataFrame)
+    matrix = np.full((len(data_points), len(self.attribute_names)), np.nan)
+    for index in np.unique(self.node_attributes[self.node_kinds != 0]):
+      name = self.attribute_names[index]
+      if is_frame:
+        column = data_points[name]
+      else:
+        column = data_points[:, index]
+      if name in self.categories:
+        matrix[:, index] = pd.Index(self.categories[name]).get_indexer(
+          column)
+      else:
+        matrix[:, index] = np.asarray(column, dtype=float)
+    return matrix
+
+  def find_leaves(self, matrix):
+    """Finds the node which each row of an encoded matrix ends up in.
+
+    All rows are routed through the tree together, one level at a time. A row
+    stops early at an internal node if it has a missing numerical value or a
+    category which the node has no child for.
+
+    Args:
+      matrix (numpy.ndarray): Data points encoded by the encode function.
+
+    Returns:
+      (numpy.ndarray): The node id which each row ends up in.
+    """
+    node_ids = np.zeros(len(matrix), dtype=np.int32)
+    active = np.flatnonzero(np.full(len(matrix), self.node_kinds[0] != 0))
+    while active.size:
+      current = node_ids[active]
+      values = matrix[active, self.node_attributes[current]]
+      is_categorical = self.node_kinds[current] == 2
+
+      # Numerical nodes compare against their threshold.
+      next_ids = np.where(values <= self.thresholds[current],
+        self.left_children[current], self.right_children[current])
+      next_ids[np.isnan(values)] = -1
+
+      # Categorical nodes look up the child for the category code.
+      if is_categorical.any():
+        codes = values[is_categorical].astype(np.int64)
+        offsets = self.category_offsets[current[is_categorical]]
+        children = np.full(len(codes), -1, dtype=np.int32)
+        known = codes >= 0
+        children[known] = self.category_children[offsets[known] + codes[known]]
+        next_ids[is_categorical] = children
+
+      moved = next_ids >= 0
+      active = active[moved]
+      node_ids[active] = next_ids[moved]
+      active = active[self.node_kinds[node_ids[active]] != 0]
+    return node_ids
+
+  def predict_batch(self, data_points, cost_sensitive=False, cost_matrix={}):
+    """Classifies the passed data points.
+
+    Args:
+      data_points (pandas.DataFrame): The data points to classify.
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (dict<float>): The costs to use when classifying
+        cost-sensitively.
+
+    Returns:
+      (numpy.ndarray): An array where the i'th value is the class value (as a
+        string) which is the classification for the i'th data point.
+    """
+    node_ids = self.find_leaves(self.encode(data_points))
+    labels = self.node_labels(cost_sensitive, cost_matrix)
+    return np.array(self.class_values, dtype=object)[labels[node_ids]]
+
+  def to_python(self, cost_sensitive=False, cost_matrix={},
+    function_name='predict', labels_only=False):
+    """Generates the source code of a Python function which classifies.
+
+    The function is a straight sequence of nested if statements, one for each
+    node, so classifying a data point costs only the comparisons on its path.
+    It takes a single data point, either as a dict keyed by attribute name or
+    as a tuple in the order of attribute_names, and returns a (label,
+    supports) tuple of the class value and the class supports of the node the
+    data point ends up in, or just the label if labels_only is set. Like
+    find_leaves, a data point stops at an
+    internal node if its value is missing (None or NaN) or is a category the
+    node has no child for.
+
+    Subtrees which are too deep for Python's parser (or for the recursion
+    which generates them) are moved into functions of their own.
+
+    Categories which have no Python literal (such as datetimes) are compared
+    against the tuple of their attribute's categories, _c<index>, instead.
+    Those tuples are returned by python_constants, and have to be defined
+    wherever the source is executed. predictor defines them itself.
+
+    Args:
+      cost_sensitive (boolean): Whether to label the nodes cost-sensitively.
+        See node_labels.
+      cost_matrix (dict<float>): The costs to use when labelling
+        cost-sensitively.
+      function_name (str): The name of the generated function.
+      labels_only (boolean): Whether the function returns only the label,
+        so that no supports are built when it is called.
+
+    Returns:
+      (str): The source code. It defines function_name and any helper
+        functions, whose names start with an underscore.
+    """
+    labels = self.node_labels(cost_sensitive, cost_matrix)
+    tested = np.unique(self.node_attributes[self.node_kinds != 0]).tolist()
+    parameters = ', '.join('v{}'.format(index) for index in tested)
+
+    # The entry point gets the tested attributes from the data point.
+    lines = ['def {}(row):'.format(function_name)]
+    if tested:
+      lines.append('  if isinstance(row, dict):')
+      for index in tested:
+        lines.append('    v{} = row.get({})'.format(index,
+          _python_literal(self.attribute_names[index])))
+      lines.append('  else:')
+      for index in tested:
+        lines.append('    v{} = row[{}]'.format(index, index))
+
+    # Each function is generated from the node it starts at. The subtrees
+    # which are too deep are added to the list as they are found.
+    functions = []
+    self._python_node(0, 1, 0, labels, parameters, lines, functions,
+      labels_only)
+    while functions:
+      node_id = functions.pop()
+      lines.append('')
+      lines.append('def _node_{}({}):'.format(node_id, parameters))
+      self._python_node(node_id, 1, 0, labels, parameters, lines, functions,
+        labels_only)
+    return '\n'.join(lines) + '\n'
+
+  def _python_node(self, node_id, indent, depth, labels, parameters, lines,
+    functions, labels_only=False):
+    """Generates the source code of a node and its descendants.
+
+    Args:
+      node_id (int): The node to generate.
+      indent (int): The indentation level of the node's code.
+      depth (int): The number of nodes above this one in the function.
+      labels (numpy.ndarray): The label of each node.
+      parameters (str): The parameter list of the generated functions.
+      lines (list<str>): The lines of source code, which are appended to.
+      functions (list<int>): The nodes which need a function of their own,
+        which is appended to.
+      labels_only (boolean): Whether to return only the label of the node.
+    """
+    padding = '  ' * indent
+    label = self.class_values[labels[node_id]]
+    if labels_only:
+      result = 'return {!r}'.format(label)
+    else:
+      supports = dict(zip(self.class_values, self.supports[node_id].tolist()))
+      result = 'return ({!r}, {!r})'.format(label, supports)
+    kind = self.node_kinds[node_id]
+    if kind == 0:
+      lines.append(padding + result)
+      return
+    if depth >= self.python_depth_limit:
+      functions.append(node_id)
+      lines.append(padding + 'return _node_{}({})'.format(node_id, parameters))
+      return
+
+    variable = 'v{}'.format(self.node_attributes[node_id])
+    if kind == 1:
+      lines.append(padding + 'if {0} is None or {0} != {0}:'.format(variable))
+      lines.append(padding + '  ' + result)
+      lines.append(padding + 'if {} <= {}:'.format(variable,
+        _python_literal(float(self.thresholds[node_id]))))
+      self._python_node(self.left_children[node_id], indent + 1, depth + 1,
+        labels, parameters, lines, functions, labels_only)
+      self._python_node(self.right_children[node_id], indent, depth + 1,
+        labels, parameters, lines, functions, labels_only)
+    else:
+      attribute = self.attribute_names[self.node_attributes[node_id]]
+      offset = self.category_offsets[node_id]
+      for code, value in enumerate(self.categories[attribute]):
+        child = self.category_children[offset + code]
+        if child < 0:
+          continue
+        if _has_python_literal(value):
+          constant = _python_literal(value)
+        else:
+          constant = '_c{}[{}]'.format(self.node_attributes[node_id], code)
+        lines.append(padding + 'if {} == {}:'.format(variable, constant))
+        self._python_node(child, indent + 1, depth + 1, labels, parameters,
+          lines, functions, labels_only)
+      lines.append(padding + result)
+
+  def python_constants(self):
+    """Gets the constants which the source from to_python can refer to.
+
+    Returns:
+      (dict<tuple>): The categories of each categorical attribute, keyed by
+        the name which to_python gives them (_c followed by the index of the
+        attribute).
+    """
+    return {'_c{}'.format(index): tuple(self.categories[attribute]) for
+      index, attribute in enumerate(self.attribute_names) if attribute in
+      self.categories}
+
+  def predictor(self, cost_sensitive=False, cost_matrix={},
+    labels_only=False):
+    """Gets a Python function which classifies single data points.
+
+    The function is generated by to_python and compiled the first time it is
+    asked for. It is then kept in predictors, so later calls are free.
+
+    Args:
+      cost_sensitive (boolean): Whether to label the nodes cost-sensitively.
+      cost_matrix (dict<float>): The costs to use when labelling
+        cost-sensitively.
+      labels_only (boolean): Whether the function returns only the label.
+
+    Returns:
+      (function): A function which takes a data point (a dict or tuple) and
+        returns a (label, supports) tuple, or just the label if labels_only
+        is set. See to_python.
+    """
+    key = (cost_sensitive, tuple(sorted(cost_matrix.items())) if
+      cost_sensitive else (), labels_only)
+    if key not in self.predictors:
+      namespace = self.python_constants()
+      source = self.to_python(cost_sensitive, cost_matrix,
+        labels_only=labels_only)
+      exec(compile(source, '<wattle tree>', 'exec'), namespace)
+      self.predictors[key] = namespace['predict']
+    return self.predictors[key]
+
+class Tree:
+  """A class for describing a decision tree. The class is a classifier.
+                                                                             
+  Attributes:
+    root (Node): The root node of this decision tree.
+    num_nodes (Number): The number of nodes that are in this decision tree.
+      It is counted each time it is asked for.
+    dataset (Dataset): The training data, which is shared by every node.
+    schema (Schema): The schema of the training data. If a schema is given
+      to the constructor, it is also used for data which is streamed in
+      later, so that categories missing from the first data are known.
+    float32 (boolean): Whether numerical columns are stored as float32.
+    split_func (function): The split function the tree is built with. It is
+      also used by partial_fit.
+    split_func_args (list): The arguments to pass to the split function.
+    profiler (Build_Profiler): The profiler which instruments the tree's
+      nodes, or None.
+    compiled (Compiled_Tree): The flattened version of this tree which is used
+      for batch classification. None until the tree is compiled. It is
+      compiled again when it is used after the nodes have changed.
+    compiled_root (Node): The root which compiled was compiled from. None if
+      the tree was loaded from a file.
+    compiled_version (int): The version of compiled_root when it was
+      compiled. See Node.changed.
+  """
+  def __init__(self, data=None, class_attribute=None, positive_class=None,
+    build=False, split_func=None, split_func_args=[], prune=False,
+    prune_func=None, prune_func_args=[], presort=False, n_jobs=1, n_processes=1,
+    max_bins=None, max_depth=None, min_samples_split=2, min_samples_leaf=1,
+    max_leaves=None, min_gain=None, gain_func=None, best_first=False,
+    chunks=None, profiler=None, max_features=None, max_thresholds=None,
+    seed=None, schema=None, float32=False):
+    """The Tree constructor.
+                                                                              
+    Builds a Tree object based on the arguments. Will build the tree and then
+    prune it if both build and prune are True. If prune is True but build is
+    false, then no pruning will occur. Building and pruning are performed
+    using the split_func and prune_func functions.
+                                                                              
+    Args:
+      data (pandas.DataFrame): The data contained within this node.
+      class_attribute (string): The name of the class attribute.
+      positive_class (string): The positive class value.
+      build (boolean): Whether or not to build the node as part of the object
+        construction process. This can be done manually later using the build
+        function if desired.
+      split_func (function): A function which takes a node as input and
+        returns a Split_Test object which describes the best split for this
+        node. The function should return None if there were no good splits
+        found.
+      split_func_args (list): A list of arguments to pass to the split
+        function. They are passed in the same order as this list.
+      prune (boolean): Whether or not to prune the tree after building it.
+      prune_func (function): A function which takes a node as input and returns
+        True if the node should be pruned, and False otherwise.
+      prune_func_args (list): A list of arguments to pass to the prune function.
+        They are passed in the same order as this list.
+      presort (boolean): Whether or not to sort each numerical attribute once
+        at the root. The sorted index arrays are partitioned into the children
+        as the tree is built, so no node below the root ever sorts again.
+      n_jobs (int): The number of threads to use when searching for the best
+        split of each node. See Node.find_best_split.
+      n_processes (int): The number of processes to build large subtrees on.
+        See Tree.build.
+      max_bins (int): If this is set, each numerical attribute is discretized
+        into at most max_bins bins once, up front (see Dataset.bin). Splits
+        are then found from per-node bin histograms rather than from every
+        unique value. Even with a bin for every unique value, the thresholds
+        can differ from those of an exact build: a bin edge is the midpoint
+        of two neighbouring values of the whole dataset, while an exact
+        threshold is the midpoint of two neighbouring values of the node. The
+        threshold still falls in the same gap between the node's values, so
+        the data is split the same way.
+      max_depth (int): See Tree.build.
+      min_samples_split (int): See Tree.build.
+      min_samples_leaf (int): See Tree.build.
+      max_leaves (int): See Tree.build.
+      min_gain (float): See Tree.build.
+      gain_func (function): See Tree.build.
+      best_first (boolean): See Tree.build.
+      chunks (function): If this is set instead of data, the tree is built
+        from data which is read in chunks, using Tree.build_streaming. See
+        Tree.build_streaming. max_bins defaults to 255 in this case, and
+        best_first can't be used.
+      profiler (Build_Profiler): If this is set, the nodes of the tree are
+        instrumented by it as the tree is built. See Build_Profiler.
+      max_features (int, float or str): If this is set, each node only
+        considers a random sample of the attributes. See Node.randomize.
+      max_thresholds (int): If this is set, each node only considers a random
+        sample of each numerical attribute's thresholds. See Node.randomize.
+      seed (int): The seed of the random samples, so that the tree can be
+        built again.
+      schema (Schema): The schema of the data. If this is None, it is worked
+        out from the data once, and shared by every node.
+      float32 (boolean): Whether to store numerical columns as float32. See
+        Schema.
+
+    Raises:
+      ValueError: If both chunks and best_first are set, or if data has a
+        missing class value (see Dataset). Data points with a missing class
+        value in chunks are left out instead.
+    """
+    if chunks is not None and best_first:
+      raise ValueError('Trees built from chunks are grown one level at a '
+        'time, so they can\'t be grown best first.')
+
+    # The split function is kept for partial_fit.
+    self.split_func = split_func
+    self.split_func_args = split_func_args
+    self.profiler = profiler
+    self.schema = schema
+    self.float32 = float32
+    self.compiled = None
+    self.compiled_root = None
+    self.compiled_version = None
+
+    # The data is stored once and shared by every node in the tree.
+    self.dataset = None
+    if data is not None:
+      self.dataset = Dataset(data, class_attribute, schema, float32)
+      self.schema = self.dataset.schema
+      if max_bins is not None:
+        self.dataset.bin(max_bins)
+
+    self.root = Node(dataset=self.dataset, class_attribute=class_attribute,
+      positive_class=positive_class, is_root=True, presort=presort)
+    self.root.profiler = profiler
+    self.root.randomize(max_features, max_thresholds, seed)
+    if build and chunks is not None:
+      if max_bins is None:
+        max_bins = 255
+      self.build_streaming(chunks, split_func, split_func_args,
+        max_bins=max_bins, n_jobs=n_jobs, max_depth=max_depth,
+        min_samples_split=min_samples_split,
+        min_samples_leaf=min_samples_leaf, max_leaves=max_leaves,
+        min_gain=min_gain, gain_func=gain_func)
+    elif build:
+      self.build(split_func, split_func_args, n_jobs=n_jobs,
+        n_processes=n_processes, max_depth=max_depth,
+        min_samples_split=min_samples_split,
+        min_samples_leaf=min_samples_leaf, max_leaves=max_leaves,
+        min_gain=min_gain, gain_func=gain_func, best_first=best_first)
+
+    if build and prune:
+      self.prune(prune_func, prune_func_args)
+
+  @_closes_profiler
+  def build(self, split_func, split_func_args=[], n_jobs=1, n_processes=1,
+    min_process_records=10000, max_depth=None, min_samples_split=2,
+    min_samples_leaf=1, max_leaves=None, min_gain=None, gain_func=None,
+    best_first=False):
+    """Grows this tree from its leaves until no more splits are found.
+
+    The leaves waiting to be split are kept on a work queue, so the depth of
+    the tree is not limited by Python's recursion limit. If n_processes is
+    greater than one, each non-root leaf with at least min_process_records
+    data points is sent to a pool of processes which grows its whole
+    subtree, while smaller leaves keep being split in this process. Every
+    node is split in the same way as it would be by a serial build, so the
+    resulting tree is the same.
+
+    When processes are used, split_func and split_func_args must be picklable
+    (for example, split_func must be defined at the top level of a module).
+
+    The pre-pruning limits are checked before a node's children are created
+    (see Node.find_allowed_split). If best_first is True, the leaf whose best
+    split has the highest gain is always split next, rather than the oldest
+    leaf. Together with max_leaves, this grows the tree which uses its leaf
+    budget on the most useful splits. Subtrees are not built on other
+    processes when best_first or max_leaves is set, since the order in which
+    the leaves are split matters.
+
+    Args:
+      split_func (function): A function which takes a node as input and
+        returns a Split_Test object which describes the best split for this
+        node. The function should return None if there were no good splits
+        found.
+      split_func_args (list): A list of arguments to pass to the split
+        function. They are passed in the same order as this list.
+      n_jobs (int): The number of threads to use when searching for the best
+        split of each node. See Node.find_best_split.
+      n_processes (int): The number of processes to build large subtrees on.
+      min_process_records (int): The number of data points which a subtree's
+        root must have for the subtree to be built on another process.
+      max_depth (int): Nodes at this depth are not split. None for no limit.
+      min_samples_split (int): Nodes with fewer data points are not split.
+      min_samples_leaf (int): Splits which would create a leaf with fewer data
+        points are not made.
+      max_leaves (int): Splits which would give the tree more leaves than this
+        are not made. None for no limit.
+      min_gain (float): Splits with a lower gain are not made. None for no
+        limit.
+      gain_func (function): A function which takes a node and the child
+        supports of a split and returns the gain of the split. It is used for
+        min_gain and best_first. Defaults to weighted_gini_gain.
+      best_first (boolean): Whether to split the leaf with the highest gain
+        first.
+    """
+    limits = (max_depth, min_samples_split, min_samples_leaf, min_gain,
+      gain_func)
+    pool = None
+    if n_processes > 1 and max_leaves is None and not best_first:
+      pool = concurrent.futures.ProcessPoolExecutor(max_workers=n_processes,
+        initializer=_initialize_worker, initargs=(self.dataset,))
+
+    # The frontier holds the leaves waiting to be split. When growing best
+    # first, it is a heap of (negative gain, order, node, split test) tuples
+    # whose splits have already been found. The order breaks ties so that
+    # nodes are never compared.
+    leaves = self.get_leaves()
+    num_leaves = len(leaves)
+    queue = collections.deque(leaves)
+    heap = []
+    order = 0
+    subtrees = []
+    try:
+      while queue or heap:
+        if best_first:
+          while queue:
+            node = queue.popleft()
+            test, gain = node.find_allowed_split(split_func, split_func_args,
+              n_jobs, *limits, compute_gain=True)
+            if test is not None:
+              heapq.heappush(heap, (-gain, order, node, test))
+              order += 1
+            else:
+              # The leaf stays a leaf, which also finishes its profile.
+              node.apply_split(None)
+          if not heap:
+            break
+          _, _, node, test = heapq.heappop(heap)
+        else:
+          node = queue.popleft()
+          if pool is not None and not node.is_root and\
+            node.num_records() >= min_process_records:
+            subtree = pool.submit(_build_subtree, node.rows,
+              node.sorted_indexes, node.class_attribute, node.positive_class,
+              split_func, split_func_args, n_jobs, node.depth, limits,
+              (node.max_features, node.max_thresholds, node.seed))
+            subtrees.append((node, subtree))
+            continue
+          test, _ = node.find_allowed_split(split_func, split_func_args,
+            n_jobs, *limits)
+
+        # A split replaces a leaf with its children, so it is skipped if that
+        # would take the tree over its leaf budget.
+        if test is not None and max_leaves is not None:
+          num_children = len(node.partition(test))
+          if num_leaves + num_children - 1 > max_leaves:
+            node.split_cache.clear()
+            test = None
+        if node.apply_split(test):
+          num_leaves += len(node.children) - 1
+          queue.extend(node.children)
+
+      # Graft the subtrees which were built on other processes onto the nodes
+      # they were built for.
+      for node, subtree in subtrees:
+        node.graft(subtree.result(), self.dataset)
+    finally:
+      if pool is not None:
+        pool.shutdown()
+
+    self.compiled = None
+
+  @_closes_profiler
+  def build_streaming(self, chunks, split_func, split_func_args=[],
+    max_bins=255, sample_size=100000, max_categories=255, n_jobs=1,
+    max_depth=None, min_samples_split=2, min_samples_leaf=1, max_leaves=None,
+    min_gain=None, gain_func=None):
+    """Grows this tree from data which is read in chunks.
+
+    The data never has to fit in memory. A first pass over the chunks keeps a
+    uniform sample of sample_size data points (plus the first data point with
+    each class value and with each of the first max_categories categories of
+    each categorical attribute). The sample decides the attribute types, the
+    categories and the bin edges of the numerical attributes (see
+    Dataset.bin). Categories which aren't in the sample are not counted. The
+    tree is then grown one level at a time. Each level takes one more pass
+    over the chunks, which accumulates the class supports, bin histograms and
+    category tables of every leaf on that level. Each leaf is then split by
+    split_func from those statistics, as with Tree(max_bins=...).
+
+    split_func must only use the statistics of a node (its class_supports,
+    split_statistics and category_supports), as cost_reduction_split and
+    best_split do. Data points with a missing value for an attribute which is
+    tested above a leaf don't reach it.
+
+    Args:
+      chunks (function): A function which takes no arguments and returns an
+        iterable of pandas.DataFrame chunks of the data, for example
+        lambda: pd.read_csv(path, chunksize=100000). It is called once per
+        pass.
+      split_func (function): A function which takes a node as input and
+        returns a Split_Test object which describes the best split for this
+        node. The function should return None if there were no good splits
+        found.
+      split_func_args (list): A list of arguments to pass to the split
+        function. They are passed in the same order as this list.
+      max_bins (int): The maximum number of bins per numerical attribute.
+      sample_size (int): The number of data points to sample in the first
+        pass.
+      max_categories (int): The maximum number of categories per categorical
+        attribute whose first data point is kept in addition to the sample.
+        This bounds the size of the sample, and so of every leaf's category
+        tables, however many categories the data has.
+      n_jobs (int): The number of threads to use when searching for the best
+        split of each node. See Node.find_best_split.
+      max_depth (int): See Tree.build.
+      min_samples_split (int): See Tree.build.
+      min_samples_leaf (int): See Tree.build.
+      max_leaves (int): See Tree.build. The leaves of each level are split in
+        order until the budget runs out.
+      min_gain (float): See Tree.build.
+      gain_func (function): See Tree.build.
+    """
+    class_attribute = self.root.class_attribute
+    sample = _sample_chunks(chunks(), class_attribute, sample_size,
+      max_categories)
+    self.dataset = Dataset(sample, class_attribute, self.schema, self.float32)
+    self.schema = self.dataset.schema
+    self.dataset.bin(max_bins)
+
+    # The new root keeps the random subsampling settings of the old one.
+    root = self.root
+    self.root = Node(class_attribute=class_attribute,
+      positive_class=root.positive_class, is_root=True)
+    self.root.dataset = self.dataset
+    self.root.profiler = self.profiler
+    self.root.randomize(root.max_features, root.max_thresholds, root.seed)
+
+    frontier = [self.root]
+    num_leaves = 1
+    while frontier:
+      # Accumulate the statistics of every leaf on this level in one pass. The
+      # class supports which the leaves were given when their parent was split
+      # are counted again.
+      for node in frontier:
+        node.class_values = self.dataset.class_values
+        node.supports = np.zeros(len(node.class_values), dtype=np.int64)
+      self.accumulate_statistics(frontier, chunks())
+
+      # Gains are weighted by the number of data points which were streamed
+      # into the root, rather than by the size of the sample.
+      if frontier[0] is self.root:
+        self.dataset.num_training_records = max(self.root.num_records(), 1)
+
+      # Split each leaf using its statistics. The children are split on the
+      # next level.
+      # A split replaces a leaf with its children, so it is skipped if that
+      # would take the tree over its leaf budget.
+      next_frontier = []
+      for node in frontier:
+        test, _ = node.find_allowed_split(split_func, split_func_args, n_jobs,
+          max_depth, min_samples_split, min_samples_leaf, min_gain, gain_func)
+        if test is not None and max_leaves is not None:
+          num_children = len(node.split_counts(test))
+          if num_leaves + num_children - 1 > max_leaves:
+            test = None
+        if node.apply_split(test):
+          num_leaves += len(node.children) - 1
+          next_frontier.extend(node.children)
+        node.histograms = {}
+        node.category_tables = {}
+      frontier = next_frontier
+
+    self.compiled = None
+
+  def accumulate_statistics(self, leaves, chunks):
+    """Adds the statistics of some data points to the leaves they reach.
+
+    Each chunk is routed through the tree with Compiled_Tree.find_leaves. The
+    class supports, bin histograms and category tables of the data points
+    which reach one of the given leaves are added to that leaf's. Data points
+    which reach another node, or which have an unknown class value, are
+    ignored. Unknown categories are not counted.
+
+    Args:
+      leaves (list<Node>): The leaves to accumulate statistics for. They must
+        not have rows (see Node.detach_rows).
+      chunks (iterable<pandas.DataFrame>): The data points.
+    """
+    num_classes = len(self.dataset.class_values)
+    num_leaves = len(leaves)
+
+    # The number of values (bins or categories) of each attribute whose
+    # statistics are accumulated.
+    sizes = {attribute : len(values) for attribute, values in
+      self.dataset.category_values.items()}
+    for attribute, edges in self.dataset.bin_edges.items():
+      sizes[attribute] = len(edges) + 1
+
+    # Find the compiled id of each leaf. The compiled tree numbers its nodes in
+    # breadth first order.
+    compiled = Compiled_Tree(self)
+    node_ids = {}
+    queue = collections.deque([self.root])
+    while queue:
+      node = queue.popleft()
+      node_ids[id(node)] = len(node_ids)
+      queue.extend(node.children)
+    slots = np.full(compiled.num_nodes(), -1, dtype=np.int64)
+    for slot, node in enumerate(leaves):
+      slots[node_ids[id(node)]] = slot
+
+    # Count every leaf at once. Each count is stored at the position
+    # (leaf, value, class) of a flattened array.
+    counts = np.zeros(num_leaves * num_classes, dtype=np.int64)
+    tables = {attribute : np.zeros(num_leaves * size * num_classes,
+      dtype=np.int64) for attribute, size in sizes.items()}
+    for chunk in chunks:
+      class_codes, codes = self.dataset.encode(chunk)
+      chunk_slots = slots[compiled.find_leaves(compiled.encode(chunk))]
+      keep = (chunk_slots >= 0) & (class_codes >= 0)
+      chunk_slots = chunk_slots[keep]
+      class_codes = class_codes[keep]
+      counts += np.bincount(chunk_slots * num_classes + class_codes,
+        minlength=len(counts))
+      for attribute, size in sizes.items():
+        attribute_codes = codes[attribute][keep]
+        known = attribute_codes >= 0
+        cells = (chunk_slots[known] * size + attribute_codes[known]) *\
+          num_classes + class_codes[known]
+        tables[attribute] += np.bincount(cells,
+          minlength=len(tables[attribute]))
+
+    # Add the counts to the leaves. Each leaf is given its own copy of its
+    # tables rather than a view, so that the tables of every leaf are freed
+    # once it no longer needs them, rather than once every leaf doesn't. The
+    # counts of each attribute are freed as soon as they have been handed out.
+    counts = counts.reshape(num_leaves, num_classes)
+    for slot, node in enumerate(leaves):
+      node.supports = node.supports + counts[slot]
+    for attribute, size in sizes.items():
+      attribute_tables = tables.pop(attribute).reshape(num_leaves, size,
+        num_classes)
+      for slot, node in enumerate(leaves):
+        if attribute in self.dataset.bin_edges:
+          statistics = node.histograms
+        else:
+          statistics = node.category_tables
+        if attribute in statistics:
+          statistics[attribute] = statistics[attribute] +\
+            attribute_tables[slot]
+        else:
+          statistics[attribute] = attribute_tables[slot].copy()
+      del attribute_tables
+
+  @_closes_profiler
+  def partial_fit(self, data_points, split_func=None, split_func_args=None,
+    grace_period=200, delta=1e-7, tie_threshold=0.05, gain_func=None,
+    gain_range=None, max_bins=255, n_jobs=1):
+    """Updates this tree with new data points, like a Hoeffding tree.
+
+    The data points are routed to the leaves they reach, and are added to
+    those leaves' statistics (see accumulate_statistics). Whenever a leaf has
+    seen another grace_period data points, its best split is found by
+    split_func, along with the best split on any other attribute. The leaf is
+    split if the Hoeffding bound says that, with probability 1 - delta, the
+    best split's attribute really is the best one. That is, if the gain of the
+    best split exceeds the gain of the other split by more than
+
+      epsilon = sqrt(gain_range ** 2 * ln(1 / delta) / (2 * n)),
+
+    where n is the number of data points the leaf has seen, or if epsilon is
+    below tie_threshold. The new leaves start without any statistics. The
+    time taken only depends on the number of new data points and the size of
+    the tree, not on how much data the tree has already seen.
+
+    If this tree is empty, it is started from data_points. Leaves which still
+    have their training data are replaced by its statistics (see
+    Node.detach_rows), after binning the numerical attributes with max_bins
+    if they weren't already binned. Class values and categories which didn't
+    occur in the first data are ignored.
+
+    Args:
+      data_points (pandas.DataFrame): The new data points. The data points
+        of the first call must all have a class value (see Dataset). Later,
+        data points with a missing class value are ignored.
+      split_func (function): A function which takes a node as input and
+        returns a Split_Test object which describes the best split for this
+        node. Defaults to the split function this tree was built with.
+      split_func_args (list): A list of arguments to pass to the split
+        function. Defaults to the arguments this tree was built with.
+      grace_period (int): The number of data points a leaf must see between
+        attempts to split it.
+      delta (float): The probability of the Hoeffding bound being wrong.
+      tie_threshold (float): Leaves are split if epsilon is below this, even
+        if the best and other split have similar gains.
+      gain_func (function): A function which takes a node and the child
+        supports of a split and returns the gain of the split. Defaults to
+        split_gini_gain.
+      gain_range (float): The range of gain_func. Defaults to the range of the
+        gini gain, i.e. 1 - 1 / (the number of class values).
+      max_bins (int): The maximum number of bins per numerical attribute if
+        the attributes haven't been binned yet.
+      n_jobs (int): The number of threads to use when searching for a split.
+        See Node.find_best_split.
+
+    Returns:
+      (int): The number of leaves which were split.
+    """
+    if split_func is None:
+      split_func = self.split_func
+    if split_func_args is None:
+      split_func_args = self.split_func_args
+    if gain_func is None:
+      gain_func = split_gini_gain
+
+    # Start an empty tree from the data points. They are then already
+    # counted.
+    if self.dataset is None:
+      self.dataset = Dataset(data_points, self.root.class_attribute,
+        self.schema, self.float32)
+      self.schema = self.dataset.schema
+      self.dataset.bin(max_bins)
+      root = self.root
+      self.root = Node(dataset=self.dataset, rows=np.arange(len(data_points)),
+        class_attribute=root.class_attribute,
+        positive_class=root.positive_class, is_root=True)
+      self.root.profiler = self.profiler
+      self.root.randomize(root.max_features, root.max_thresholds, root.seed)
+      counted = True
+    else:
+      if not self.dataset.bin_edges:
+        self.dataset.bin(max_bins)
+      counted = False
+    if gain_range is None:
+      gain_range = 1 - 1 / max(len(self.dataset.class_values), 1)
+
+    # Update the statistics of the leaves.
+    leaves = self.get_leaves()
+    for leaf in leaves:
+      leaf.detach_rows()
+    seen = [leaf.num_records() for leaf in leaves]
+    if not counted:
+      self.accumulate_statistics(leaves, [data_points])
+
+    # Try to split the leaves which have seen another grace_period data
+    # points.
+    num_splits = 0
+    for leaf, num_seen in zip(leaves, seen):
+      num_records = leaf.num_records()
+      if num_records // grace_period == num_seen // grace_period and\
+        not counted:
+        continue
+      test = leaf.find_best_split(split_func, split_func_args, n_jobs)
+      if test is None:
+        continue
+      gain = gain_func(leaf, leaf.get_split_supports(test))
+
+      # Find the best split on any other attribute.
+      attribute_subset = leaf.attribute_subset
+      leaf.attribute_subset = [attribute for attribute in
+        leaf.candidate_attributes() if attribute != test.attribute]
+      other_test = leaf.find_best_split(split_func, split_func_args, n_jobs)
+      leaf.attribute_subset = attribute_subset
+      other_gain = 0.0
+      if other_test is not None:
+        other_gain = gain_func(leaf, leaf.get_split_supports(other_test))
+
+      epsilon = hoeffding_bound(gain_range, delta, num_records)
+      if gain - other_gain > epsilon or epsilon < tie_threshold:
+        if leaf.apply_split(test):
+          num_splits += 1
+          for child in leaf.children:
+            child.supports = np.zeros_like(child.supports)
+      else:
+        leaf.apply_split(None)
+
+    self.compiled = None
+    return num_splits
+
+  @property
+  def num_nodes(self):
+    """The number of nodes in this tree.
+
+    Returns:
+      (int): The number of nodes. For a tree which was loaded from a file,
+        the number of nodes of its compiled tree.
+    """
+    if self.compiled is not None and self.compiled_root is None:
+      return self.compiled.num_nodes()
+    return self.calculate_num_nodes()
+
+  def calculate_num_nodes(self):
+    """Counts the number of nodes in this tree.
+
+    Returns:
+      (Number): The number of nodes in this tree.
+    """
+    count = 0
+    stack = [self.root]
+    while stack:
+      node = stack.pop()
+      count += 1
+      stack.extend(node.children)
+    return count
+
+  def get_leaves(self):
+    """Gets all the leaves in this tree.
+
+    Returns:
+      (List<Node>): A list of all the leaves in this tree, from left to right.
+    """
+    leaves = []
+
+    # Walk the tree depth first using an explicit stack, so that deep trees
+    # don't hit the recursion limit.
+    stack = [self.root]
+    while stack:
+      node = stack.pop()
+      if node.is_leaf:
+        leaves.append(node)
+      else:
+        stack.extend(reversed(node.children))
+    return leaves
+
+  def prune(self, prune_func, prune_func_args=[]):
+    """Prunes the tree.
+
+    The tree is pruned bottom up. Each internal node is offered to the prune
+    function once, after all of its children have become leaves, so the
+    prune function is called at most once per node.
+
+    Args:
+      prune_func (function): A function which takes a node as input and returns
+        True if it should be pruned and False otherwise.
+      prune_func_args (list): A list of arguments to provide to the pruning
+        function.
+
+    Returns:
+      (boolean): True if pruning occurred. False otherwise.
+    """
+    # Count the children of each internal node which are not leaves. A node
+    # can only be pruned once all of its children are leaves, so the nodes
+    # whose count is zero are the ones to visit first.
+    num_internal_children = {}
+    worklist = []
+    stack = [self.root]
+    while stack:
+      node = stack.pop()
+      if node.is_leaf:
+        continue
+      count = sum(not child.is_leaf for child in node.children)
+      num_internal_children[id(node)] = count
+      if count == 0:
+        worklist.append(node)
+      stack.extend(node.children)
+
+    # Visit each node once. When a node is pruned it becomes a leaf, so its
+    # parent may be ready to visit. A node which isn't pruned keeps its
+    # children, so its ancestors are never visited.
+    pruned = False
+    while worklist:
+      node = worklist.pop()
+      if not node.prune(prune_func, prune_func_args, record_change=False):
+        continue
+      pruned = True
+      parent = node.parent
+      if parent is not None and id(parent) in num_internal_children:
+        num_internal_children[id(parent)] -= 1
+        if num_internal_children[id(parent)] == 0:
+          worklist.append(parent)
+
+    # If any pruning occurred, the compiled tree (if any) is now out of date.
+    # The change is recorded once here rather than by every pruned node, as
+    # each record walks up to the root.
+    if pruned:
+      self.root.version += 1
+      self.compiled = None
+    return pruned
+
+  def compile(self):
+    """Flattens this tree into a Compiled_Tree for fast batch classification.
+
+    The result is kept in the compiled attribute and used by predict_batch.
+    If the nodes are changed afterwards through the Node methods, it is
+    compiled again the next time it is used. Changes made by assigning to
+    the attributes of nodes directly need an explicit call to compile.
+
+    Returns:
+      (Compiled_Tree): The compiled tree.
+    """
+    self.compiled = Compiled_Tree(self)
+    self.compiled_root = self.root
+    self.compiled_version = self.root.version
+    return self.compiled
+
+  def is_compiled(self):
+    """Checks whether compiled is up to date with the nodes of this tree.
+
+    Returns:
+      (boolean): True if the tree has been compiled since its nodes were last
+        changed, or if it was loaded from a file. False otherwise.
+    """
+    if self.compiled is None:
+      return False
+    if self.compiled_root is None:
+      return True
+    return self.compiled_root is self.root and\
+      self.compiled_version == self.root.version
+
+  def save(self, path):
+    """Saves this tree to a file in the compact format of Compiled_Tree.save.
+
+    Only the compiled tree is saved, so the file holds no training data. The
+    tree is compiled first if it hasn't been already.
+
+    Args:
+      path (str): The path of the file to write.
+    """
+    if not self.is_compiled():
+      self.compile()
+    self.compiled.save(path, {'class_attribute' : self.root.class_attribute})
+
+  @classmethod
+  def load(cls, path, mmap=True):
+    """Loads a tree which was saved by Tree.save.
+
+    The loaded tree can classify data points, but it has no Node objects (its
+    root is an empty leaf) and no training data, so it can't be grown, pruned
+    or compiled again.
+
+    Args:
+      path (str): The path of the file to read.
+      mmap (boolean): Whether to memory-map the node arrays. See
+        Compiled_Tree.load.
+
+    Returns:
+      (Tree): The loaded tree.
+    """
+    compiled, metadata = Compiled_Tree.load(path, mmap)
+    tree = cls(class_attribute=metadata.get('class_attribute'),
+      positive_class=compiled.positive_class)
+    tree.compiled = compiled
+    return tree
+
+  def to_python(self, cost_sensitive=False, cost_matrix={},
+    function_name='predict', labels_only=False):
+    """Generates the source code of a Python function which classifies.
+
+    See Compiled_Tree.to_python. The tree is compiled first if it hasn't been
+    already.
+
+    Args:
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (dict<float>): The costs to use when classifying
+        cost-sensitively.
+      function_name (str): The name of the generated function.
+      labels_only (boolean): Whether the function returns only the label.
+
+    Returns:
+      (str): The source code.
+    """
+    if not self.is_compiled():
+      self.compile()
+    return self.compiled.to_python(cost_sensitive, cost_matrix, function_name,
+      labels_only)
+
+  def predictor(self, cost_sensitive=False, cost_matrix={},
+    labels_only=False):
+    """Gets a cached Python function which classifies single data points.
+
+    See Compiled_Tree.predictor. The function is generated again once the
+    tree changes.
+
+    Args:
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (dict<float>): The costs to use when classifying
+        cost-sensitively.
+      labels_only (boolean): Whether the function returns only the label.
+
+    Returns:
+      (function): A function which takes a data point (a dict or tuple) and
+        returns a (label, supports) tuple, or just the label if labels_only
+        is set.
+    """
+    if not self.is_compiled():
+      self.compile()
+    return self.compiled.predictor(cost_sensitive, cost_matrix, labels_only)
+
+  def predict_one(self, record, cost_sensitive=False, cost_matrix={}):
+    """Classifies a single data point without using pandas.
+
+    The data point is classified by the generated Python predictor (see
+    Tree.predictor), in which the position of each attribute was resolved
+    when it was generated. The predictor only returns the label, so nothing
+    is created per call.
+
+    Args:
+      record (dict, tuple or numpy.ndarray): The data point. Either a dict
+        keyed by attribute name, or a sequence (such as a tuple or a NumPy
+        row) of the values of the attributes other than the class attribute,
+        in their original order.
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (dict<float>): The costs to use when classifying
+        cost-sensitively.
+
+    Returns:
+      (str): The class value which is the classification of the data point.
+    """
+    predictor = self.predictor(cost_sensitive, cost_matrix, labels_only=True)
+    return predictor(record)
+
+  def predict_batch(self, data_points, cost_sensitive=False, cost_matrix={}):
+    """Classifies the passed data points using the compiled tree.
+
+    All data points are routed through the tree together using vectorized
+    comparisons. The tree is compiled first if it hasn't been already.
+
+    Args:
+      data_points (pandas.DataFrame): The data points to classify.
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (Dict<float>): The costs to use when classifying
+        cost-sensitively.
+
+    Returns:
+      (numpy.ndarray): An array where the i'th value is the class value (as a
+        string) which is the classification for the i'th data point.
+    """
+    if not self.is_compiled():
+      self.compile()
+    return self.compiled.predict_batch(data_points, cost_sensitive,
+      cost_matrix)
+
+  def classify(self, data_points, cost_sensitive=False, cost_matrix={}):
+    """Classifies the passed data points.
+
+    Args:
+      data_points (pandas.DataFrame): The data points to classify.
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (Dict<float>): The costs to use when classifying
+        cost-sensitively.
+
+    Returns:
+      (list<str>): A list where the i'th value is the class value (as a string)
+        which is the classification for the i'th data point in data_points.
+    """
+    return list(self.predict_batch(data_points, cost_sensitive, cost_matrix))
+
+  def classify_stream(self, chunks, cost_sensitive=False, cost_matrix={},
+    return_leaves=False, return_supports=False, output=None):
+    """Classifies data points which are read in chunks.
+
+    Each chunk is classified with the compiled tree and its results are
+    yielded before the next chunk is read, so only one chunk is in memory at
+    a time. The node labels are only found once.
+
+    Args:
+      chunks (iterable): The chunks of data points. Each chunk is a
+        pandas.DataFrame or a NumPy array with one column per attribute other
+        than the class attribute, in their original order.
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (dict<float>): The costs to use when classifying
+        cost-sensitively.
+      return_leaves (boolean): Whether to also yield the compiled node id
+        which each data point ended up in.
+      return_supports (boolean): Whether to also yield the class supports of
+        those nodes.
+      output (str or file): If this is set, the results of each chunk are
+        also written to it (a path or a text file) as CSV rows of the label,
+        then the node id and the supports if they are asked for.
+
+    Yields:
+      (numpy.ndarray or tuple): The class value (as a string) of each data
+        point in a chunk. If return_leaves or return_supports is set, a tuple
+        of the labels followed by the node ids and/or the supports (one row
+        per data point and one column per class value).
+    """
+    if not self.is_compiled():
+      self.compile()
+    compiled = self.compiled
+    labels = np.array(compiled.class_values, dtype=object)[
+      compiled.node_labels(cost_sensitive, cost_matrix)]
+
+    # Open the output file if a path was given.
+    output_file = output
+    if isinstance(output, str):
+      output_file = open(output, 'w', newline='')
+    try:
+      header = ['label']
+      if return_leaves:
+        header.append('leaf')
+      if return_supports:
+        header.extend(compiled.class_values)
+      if output_file is not None:
+        output_file.write(','.join(header) + '\n')
+
+      for chunk in chunks:
+        node_ids = compiled.find_leaves(compiled.encode(chunk))
+        results = [labels[node_ids]]
+        if return_leaves:
+          results.append(node_ids)
+        if return_supports:
+          results.append(compiled.supports[node_ids])
+        if output_file is not None:
+          columns = [results[0]]
+          if return_leaves:
+            columns.append(node_ids)
+          if return_supports:
+            columns.extend(compiled.supports[node_ids].T)
+          pd.DataFrame(dict(enumerate(columns))).to_csv(output_file,
+            header=False, index=False)
+        if len(results) == 1:
+          yield results[0]
+        else:
+          yield tuple(results)
+    finally:
+      if isinstance(output, str):
+        output_file.close()
+
+  def classify_to_file(self, chunks, output, cost_sensitive=False,
+    cost_matrix={}, return_leaves=False, return_supports=False):
+    """Classifies data points which are read in chunks into a CSV file.
+
+    See Tree.classify_stream.
+
+    Args:
+      chunks (iterable): The chunks of data points.
+      output (str or file): The path or text file to write the results to.
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (dict<float>): The costs to use when classifying
+        cost-sensitively.
+      return_leaves (boolean): Whether to also write the node ids.
+      return_supports (boolean): Whether to also write the supports.
+
+    Returns:
+      (int): The number of data points which were classified.
+    """
+    num_classified = 0
+    for results in self.classify_stream(chunks, cost_sensitive, cost_matrix,
+      return_leaves, return_supports, output):
+      if isinstance(results, tuple):
+        results = results[0]
+      num_classified += len(results)
+    return num_classified
+
+  def __str__(self):
+    """The string representation of the Tree object.
+
+    Returns:
+      (str): The string representation of the Tree object.
+    """
+
+    # Walk the tree depth first using an explicit stack, so that deep trees
+    # don't hit the recursion limit. Each branch is written on its own line,
+    # indented by its depth, followed by the supports if it leads to a leaf.
+    string = ''
+    stack = [(branch, 0) for branch in reversed(self.root.child_branches)]
+    while stack:
+      branch, indent = stack.pop()
+      string += ' ' * indent + str(branch)
+      if branch.child.is_leaf:
+        string += ' : ' + str(branch.child) + '\n'
+      else:
+        string += '\n'
+        stack.extend((child_branch, indent + 2) for child_branch in
+          reversed(branch.child.child_branches))
+    return string
+
+class Forest:
+  """A class for describing a bagged ensemble of decision trees.
+
+  Each tree is grown from a bootstrap sample of the data. The samples are
+  arrays of row positions into a single Dataset which every tree shares, so
+  the data is never copied for a tree.
+
+  Attributes:
+    trees (list<Tree>): The trees of the forest.
+    dataset (Dataset): The training data, which is shared by every tree.
+    class_attribute (string): The name of the class attribute.
+    positive_class (string): The positive class value.
+    num_trees (int): The number of trees to build.
+    seed (int): The seed of the bootstrap samples and of the random samples
+      of candidate splits. None for a random seed.
+    compiled (list<Compiled_Tree>): The compiled trees which are used for
+      classification. None until the forest is compiled.
+  """
+  def __init__(self, data=None, class_attribute=None, positive_class=None,
+    num_trees=10, build=False, split_func=None, split_func_args=[],
+    n_processes=1, seed=None, max_bins=None, max_depth=None,
+    min_samples_split=2, min_samples_leaf=1, max_features=None,
+    max_thresholds=None, float32=False):
+    """The Forest constructor.
+
+    Args:
+      data (pandas.DataFrame): The training data.
+      class_attribute (string): The name of the class attribute.
+      positive_class (string): The positive class value.
+      num_trees (int): The number of trees to build.
+      build (boolean): Whether or not to build the forest as part of the
+        object construction process.
+      split_func (function): The split function to grow the trees with. See
+        Tree.
+      split_func_args (list): A list of arguments to pass to the split
+        function.
+      n_processes (int): The number of processes to build the trees on. See
+        Forest.build.
+      seed (int): The seed of the bootstrap samples.
+      max_bins (int): If this is set, the numerical attributes are binned once
+        for every tree. See Dataset.bin.
+      max_depth (int): See Tree.build.
+      min_samples_split (int): See Tree.build.
+      min_samples_leaf (int): See Tree.build.
+      max_features (int, float or str): See Forest.build.
+      max_thresholds (int): See Forest.build.
+      float32 (boolean): Whether to store numerical columns as float32. See
+        Schema.
+    """
+    self.class_attribute = class_attribute
+    self.positive_class = positive_class
+    self.num_trees = num_trees
+    self.seed = seed
+    self.trees = []
+    self.compiled = None
+    self.dataset = None
+    if data is not None:
+      self.dataset = Dataset(data, class_attribute, float32=float32)
+      if max_bins is not None:
+        self.dataset.bin(max_bins)
+    if build:
+      self.build(split_func, split_func_args, n_processes=n_processes,
+        max_depth=max_depth, min_samples_split=min_samples_split,
+        min_samples_leaf=min_samples_leaf, max_features=max_features,
+        max_thresholds=max_thresholds)
+
+  def build(self, split_func, split_func_args=[], n_processes=1,
+    max_depth=None, min_samples_split=2, min_samples_leaf=1,
+    max_features=None, max_thresholds=None):
+    """Builds the trees of the forest.
+
+    If n_processes is greater than one, the trees are grown on a pool of
+    processes. Each process receives the shared data once, and then only the
+    row positions of each bootstrap sample. In this case, split_func and
+    split_func_args must be picklable.
+
+    Args:
+      split_func (function): The split function to grow the trees with.
+      split_func_args (list): A list of arguments to pass to the split
+        function.
+      n_processes (int): The number of processes to build the trees on.
+      max_depth (int): See Tree.build.
+      min_samples_split (int): See Tree.build.
+      min_samples_leaf (int): See Tree.build.
+      max_features (int, float or str): If this is set, each node only
+        considers a random sample of the attributes, as in a random forest.
+        See Node.randomize.
+      max_thresholds (int): If this is set, each node only considers a random
+        sample of each numerical attribute's thresholds. With max_thresholds
+        set to 1, the forest is an ensemble of extremely randomized trees.
+    """
+    limits = (max_depth, min_samples_split, min_samples_leaf)
+    random = np.random.default_rng(self.seed)
+    num_records = self.dataset.num_records()
+    samples = [np.sort(random.integers(0, num_records, size=num_records)) for
+      _ in range(self.num_trees)]
+    seeds = [int(seed) for seed in random.integers(0, 2**32,
+      size=self.num_trees)]
+
+    # Each tree starts as a root over its bootstrap sample.
+    roots = [Node(dataset=self.dataset, rows=rows,
+      class_attribute=self.class_attribute,
+      positive_class=self.positive_class, is_root=True) for rows in samples]
+    for root, seed in zip(roots, seeds):
+      root.randomize(max_features, max_thresholds, seed)
+    if n_processes > 1:
+      with concurrent.futures.ProcessPoolExecutor(max_workers=n_processes,
+        initializer=_initialize_worker, initargs=(self.dataset,)) as pool:
+        subtrees = [pool.submit(_build_subtree, root.rows, None,
+          self.class_attribute, self.positive_class, split_func,
+          split_func_args, 1, 0, limits, (max_features, max_thresholds,
+          root.seed)) for root in roots]
+        for root, subtree in zip(roots, subtrees):
+          root.graft(subtree.result(), self.dataset)
+    else:
+      for root in roots:
+        root.grow(split_func, split_func_args, 1, *limits)
+
+    self.trees = []
+    for root in roots:
+      tree = Tree(class_attribute=self.class_attribute,
+        positive_class=self.positive_class)
+      tree.dataset = self.dataset
+      tree.root = root
+      self.trees.append(tree)
+    self.compiled = None
+
+  def compile(self):
+    """Compiles every tree of the forest.
+
+    Returns:
+      (list<Compiled_Tree>): The compiled trees.
+    """
+    self.compiled = [tree.compile() for tree in self.trees]
+    return self.compiled
+
+  def find_leaves(self, data_points):
+    """Finds the node which each data point ends up in, in every tree.
+
+    Args:
+      data_points (pandas.DataFrame): The data points.
+
+    Returns:
+      (list<numpy.ndarray>): The compiled node ids of each tree.
+    """
+    if self.compiled is None or not all(tree.is_compiled() for tree in
+      self.trees):
+      self.compile()
+    return [compiled.find_leaves(compiled.encode(data_points)) for compiled in
+      self.compiled]
+
+  def predict_supports(self, data_points):
+    """Averages the relative class supports of the trees.
+
+    Args:
+      data_points (pandas.DataFrame): The data points.
+
+    Returns:
+      (numpy.ndarray): One row per data point and one column per class value
+        (see Dataset.class_values). Each row holds the fractions of the
+        supports of each class value, averaged over the trees.
+    """
+    fractions = np.zeros((len(data_points), len(self.dataset.class_values)))
+    leaves = self.find_leaves(data_points)
+    for compiled, node_ids in zip(self.compiled, leaves):
+      supports = compiled.supports[node_ids]
+      totals = supports.sum(axis=1, keepdims=True)
+      fractions += np.divide(supports, totals, out=np.zeros(supports.shape),
+        where=totals > 0)
+    return fractions / max(len(self.trees), 1)
+
+  def predict_batch(self, data_points, method='vote', cost_sensitive=False,
+    cost_matrix={}):
+    """Classifies the passed data points.
+
+    Args:
+      data_points (pandas.DataFrame): The data points to classify.
+      method (str): 'vote' to choose the label which most trees give, or
+        'average' to label the averaged supports of predict_supports.
+      cost_sensitive (boolean): Whether to classify cost-sensitively. When
+        voting, each tree labels its leaves cost-sensitively (see
+        Compiled_Tree.node_labels). When averaging, the averaged supports are
+        labelled cost-sensitively in the same way.
+      cost_matrix (dict<float>): The costs to use when classifying
+        cost-sensitively.
+
+    Returns:
+      (numpy.ndarray): An array where the i'th value is the class value (as a
+        string) which is the classification for the i'th data point.
+
+    Raises:
+      ValueError: If method is not 'vote' or 'average'.
+    """
+    class_values = self.dataset.class_values
+    num_classes = len(class_values)
+    if method == 'vote':
+      votes = np.zeros(len(data_points) * num_classes, dtype=np.int64)
+      offsets = np.arange(len(data_points)) * num_classes
+      leaves = self.find_leaves(data_points)
+      for compiled, node_ids in zip(self.compiled, leaves):
+        labels = compiled.node_labels(cost_sensitive, cost_matrix)[node_ids]
+        votes += np.bincount(offsets + labels, minlength=len(votes))
+      labels = np.argmax(votes.reshape(-1, num_classes), axis=1)
+    elif method == 'average':
+      fractions = self.predict_supports(data_points)
+      labels = np.argmax(fractions, axis=1)
+      if cost_sensitive:
+        if any(k not in cost_matrix for k in ('TP', 'TN', 'FP', 'FN')):
+          raise ValueError('A cost is missing from the passed cost matrix.')
+        positive_index = class_values.index(self.positive_class)
+        positive = fractions[:, positive_index]
+        negative = fractions.sum(axis=1) - positive
+        cost_positive = dc.cost_labelling_positive(positive, negative,
+          cost_matrix)
+        cost_negative = dc.cost_labelling_negative(positive, negative,
+          cost_matrix)
+        fractions[:, positive_index] = -1
+        labels = np.where(cost_positive <= cost_negative, positive_index,
+          np.argmax(fractions, axis=1))
+    else:
+      raise ValueError("The method must be 'vote' or 'average'.")
+    return np.array(class_values, dtype=object)[labels]
+
+  def classify(self, data_points, method='vote', cost_sensitive=False,
+    cost_matrix={}):
+    """Classifies the passed data points.
+
+    Args:
+      data_points (pandas.DataFrame): The data points to classify.
+      method (str): 'vote' or 'average'. See Forest.predict_batch.
+      cost_sensitive (boolean): Whether to classify cost-sensitively.
+      cost_matrix (dict<float>): The costs to use when classifying
+        cost-sensitively.
+
+    Returns:
+      (list<str>): A list where the i'th value is the class value (as a string)
+        which is the classification for the i'th data point in data_points.
+    """
+    return list(self.predict_batch(data_points, method, cost_sensitive,
+      cost_matrix))
+
+def expected_costs(positive_supports, negative_supports, cost_matrix):
+  """Calculates the expected cost of many sets of data points at once.
+
+  This gives the same results as datacost.expected_cost, but for whole arrays
+  of support counts. Empty sets of data points have an expected cost of zero.
+
+  Args:
+    positive_supports (numpy.ndarray): The number of positive data points in
+      each set.
+    negative_supports (numpy.ndarray): The number of negative data points in
+      each set.
+    cost_matrix (dict): Every cost. e.g., {'TP':1, 'TN':0, 'FP':1, 'FN':5}
+
+  Returns:
+    (numpy.ndarray): The expected cost of each set of data points.
+  """
+  cost_positive = dc.cost_labelling_positive(positive_supports,
+    negative_supports, cost_matrix)
+  cost_negative = dc.cost_labelling_negative(positive_supports,
+    negative_supports, cost_matrix)
+  numerator = np.asarray(2 * cost_positive * cost_negative, dtype=float)
+  denominator = np.asarray(cost_positive + cost_negative, dtype=float)
+  return np.divide(numerator, denominator, out=np.zeros_like(numerator),
+    where=denominator != 0)
+
+def cost_reduction_split(node, positive_class, cost_matrix):
+  """Finds and returns the best split based on expected cost.
+
+  This is a built-in split function which can be passed to Node.split or
+  Tree as split_func. For every candidate attribute, the expected cost after
+  every possible split is calculated at once from the cumulative positive and
+  negative supports of Node.split_statistics (or, for categorical attributes,
+  from Node.category_supports). It chooses the same split as scoring each of
+  get_possible_splits with datacost.expected_cost_after_split.
+
+  Args:
+    node (Node): The node to calculate the best split for.
+    positive_class (string): The name of the class which is the positive class.
+    cost_matrix (dict): The cost matrix represented like: {'TP':1,'TN':0} etc.
+
+  Returns:
+    (Split_Test): The best split based on expected cost, or None if no split
+      has a lower expected cost than the node itself. Its score is the
+      reduction in expected cost.
+  """
+  # Calculate the expected cost of the parent.
+  num_positive = node.class_supports.get(positive_class, 0)
+  num_negative = node.num_records() - num_positive
+  parent_cost = dc.expected_cost(num_positive, num_negative, cost_matrix)
+
+  # The position of the positive class in the support arrays.
+  class_values = node.dataset.class_values
+  is_positive = np.array([value == positive_class for value in class_values])
+
+  # These values will get updated if a better split is found.
+  best_cost = float('inf')
+  best_split = None
+
+  for attribute in node.candidate_attributes():
+    if attribute in node.dataset.category_values:
+      values, supports = node.category_supports(attribute)
+      if len(values) < 2 or not node.allows_split(supports.sum(axis=1)):
+        continue
+      positive = supports[:, is_positive].sum(axis=1)
+      negative = supports[:, ~is_positive].sum(axis=1)
+      split_cost = np.sum(expected_costs(positive, negative, cost_matrix))
+      if split_cost < best_cost:
+        best_cost = split_cost
+        best_split = Split_Test('categorical', attribute)
+    else:
+      split_values, left, right = node.split_statistics(attribute)
+      if len(split_values) == 0:
+        continue
+      left_costs = expected_costs(left[:, is_positive].sum(axis=1),
+        left[:, ~is_positive].sum(axis=1), cost_matrix)
+      right_costs = expected_costs(right[:, is_positive].sum(axis=1),
+        right[:, ~is_positive].sum(axis=1), cost_matrix)
+      split_costs = left_costs + right_costs
+      best_index = np.argmin(split_costs)
+      if split_costs[best_index] < best_cost:
+        best_cost = split_costs[best_index]
+        best_split = Split_Test('numerical', attribute,
+          split_values[best_index])
+
+  if best_cost < parent_cost:
+    best_split.score = float(parent_cost - best_cost)
+    return best_split
+  else:
+    return None
+
+def entropy(supports):
+  """Calculates the entropy (in bits) of class supports.
+
+  Args:
+    supports (numpy.ndarray): Class supports, with the class values along the
+      last axis. Any number of leading axes can be used.
+
+  Returns:
+    (numpy.ndarray): The entropy of each set of supports. Empty sets of
+      supports have an entropy of zero.
+  """
+  supports = np.asarray(supports, dtype=float)
+  totals = supports.sum(axis=-1, keepdims=True)
+  proportions = np.divide(supports, totals, out=np.zeros_like(supports),
+    where=totals != 0)
+  logs = np.log2(proportions, out=np.zeros_like(proportions),
+    where=proportions > 0)
+  return -np.sum(proportions * logs, axis=-1)
+
+def gini(supports):
+  """Calculates the gini impurity of class supports.
+
+  Args:
+    supports (numpy.ndarray): Class supports, with the class values along the
+      last axis. Any number of leading axes can be used.
+
+  Returns:
+    (numpy.ndarray): The gini impurity of each set of supports. Empty sets of
+      supports have an impurity of zero.
+  """
+  supports = np.asarray(supports, dtype=float)
+  totals = supports.sum(axis=-1, keepdims=True)
+  proportions = np.divide(supports, totals, out=np.zeros_like(supports),
+    where=totals != 0)
+  impurity = 1 - np.sum(proportions ** 2, axis=-1)
+  return np.where(totals[..., 0] != 0, impurity, 0.0)
+
+def impurity_decrease(tables, impurity):
+  """Calculates how much some splits decrease an impurity measure.
+
+  Args:
+    tables (numpy.ndarray): The child class supports of each split. It has the
+      shape (splits, children, class values).
+    impurity (function): The impurity measure, e.g. entropy or gini.
+
+  Returns:
+    (numpy.ndarray): For each split, the impurity of the data points before
+      the split minus the weighted impurity of the children.
+  """
+  tables = np.asarray(tables, dtype=float)
+  child_totals = tables.sum(axis=2)
+  totals = child_totals.sum(axis=1)
+  child_impurity = np.sum(child_totals * impurity(tables), axis=1) / totals
+  return impurity(tables.sum(axis=1)) - child_impurity
+
+def information_gain(tables):
+  """Calculates the information gain of some splits.
+
+  Args:
+    tables (numpy.ndarray): The child class supports of each split. It has the
+      shape (splits, children, class values).
+
+  Returns:
+    (numpy.ndarray): The information gain of each split.
+  """
+  return impurity_decrease(tables, entropy)
+
+def gain_ratio(tables):
+  """Calculates the gain ratio (as used by C4.5) of some splits.
+
+  C4.5 only compares the gain ratios of splits with at least the average
+  information gain. gain_ratio_split applies that rule.
+
+  Args:
+    tables (numpy.ndarray): The child class supports of each split. It has the
+      shape (splits, children, class values).
+
+  Returns:
+    (numpy.ndarray): The information gain of each split divided by its split
+      information. Splits with no split information have a gain ratio of zero.
+  """
+  gains = information_gain(tables)
+  split_information = entropy(np.asarray(tables).sum(axis=2))
+  return np.divide(gains, split_information, out=np.zeros_like(gains),
+    where=split_information > 0)
+
+def gini_gain(tables):
+  """Calculates the decrease in gini impurity of some splits.
+
+  Args:
+    tables (numpy.ndarray): The child class supports of each split. It has the
+      shape (splits, children, class values).
+
+  Returns:
+    (numpy.ndarray): The decrease in gini impurity of each split.
+  """
+  return impurity_decrease(tables, gini)
+
+def chi_square(tables):
+  """Calculates the chi-square statistic of some splits.
+
+  The statistic measures how far the class supports of the children are from
+  what they would be if the split were independent of the class.
+
+  Args:
+    tables (numpy.ndarray): The child class supports of each split. It has the
+      shape (splits, children, class values).
+
+  Returns:
+    (numpy.ndarray): The chi-square statistic of each split.
+  """
+  tables = np.asarray(tables, dtype=float)
+  child_totals = tables.sum(axis=2, keepdims=True)
+  class_totals = tables.sum(axis=1, keepdims=True)
+  totals = child_totals.sum(axis=1, keepdims=True)
+  expected = child_totals * class_totals / totals
+  deviations = np.divide((tables - expected) ** 2, expected,
+    out=np.zeros_like(tables), where=expected > 0)
+  return deviations.sum(axis=(1, 2))
+
+def best_split(node, criterion, min_score=0.0):
+  """Finds the split of a node with the highest score under a criterion.
+
+  For every candidate attribute, the child class supports of every possible
+  split are read from Node.split_statistics (or, for categorical attributes,
+  Node.category_supports) and scored at once. This chooses the same split as
+  scoring each of get_possible_splits using get_split_supports.
+
+  Args:
+    node (Node): The node to find the best split for.
+    criterion (function): Scores splits from their child class supports. See
+      information_gain for an example. Higher scores are better.
+    min_score (float): Splits must score more than this to be returned.
+
+  Returns:
+    (Split_Test): The best split, with its score, or None if no split scores
+      more than min_score.
+  """
+  best_score = min_score
+  best_split = None
+  for attribute, split_values, tables in _candidate_tables(node):
+    scores = criterion(tables)
+    best_index = np.argmax(scores)
+    if scores[best_index] > best_score:
+      best_score = scores[best_index]
+      best_split = _candidate_split(attribute, split_values, best_index)
+  if best_split is not None:
+    best_split.score = float(best_score)
+  return best_split
+
+def information_gain_split(node, min_gain=0.0):
+  """A split function which chooses the split with the most information gain.
+
+  Args:
+    node (Node): The node to find the best split for.
+    min_gain (float): Splits must have more information gain than this.
+
+  Returns:
+    (Split_Test): The best split, or None if there is no good split.
+  """
+  return best_split(node, information_gain, min_gain)
+
+def gain_ratio_split(node, min_gain_ratio=0.0):
+  """A split function which chooses the split with the highest gain ratio.
+
+  As in C4.5, each attribute offers the split with its most information gain,
+  and only the splits with at least the average information gain of those
+  are compared by gain ratio. Otherwise, lopsided splits with very little
+  split information would have the highest gain ratio.
+
+  The chosen split depends on the splits of the other attributes, so no score
+  is recorded for it. Node.find_best_split then chooses between the best
+  splits of each attribute by calling this function again on all of them,
+  which gives the same split as a serial search.
+
+  Args:
+    node (Node): The node to find the best split for.
+    min_gain_ratio (float): Splits must have a higher gain ratio than this.
+      The splits of attributes which don't are also left out of the average
+      information gain.
+
+  Returns:
+    (Split_Test): The best split, or None if there is no good split.
+  """
+  # Find the split with the most information gain of each attribute.
+  attribute_splits = []
+  for attribute, split_values, tables in _candidate_tables(node):
+    gains = information_gain(tables)
+    index = np.argmax(gains)
+    ratio = gain_ratio(tables[index:index + 1])[0]
+    if ratio > min_gain_ratio:
+      attribute_splits.append((attribute, split_values, index, gains[index],
+        ratio))
+  if not attribute_splits:
+    return None
+
+  # Choose the highest gain ratio of the splits with at least the average
+  # gain. The first attribute wins ties.
+  average_gain = np.mean([split[3] for split in attribute_splits])
+  best_ratio = None
+  best_split = None
+  for attribute, split_values, index, gain, ratio in attribute_splits:
+    if gain < average_gain - _GAIN_TOLERANCE:
+      continue
+    if best_ratio is None or ratio > best_ratio:
+      best_ratio = ratio
+      best_split = _candidate_split(attribute, split_values, index)
+  return best_split
+
+def gini_split(node, min_gain=0.0):
+  """A split function which chooses the split with the most gini decrease.
+
+  Args:
+    node (Node): The node to find the best split for.
+    min_gain (float): Splits must decrease the gini impurity by more than this.
+
+  Returns:
+    (Split_Test): The best split, or None if there is no good split.
+  """
+  return best_split(node, gini_gain, min_gain)
+
+def chi_square_split(node, min_chi_square=0.0):
+  """A split function which chooses the split with the highest chi-square.
+
+  Args:
+    node (Node): The node to find the best split for.
+    min_chi_square (float): Splits must have a higher chi-square statistic
+      than this. For example, a critical value of the chi-square distribution.
+
+  Returns:
+    (Split_Test): The best split, or None if there is no good split.
+  """
+  return best_split(node, chi_square, min_chi_square)
+
+def weighted_gini_gain(node, child_supports):
+  """Calculates the gain of a split as used to pre-prune and grow trees.
+
+  The decrease in gini impurity is weighted by the fraction of the training
+  data which reaches the node (see Dataset.num_training_records), so that the
+  gains of splits at different nodes can be compared.
+
+  Args:
+    node (Node): The node which the split is for.
+    child_supports (list<dict>): The class supports of each child of the
+      split, as returned by Node.get_split_supports.
+
+  Returns:
+    (float): The weighted decrease in gini impurity.
+  """
+  gain = split_gini_gain(node, child_supports)
+  return gain * node.num_records() / node.dataset.num_training_records
+
+def split_gini_gain(node, child_supports):
+  """Calculates the decrease in gini impurity of a split of a node.
+
+  Args:
+    node (Node): The node which the split is for.
+    child_supports (list<dict>): The class supports of each child of the
+      split, as returned by Node.get_split_supports.
+
+  Returns:
+    (float): The decrease in gini impurity.
+  """
+  classes = node.class_values
+  table = [[child.get(value, 0) for value in classes] for child in
+    child_supports]
+  return float(gini_gain(np.array([table]))[0])
+
+def hoeffding_bound(value_range, delta, n):
+  """Calculates the Hoeffding bound.
+
+  With probability 1 - delta, the mean of n independent observations of a
+  variable with the given range is within the bound of its true mean.
+
+  Args:
+    value_range (float): The range of the variable.
+    delta (float): The probability of the bound being wrong.
+    n (int): The number of observations.
+
+  Returns:
+    (float): The bound.
+  """
+  return np.sqrt(value_range ** 2 * np.log(1 / delta) / (2 * max(n, 1)))
+
+def _candidate_tables(node):
+  """Finds the child class supports of every candidate split of a node.
+
+  Args:
+    node (Node): The node whose candidate splits to find.
+
+  Yields:
+    (tuple): The attribute, its split values (None for a categorical
+      attribute) and the child class supports of its splits, with the shape
+      (splits, children, class values). A categorical attribute has one split.
+  """
+  for attribute in node.candidate_attributes():
+    if attribute in node.dataset.category_values:
+      values, supports = node.category_supports(attribute)
+      if len(values) < 2 or not node.allows_split(supports.sum(axis=1)):
+        continue
+      yield attribute, None, supports[np.newaxis]
+    else:
+      split_values, left, right = node.split_statistics(attribute)
+      if len(split_values) == 0:
+        continue
+      yield attribute, split_values, np.stack([left, right], axis=1)
+
+def _candidate_split(attribute, split_values, index):
+  """Makes the Split_Test of one of the splits from _candidate_tables.
+
+  Args:
+    attribute (str): The attribute of the split.
+    split_values (numpy.ndarray): The split values of the attribute, or None
+      if it is categorical.
+    index (int): The index of the split among the attribute's splits.
+
+  Returns:
+    (Split_Test): The split.
+  """
+  if split_values is None:
+    return Split_Test('categorical', attribute)
+  return Split_Test('numerical', attribute, split_values[index])
+
+def _midpoints(lower_values, upper_values):
+  """Finds the thresholds between pairs of consecutive sorted values.
+
+  A threshold is the midpoint of its pair, so that '<=' sends the lower value
+  left and the upper value right. Where the midpoint isn't finite (e.g. if the
+  upper value is inf) or rounds up to the upper value, the lower value is
+  used instead, which still separates the pair.
+
+  Args:
+    lower_values (numpy.ndarray): The lower value of each pair.
+    upper_values (numpy.ndarray): The upper value of each pair, each strictly
+      greater than its lower value.
+
+  Returns:
+    (numpy.ndarray): The float64 threshold of each pair.
+  """
+  lower_values = np.asarray(lower_values, dtype=np.float64)
+  upper_values = np.asarray(upper_values, dtype=np.float64)
+  with np.errstate(invalid='ignore', over='ignore'):
+    midpoints = (lower_values + upper_values) / 2
+  invalid = ~np.isfinite(midpoints) | (midpoints >= upper_values)
+  midpoints[invalid] = lower_values[invalid]
+  return midpoints
+
+def _aligned(size, alignment):
+  """Rounds a size up to a multiple of an alignment.
+
+  Args:
+    size (int): The size to round up.
+    alignment (int): The alignment.
+
+  Returns:
+    (int): The smallest multiple of alignment which is at least size.
+  """
+  return -(-size // alignment) * alignment
+
+def _has_python_literal(value):
+  """Checks whether a value can be written as a Python literal.
+
+  Args:
+    value (object): The value to check.
+
+  Returns:
+    (boolean): True if _python_literal writes source code which evaluates to
+      an equal value, False otherwise.
+  """
+  return value is None or isinstance(value, (bool, int, float, str, np.bool_,
+    np.integer, np.floating, np.str_))
+
+def _python_literal(value):
+  """Writes a value as Python source code.
+
+  Numpy scalars are written as the equivalent Python value. Floats which
+  aren't finite have no literal, so they are written as a call to float.
+
+  Args:
+    value (object): The value to write.
+
+  Returns:
+    (str): The source code of the value.
+  """
+  if isinstance(value, np.generic):
+    value = value.item()
+  if isinstance(value, float) and not np.isfinite(value):
+    return 'float({!r})'.format(repr(value))
+  return repr(value)
+
+def _json_value(value):
+  """Converts a numpy scalar to a value which json can serialize.
+
+  Args:
+    value (object): The value which json couldn't serialize.
+
+  Returns:
+    (object): The equivalent Python value.
+
+  Raises:
+    TypeError: If the value isn't a numpy scalar.
+  """
+  if isinstance(value, np.generic):
+    return value.item()
+  raise TypeError('Can\'t serialize a value of type {}.'.format(
+    type(value).__name__))
+
+def _sample_chunks(chunks, class_attribute, sample_size, max_categories=None,
+  seed=0):
+  """Takes a uniform sample of data which is read in chunks.
+
+  Each data point is given a random key, and the sample_size data points with
+  the smallest keys are kept. The first data point with each class value and
+  each category of a categorical attribute is also kept, so that the sample
+  has every value which occurs in the data. Only the first max_categories
+  categories of each attribute are kept this way. Data points with a missing
+  class value are left out, as they are when the statistics are accumulated.
+
+  Args:
+    chunks (iterable<pandas.DataFrame>): The chunks of the data.
+    class_attribute (string): The name of the class attribute.
+    sample_size (int): The number of data points to sample.
+    max_categories (int): The maximum number of categories per categorical
+      attribute whose first data point is kept. None for no limit.
+    seed (int): The seed of the random keys.
+
+  Returns:
+    (pandas.DataFrame): The sampled data points.
+  """
+  random = np.random.default_rng(seed)
+  sample = None
+  keys = np.empty(0)
+  positions = np.empty(0, dtype=np.int64)
+  first_rows = []
+  first_positions = []
+  seen = {}
+  num_rows = 0
+  for chunk in chunks:
+    chunk = chunk[chunk[class_attribute].notna()]
+    chunk_positions = np.arange(num_rows, num_rows + len(chunk))
+    num_rows += len(chunk)
+
+    # Keep the data points which have a value that hasn't been seen yet. Once
+    # max_categories categories of an attribute have been seen, the rest are
+    # only kept if they are sampled.
+    numerical_columns = set(chunk._get_numeric_data().columns)
+    is_new = np.zeros(len(chunk), dtype=bool)
+    for column in chunk.columns:
+      if column in numerical_columns and column != class_attribute:
+        continue
+      seen_values = seen.setdefault(column, set())
+      limit = None
+      if column != class_attribute and max_categories is not None:
+        limit = max_categories - len(seen_values)
+        if limit <= 0:
+          continue
+      values = chunk[column]
+      if column == class_attribute:
+        values = values.astype(str)
+      new_values = (~values.isin(seen_values) & values.notna() &
+        ~values.duplicated()).to_numpy(copy=True)
+      if limit is not None:
+        new_values[np.flatnonzero(new_values)[limit:]] = False
+      seen_values.update(values[new_values].tolist())
+      is_new |= new_values
+    first_rows.append(chunk[is_new])
+    first_positions.append(chunk_positions[is_new])
+
+    # Keep the data points with the smallest random keys.
+    chunk_keys = random.random(len(chunk))
+    if sample is None:
+      sample = chunk
+    else:
+      sample = pd.concat([sample, chunk], ignore_index=True)
+    keys = np.concatenate([keys, chunk_keys])
+    positions = np.concatenate([positions, chunk_positions])
+    if len(keys) > sample_size:
+      kept = np.sort(np.argpartition(keys, sample_size)[:sample_size])
+      sample = sample.iloc[kept].reset_index(drop=True)
+      keys = keys[kept]
+      positions = positions[kept]
+
+  # Add the first data points with each value which weren't sampled.
+  unsampled = [rows[~np.isin(row_positions, positions)] for rows,
+    row_positions in zip(first_rows, first_positions)]
+  return pd.concat([sample] + unsampled, ignore_index=True)
+
+# The shared data of a worker process which builds subtrees for Tree.build.
+_worker_dataset = None
+
+def _initialize_worker(dataset):
+  """Stores the shared data of a tree in a worker process.
+
+  Args:
+    dataset (Dataset): The data shared by every node of the tree.
+  """
+  global _worker_dataset
+  _worker_dataset = dataset
+
+def _build_subtree(rows, sorted_indexes, class_attribute, positive_class,
+  split_func, split_func_args, n_jobs, depth=0, limits=(),
+  randomization=()):
+  """Grows a subtree in a worker process.
+
+  Args:
+    rows (numpy.ndarray): The positions of the subtree root's data points.
+    sorted_indexes (dict<numpy.ndarray>): The subtree root's presorted index
+      arrays.
+    class_attribute (string): The name of the class attribute.
+    positive_class (string): The positive class value.
+    split_func (function): The split function. See Node.grow.
+    split_func_args (list): The arguments to pass to the split function.
+    n_jobs (int): The number of threads to use when searching for a split.
+    depth (int): The depth of the subtree root in the whole tree.
+    limits (tuple): The pre-pruning limits to pass to Node.grow, after
+      n_jobs.
+    randomization (tuple): The arguments to pass to Node.randomize for the
+      subtree root.
+
+  Returns:
+    (dict): The subtree, encoded by Node.flatten so that it can be sent back
+      however deep it is. The shared data isn't sent back with it.
+  """
+  root = Node(dataset=_worker_dataset, rows=rows,
+    class_attribute=class_attribute, positive_class=positive_class,
+    sorted_indexes=sorted_indexes)
+  root.depth = depth
+  root.randomize(*randomization)
+  root.grow(split_func, split_func_args, n_jobs, *limits)
+  return root.flatten()